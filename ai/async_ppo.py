@@ -0,0 +1,178 @@
+import time
+
+import numpy as np
+import torch as th
+from gymnasium import spaces
+from stable_baselines3 import PPO
+from stable_baselines3.common.utils import obs_as_tensor
+
+
+def _take(obs, indices):
+    """Rows of an observation batch (array or dict of arrays)."""
+    if isinstance(obs, dict):
+        return {key: value[indices] for key, value in obs.items()}
+    return obs[indices]
+
+
+def _concat(parts):
+    """Join observation batches of env groups."""
+    if isinstance(parts[0], dict):
+        return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+    return np.concatenate(parts)
+
+
+class AsyncPPO(PPO):
+    """
+    PPO with double-buffered rollout collection.
+
+    Envs are split into two groups. While one group steps in its worker
+    processes, the policy computes actions for the other, so env stepping
+    and inference overlap instead of waiting for each other:
+
+        infer A(t+1) | send A(t+1) | wait B(t) | infer B(t+1) | wait A(t+1) | send B(t+1)
+          (B steps)                            (A steps)
+
+    Every step t still has observations, actions, values and log probs of
+    all envs from the same policy, so the rollout buffer is exactly what
+    PPO.collect_rollouts() would produce - training is unchanged.
+
+    Needs a VecEnv with group stepping (SharedMemoryVecEnv). Records the
+    time spent in inference and waiting for envs to the logger (async/).
+    """
+
+    def collect_rollouts(self, env, callback, rollout_buffer, n_rollout_steps):
+        """
+        Collect experiences using the current policy and fill a RolloutBuffer.
+
+        Returns:
+            True if n_rollout_steps were collected, False if a callback
+            stopped training
+        """
+        assert self._last_obs is not None, "No previous observation was provided"
+        if env.num_envs < 2:
+            return super().collect_rollouts(env, callback, rollout_buffer, n_rollout_steps)
+        if self.use_sde:
+            raise ValueError("AsyncPPO does not support state dependent exploration")
+        if not hasattr(env, "step_group_async"):
+            raise TypeError(f"AsyncPPO needs a VecEnv with group stepping, got {type(env).__name__}")
+
+        # Switch to eval mode (this affects batch norm / dropout)
+        self.policy.set_training_mode(False)
+        rollout_buffer.reset()
+        callback.on_rollout_start()
+
+        group_a = slice(0, env.num_envs // 2)
+        group_b = slice(env.num_envs // 2, env.num_envs)
+        timing = {'policy': 0.0, 'wait': 0.0}
+
+        def infer(group_obs):
+            start = time.perf_counter()
+            with th.no_grad():
+                actions, values, log_probs = self.policy(obs_as_tensor(group_obs, self.device))
+            actions = actions.cpu().numpy()
+            timing['policy'] += time.perf_counter() - start
+            return actions, values, log_probs
+
+        def wait(group):
+            start = time.perf_counter()
+            result = env.step_group_wait(group)
+            timing['wait'] += time.perf_counter() - start
+            return result
+
+        # Step 0: A steps while B infers, B steps while A infers step 1 ...
+        out_a = infer(_take(self._last_obs, group_a))
+        env.step_group_async(self._clip_actions(out_a[0]), group_a)
+        out_b = infer(_take(self._last_obs, group_b))
+        result_a = wait(group_a)
+        env.step_group_async(self._clip_actions(out_b[0]), group_b)
+
+        for n_steps in range(n_rollout_steps):
+            last = n_steps == n_rollout_steps - 1
+
+            # Next actions of A (its new observations are in) while B steps
+            if not last:
+                next_a = infer(result_a[0])
+                env.step_group_async(self._clip_actions(next_a[0]), group_a)
+            result_b = wait(group_b)
+
+            # Step complete for all envs
+            if not self._add_step(env, callback, rollout_buffer, (out_a, out_b), (result_a, result_b)):
+                if not last:
+                    wait(group_a)  # Leave no step in flight
+                return False
+            if last:
+                break
+
+            # Next actions of B while A steps
+            next_b = infer(result_b[0])
+            result_a = wait(group_a)
+            env.step_group_async(self._clip_actions(next_b[0]), group_b)
+            out_a, out_b = next_a, next_b
+
+        self.logger.record("async/policy_seconds", timing['policy'])
+        self.logger.record("async/env_wait_seconds", timing['wait'])
+
+        with th.no_grad():
+            # Compute value for the last timestep
+            values = self.policy.predict_values(obs_as_tensor(self._last_obs, self.device))
+
+        dones = self._last_episode_starts
+        rollout_buffer.compute_returns_and_advantage(last_values=values, dones=dones)
+
+        callback.update_locals(locals())
+        callback.on_rollout_end()
+        return True
+
+    def _clip_actions(self, actions):
+        if isinstance(self.action_space, spaces.Box):
+            if self.policy.squash_output:
+                return self.policy.unscale_action(actions)
+            return np.clip(actions, self.action_space.low, self.action_space.high)
+        return actions
+
+    def _add_step(self, env, callback, rollout_buffer, outputs, results):
+        """
+        Add one step of both groups to the rollout buffer (as in
+        PPO.collect_rollouts).
+
+        Args:
+            outputs: (actions, values, log_probs) of each group
+            results: (obs, rewards, dones, infos) of each group
+        """
+        actions = np.concatenate([out[0] for out in outputs])
+        values = th.cat([out[1] for out in outputs])
+        log_probs = th.cat([out[2] for out in outputs])
+        new_obs = _concat([result[0] for result in results])
+        rewards = np.concatenate([result[1] for result in results])
+        dones = np.concatenate([result[2] for result in results])
+        infos = [info for result in results for info in result[3]]
+
+        self.num_timesteps += env.num_envs
+
+        # Give access to local variables
+        callback.update_locals(locals())
+        if not callback.on_step():
+            return False
+
+        self._update_info_buffer(infos, dones)
+
+        if isinstance(self.action_space, spaces.Discrete):
+            # Reshape in case of discrete action
+            actions = actions.reshape(-1, 1)
+
+        # Handle timeout by bootstrapping with value function
+        for idx, done in enumerate(dones):
+            if (
+                done
+                and infos[idx].get("terminal_observation") is not None
+                and infos[idx].get("TimeLimit.truncated", False)
+            ):
+                terminal_obs = self.policy.obs_to_tensor(infos[idx]["terminal_observation"])[0]
+                with th.no_grad():
+                    terminal_value = self.policy.predict_values(terminal_obs)[0]
+                rewards[idx] += self.gamma * terminal_value
+
+        rollout_buffer.add(self._last_obs, actions, rewards, self._last_episode_starts, values, log_probs)
+        self._last_obs = new_obs
+        self._last_episode_starts = dones
+        return True
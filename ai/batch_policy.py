@@ -0,0 +1,88 @@
+import numpy as np
+
+
+def load_model(model_path):
+    """
+    Load trained model for inference.
+
+    .npz files (see export_policy.py) load as NumpyPolicy without torch,
+    anything else as stable-baselines3 PPO zip.
+    """
+    if model_path.endswith(".npz"):
+        from ai.numpy_policy import NumpyPolicy
+        return NumpyPolicy.load(model_path)
+
+    from stable_baselines3 import PPO
+    return PPO.load(model_path, device="cpu")
+
+
+class BatchPolicy:
+    """
+    Computes actions for many cars with one forward pass per model.
+
+    Observations of all cars are stacked into a single (N, obs_size) batch.
+    Cars can be driven by different models - rows are grouped by model key
+    and each model runs once on its group, so cost grows with the number of
+    models, not the number of cars.
+    """
+
+    def __init__(self, models=None, deterministic=True):
+        """
+        Initialize batch policy.
+
+        Args:
+            models: Dict of key -> loaded model (anything with SB3-style
+                predict(obs, deterministic) accepting a batch of observations)
+            deterministic: Use greedy actions instead of sampling
+        """
+        self._models = dict(models or {})
+        self._deterministic = deterministic
+
+    @classmethod
+    def from_files(cls, model_paths, deterministic=True):
+        """Create policy from model files, keyed by path."""
+        return cls({path: load_model(path) for path in model_paths}, deterministic)
+
+    def add_model(self, key, model):
+        self._models[key] = model
+
+    @property
+    def model_keys(self):
+        return list(self._models.keys())
+
+    def predict(self, observations, model_keys=None):
+        """
+        Compute actions for a batch of observations.
+
+        Args:
+            observations: Array (N, obs_size), one row per car
+            model_keys: Model key for each row (optional if only one model)
+
+        Returns:
+            Array of N integer actions
+        """
+        observations = np.asarray(observations, dtype=np.float32)
+        if observations.ndim == 1:
+            observations = observations[np.newaxis]
+
+        n = len(observations)
+        actions = np.zeros(n, dtype=np.int64)
+        if n == 0:
+            return actions
+
+        if model_keys is None:
+            if len(self._models) != 1:
+                raise ValueError("model_keys required when policy has several models")
+            groups = {next(iter(self._models)): slice(None)}
+        else:
+            groups = {}
+            for i, key in enumerate(model_keys):
+                groups.setdefault(key, []).append(i)
+
+        for key, rows in groups.items():
+            group_actions, _ = self._models[key].predict(
+                observations[rows], deterministic=self._deterministic
+            )
+            actions[rows] = np.asarray(group_actions).reshape(-1)
+
+        return actions
@@ -0,0 +1,35 @@
+import json
+import os
+
+
+MANIFEST_FILE = "manifest.json"
+
+
+def read_manifest(model_dir):
+    """
+    Read checkpoint manifest of a model directory.
+
+    Kept free of torch/SB3 imports - evaluation workers read it without
+    loading them.
+
+    Returns:
+        List of entries (path, steps, wall_time, mean_reward) sorted by
+        steps, or None if the directory has no manifest
+    """
+    manifest_path = os.path.join(model_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r') as f:
+        entries = json.load(f)['checkpoints']
+    for entry in entries:
+        entry['path'] = os.path.join(model_dir, entry['file'])
+    return sorted(entries, key=lambda entry: entry['steps'])
+
+
+def write_manifest(model_dir, entries):
+    """Write manifest entries (without 'path') atomically."""
+    path = os.path.join(model_dir, MANIFEST_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'checkpoints': entries}, f, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,201 @@
+import copy
+import os
+import queue
+import threading
+import time
+import zipfile
+
+import numpy as np
+import stable_baselines3 as sb3
+import torch
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.save_util import data_to_json, recursive_getattr
+from stable_baselines3.common.utils import get_system_info
+
+from ai.checkpoint_manifest import read_manifest, write_manifest
+
+
+def snapshot_model(model):
+    """
+    Copy everything model.save() writes, so it can be written later while
+    training goes on.
+
+    Mirrors BaseAlgorithm.save(): class attributes are serialized to JSON
+    here (they include buffers training keeps changing), parameters and
+    optimizer state are deep-copied tensors.
+
+    Returns:
+        (serialized_data, params, pytorch_variables)
+    """
+    data = model.__dict__.copy()
+    exclude = set(model._excluded_save_params())
+    state_dict_names, torch_variable_names = model._get_torch_save_params()
+    for name in state_dict_names + torch_variable_names:
+        exclude.add(name.split(".")[0])
+    for name in exclude:
+        data.pop(name, None)
+
+    serialized_data = data_to_json(data)
+    params = copy.deepcopy(model.get_parameters())
+    pytorch_variables = {name: copy.deepcopy(recursive_getattr(model, name))
+                         for name in torch_variable_names}
+    return serialized_data, params, pytorch_variables
+
+
+def write_model_zip(path, serialized_data, params, pytorch_variables):
+    """
+    Write a snapshot as a regular SB3 model zip (PPO.load() reads it).
+
+    Written to a temporary file and renamed, so readers never see a
+    half-written model.
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        with zipfile.ZipFile(tmp_path, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("data", serialized_data)
+            if pytorch_variables:
+                with archive.open("pytorch_variables.pth", mode="w", force_zip64=True) as f:
+                    torch.save(pytorch_variables, f)
+            for name, state_dict in params.items():
+                with archive.open(name + ".pth", mode="w", force_zip64=True) as f:
+                    torch.save(state_dict, f)
+            archive.writestr("_stable_baselines3_version", sb3.__version__)
+            archive.writestr("system_info.txt", get_system_info(print_info=False)[1])
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class CheckpointWriter:
+    """
+    Background thread writing model snapshots to disk.
+
+    At most max_pending snapshots wait in memory - submit() blocks when the
+    writer falls behind instead of piling up copies of the model. After each
+    write the manifest (manifest.json) is rewritten with all checkpoints.
+    """
+
+    def __init__(self, save_path, max_pending=2):
+        """
+        Initialize writer and start its thread.
+
+        Args:
+            save_path: Directory for model zips and manifest
+            max_pending: Snapshots queued before submit() blocks
+        """
+        self._save_path = save_path
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._entries = []
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+
+        os.makedirs(save_path, exist_ok=True)
+        existing = read_manifest(save_path)
+        if existing:
+            self._entries = [{key: value for key, value in entry.items() if key != 'path'}
+                             for entry in existing]
+        self._thread.start()
+
+    def submit(self, file_name, snapshot, **info):
+        """
+        Queue a snapshot (from snapshot_model()) for writing.
+
+        Args:
+            file_name: Zip file name inside save_path
+            snapshot: Result of snapshot_model()
+            **info: Manifest fields (steps, wall_time, mean_reward)
+        """
+        self._raise_error()
+        self._queue.put((file_name, snapshot, info))
+
+    def close(self):
+        """Write all pending snapshots and stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_error()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if self._error is not None:
+                continue  # Drain the queue, error is raised in the training thread
+
+            file_name, snapshot, info = job
+            try:
+                write_model_zip(os.path.join(self._save_path, file_name), *snapshot)
+                self._entries = [e for e in self._entries if e['file'] != file_name]
+                self._entries.append(dict(file=file_name, **info))
+                write_manifest(self._save_path, self._entries)
+            except Exception as error:
+                self._error = error
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError(f"Checkpoint writing failed: {self._error}") from self._error
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+
+class BackgroundCheckpointCallback(BaseCallback):
+    """
+    Save the model every save_freq steps without stalling rollouts.
+
+    Only the in-memory snapshot happens in the training loop; serialization
+    to zip and the disk write run on a CheckpointWriter thread. Files are
+    named like CheckpointCallback's (<prefix>_<steps>_steps.zip).
+    """
+
+    def __init__(self, save_freq, save_path, name_prefix="racing_ppo", max_pending=2, verbose=0):
+        """
+        Initialize callback.
+
+        Args:
+            save_freq: Save every this many steps (all envs together)
+            save_path: Directory for checkpoints and manifest
+            name_prefix: Checkpoint file name prefix
+            max_pending: Snapshots waiting for the writer before training blocks
+        """
+        super().__init__(verbose)
+        self.save_freq = save_freq
+        self.save_path = save_path
+        self.name_prefix = name_prefix
+        self._max_pending = max_pending
+        self._writer = None
+        self._next_save = save_freq
+        self._start_time = None
+
+    def _on_training_start(self):
+        self._writer = CheckpointWriter(self.save_path, self._max_pending)
+        self._next_save = (self.num_timesteps // self.save_freq + 1) * self.save_freq
+        self._start_time = time.time()
+
+    def _on_step(self):
+        if self.num_timesteps >= self._next_save:
+            self._next_save = (self.num_timesteps // self.save_freq + 1) * self.save_freq
+            self._save()
+        return True
+
+    def _save(self):
+        episodes = self.model.ep_info_buffer
+        mean_reward = float(np.mean([ep['r'] for ep in episodes])) if episodes else None
+        file_name = f"{self.name_prefix}_{self.num_timesteps}_steps.zip"
+
+        self._writer.submit(
+            file_name, snapshot_model(self.model),
+            steps=self.num_timesteps,
+            wall_time=round(time.time() - self._start_time, 2),
+            mean_reward=mean_reward,
+        )
+        if self.verbose >= 1:
+            print(f"Queued checkpoint {file_name} ({self._writer.pending} pending)")
+
+    def _on_training_end(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
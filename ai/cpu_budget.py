@@ -0,0 +1,233 @@
+import os
+import sys
+import time
+
+import numpy as np
+from stable_baselines3.common.callbacks import BaseCallback
+
+
+# Thread pools of BLAS/OpenMP libraries read these when they are loaded
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+                   "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+def available_cores():
+    """Cores this process may run on (respects taskset/cgroup limits on Linux)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_cpu_budget(n_envs, learner_threads=None, cores=None, rollout_threads=None):
+    """
+    Split cores between env workers and the learner.
+
+    PPO alternates phases: while envs step, the learner only runs small
+    forward passes; while it updates, envs are idle. So every env worker
+    gets one core of its own (round robin if there are more envs than
+    cores) and one thread. The learner's torch threads are switched per
+    phase (see LearnerThreads): few during rollouts - the cores are the
+    workers' - and all cores in the update.
+
+    Args:
+        n_envs: Number of env worker processes
+        learner_threads: Torch threads of the learner in the update phase
+            (default: all cores)
+        cores: Cores to use (default: available_cores())
+        rollout_threads: Torch threads of the learner during rollouts
+            (default: cores left over by the workers, 1 to 2)
+
+    Returns:
+        Dict with 'cores', 'learner_threads', 'rollout_threads' and
+        'env_cores' (list of one-core lists, one per env)
+    """
+    cores = list(cores) if cores is not None else available_cores()
+    return {
+        'cores': cores,
+        'learner_threads': learner_threads or len(cores),
+        'rollout_threads': rollout_threads or max(1, min(2, len(cores) - n_envs)),
+        'env_cores': [[cores[i % len(cores)]] for i in range(n_envs)],
+    }
+
+
+def limit_child_threads(n_threads=1):
+    """
+    Limit BLAS/OpenMP thread pools of processes started from now on.
+
+    Env workers inherit the environment, so their libraries start with
+    n_threads threads. Libraries already loaded in this process keep
+    theirs - the learner is configured with configure_learner().
+    """
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(n_threads)
+
+
+def configure_learner(n_threads):
+    """Set torch intra-op threads of the training process."""
+    import torch
+    torch.set_num_threads(n_threads)
+
+
+def configure_worker(cores=None, n_threads=1):
+    """
+    Pin current (env worker) process to cores and limit its threads.
+
+    Call first thing in the worker, before it builds the env. Pinning is
+    skipped on systems without sched_setaffinity.
+    """
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(n_threads)
+
+
+def read_cpu_times():
+    """
+    Per-core (busy, total) CPU time counters from /proc/stat.
+
+    Returns:
+        Dict core -> (busy, total) in clock ticks, or None where /proc/stat
+        is not available
+    """
+    try:
+        with open("/proc/stat", "r") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+
+    times = {}
+    for line in lines:
+        if line.startswith("cpu") and line[3].isdigit():
+            fields = line.split()
+            values = np.array(fields[1:], dtype=np.int64)
+            idle = values[3] + (values[4] if len(values) > 4 else 0)  # idle + iowait
+            times[int(fields[0][3:])] = (int(values.sum() - idle), int(values.sum()))
+    return times
+
+
+class LearnerThreads(BaseCallback):
+    """
+    Switch the learner's torch threads between PPO phases.
+
+    During rollouts env workers run on all cores, so the learner's forward
+    passes get rollout_threads threads (no oversubscription); the update,
+    when workers wait, gets update_threads.
+    """
+
+    def __init__(self, rollout_threads, update_threads, verbose=0):
+        super().__init__(verbose)
+        self._rollout_threads = rollout_threads
+        self._update_threads = update_threads
+
+    def _on_rollout_start(self):
+        configure_learner(self._rollout_threads)
+
+    def _on_step(self):
+        return True
+
+    def _on_rollout_end(self):
+        configure_learner(self._update_threads)
+
+
+class PhaseUtilization(BaseCallback):
+    """
+    Measures CPU utilization during rollout and update phases.
+
+    Per training iteration records to the SB3 logger (shown in PPO's
+    table): seconds and mean core utilization of both phases, rollout
+    steps/s and the learner process' share of its CPU time. Prints totals
+    when training ends - compare them across N_ENVS / thread settings to
+    find the fastest configuration of a machine.
+    """
+
+    PHASES = ("rollout", "update")
+
+    def __init__(self, cores=None, verbose=0):
+        """
+        Initialize callback.
+
+        Args:
+            cores: Cores to measure (default: available_cores())
+            verbose: 1 = print every iteration
+        """
+        super().__init__(verbose)
+        self._cores = list(cores) if cores is not None else available_cores()
+        self._phase = None
+        self._phase_start = None
+        self._totals = {phase: {'seconds': 0.0, 'busy': 0.0, 'capacity': 0.0, 'process': 0.0}
+                        for phase in self.PHASES}
+        self._rollout_steps = 0
+        self._steps_at_start = 0
+
+    def _on_training_start(self):
+        self._steps_at_start = self.num_timesteps
+
+    def _on_rollout_start(self):
+        if self._phase == "update":
+            self._end_phase()
+        self._start_phase("rollout")
+        self._rollout_steps = self.num_timesteps
+
+    def _on_step(self):
+        return True
+
+    def _on_rollout_end(self):
+        stats = self._end_phase()
+        steps = self.num_timesteps - self._rollout_steps
+        self.logger.record("cpu/rollout_steps_per_s", steps / max(stats['seconds'], 1e-9))
+        self._start_phase("update")
+
+    def _on_training_end(self):
+        if self._phase is not None:
+            self._end_phase()
+        self._print_summary()
+
+    def _sample(self):
+        return time.perf_counter(), time.process_time(), read_cpu_times()
+
+    def _start_phase(self, phase):
+        self._phase = phase
+        self._phase_start = self._sample()
+
+    def _end_phase(self):
+        phase, (wall0, process0, cpu0) = self._phase, self._phase_start
+        wall1, process1, cpu1 = self._sample()
+        self._phase = None
+
+        stats = {'seconds': wall1 - wall0, 'process': process1 - process0,
+                 'busy': 0.0, 'capacity': 0.0}
+        if cpu0 is not None and cpu1 is not None:
+            cores = [core for core in self._cores if core in cpu0 and core in cpu1]
+            stats['busy'] = sum(cpu1[c][0] - cpu0[c][0] for c in cores)
+            stats['capacity'] = sum(cpu1[c][1] - cpu0[c][1] for c in cores)
+
+        for key, value in stats.items():
+            self._totals[phase][key] += value
+
+        self.logger.record(f"cpu/{phase}_seconds", stats['seconds'])
+        if stats['capacity']:
+            self.logger.record(f"cpu/{phase}_util", stats['busy'] / stats['capacity'])
+        # Learner process CPU time per wall second (1.0 = one busy core)
+        self.logger.record(f"cpu/{phase}_learner_cores", stats['process'] / max(stats['seconds'], 1e-9))
+        if self.verbose >= 1:
+            print(f"[cpu] {phase}: {stats['seconds']:.2f}s, "
+                  f"util {self._util(stats)}")
+        return stats
+
+    @staticmethod
+    def _util(stats):
+        return f"{stats['busy'] / stats['capacity']:.0%}" if stats['capacity'] else "n/a"
+
+    def _print_summary(self):
+        total = sum(t['seconds'] for t in self._totals.values())
+        if not total:
+            return
+        steps = self.num_timesteps - self._steps_at_start
+
+        print(f"\n=== CPU ({len(self._cores)} cores) ===")
+        for phase, stats in self._totals.items():
+            print(f"  {phase:<8} {stats['seconds']:8.1f}s ({stats['seconds'] / total:.0%})  "
+                  f"util {self._util(stats):>4}  "
+                  f"learner {stats['process'] / max(stats['seconds'], 1e-9):.1f} cores")
+        print(f"  {steps / total:.0f} steps/s overall, "
+              f"{steps / max(self._totals['rollout']['seconds'], 1e-9):.0f} steps/s in rollouts")
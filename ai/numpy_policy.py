@@ -0,0 +1,155 @@
+import numpy as np
+
+
+ACTIVATIONS = {
+    'tanh': np.tanh,
+    'relu': lambda x: np.maximum(x, 0.0),
+}
+
+
+class NumpyPolicy:
+    """
+    Pure NumPy inference for PPO MLP policies exported with export_policy().
+
+    Reproduces the actor path of stable-baselines3 MlpPolicy (flatten ->
+    hidden layers -> action logits) for discrete actions, without torch.
+    """
+
+    def __init__(self, weights, biases, action_weight, action_bias, activation='tanh'):
+        """
+        Initialize policy from layer parameters.
+
+        Args:
+            weights: List of hidden layer weight matrices (in_features, out_features)
+            biases: List of hidden layer bias vectors
+            action_weight: Action head weights (last_hidden, n_actions)
+            action_bias: Action head bias (n_actions)
+            activation: Hidden layer activation name ('tanh' or 'relu')
+        """
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"Unsupported activation: {activation}")
+
+        self._weights = [np.asarray(w, dtype=np.float32) for w in weights]
+        self._biases = [np.asarray(b, dtype=np.float32) for b in biases]
+        self._action_weight = np.asarray(action_weight, dtype=np.float32)
+        self._action_bias = np.asarray(action_bias, dtype=np.float32)
+        self._activation = activation
+        self._rng = np.random.default_rng()
+
+    @classmethod
+    def load(cls, path):
+        """Load policy from .npz file written by export_policy()."""
+        with np.load(path) as data:
+            n_layers = int(data['n_layers'])
+            return cls(
+                weights=[data[f'w{i}'] for i in range(n_layers)],
+                biases=[data[f'b{i}'] for i in range(n_layers)],
+                action_weight=data['action_w'],
+                action_bias=data['action_b'],
+                activation=str(data['activation'])
+            )
+
+    def save(self, path):
+        """Save policy parameters to .npz file."""
+        arrays = {'n_layers': len(self._weights), 'activation': self._activation,
+                  'action_w': self._action_weight, 'action_b': self._action_bias}
+        for i, (w, b) in enumerate(zip(self._weights, self._biases)):
+            arrays[f'w{i}'] = w
+            arrays[f'b{i}'] = b
+        np.savez(path, **arrays)
+
+    @property
+    def observation_size(self):
+        return self._weights[0].shape[0] if self._weights else self._action_weight.shape[0]
+
+    @property
+    def n_actions(self):
+        return self._action_weight.shape[1]
+
+    def set_random_seed(self, seed):
+        """Seed action sampling (used when deterministic=False)."""
+        self._rng = np.random.default_rng(seed)
+
+    def action_logits(self, observations):
+        """Return action logits for a batch of observations (N, obs_size)."""
+        activation = ACTIVATIONS[self._activation]
+        x = np.asarray(observations, dtype=np.float32)
+        for w, b in zip(self._weights, self._biases):
+            x = activation(x @ w + b)
+        return x @ self._action_weight + self._action_bias
+
+    def predict(self, observation, deterministic=True):
+        """
+        Predict actions (same call signature as stable-baselines3 predict).
+
+        Args:
+            observation: Single observation or batch (N, obs_size)
+            deterministic: Greedy action instead of sampling
+
+        Returns:
+            (actions, None) - action for single observation, array for batch
+        """
+        observation = np.asarray(observation, dtype=np.float32)
+        single = observation.ndim == 1
+        logits = self.action_logits(observation.reshape(-1, self.observation_size))
+
+        if deterministic:
+            actions = np.argmax(logits, axis=1)
+        else:
+            # Gumbel-max trick samples from softmax(logits)
+            gumbel = -np.log(-np.log(self._rng.uniform(1e-12, 1.0, logits.shape)))
+            actions = np.argmax(logits + gumbel, axis=1)
+
+        return (actions[0] if single else actions), None
+
+
+def export_policy(model_path, output_path=None):
+    """
+    Extract actor network weights from stable-baselines3 PPO zip to .npz.
+
+    Needs torch and stable-baselines3 (only for the export itself).
+
+    Args:
+        model_path: Path to racing_ppo_*.zip
+        output_path: Output .npz path (default: same name as model)
+
+    Returns:
+        Path to written .npz file
+    """
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.torch_layers import FlattenExtractor
+    import torch.nn as nn
+
+    if output_path is None:
+        output_path = model_path.replace('.zip', '.npz')
+
+    model = PPO.load(model_path, device='cpu')
+    policy = model.policy
+
+    if not isinstance(policy.pi_features_extractor, FlattenExtractor):
+        raise ValueError("Only MlpPolicy with flat observations can be exported")
+    if not isinstance(policy.action_net, nn.Linear):
+        raise ValueError("Only discrete action policies can be exported")
+
+    weights, biases, activation = [], [], 'tanh'
+    for layer in policy.mlp_extractor.policy_net:
+        if isinstance(layer, nn.Linear):
+            # torch stores (out, in) - transpose for x @ w
+            weights.append(layer.weight.detach().numpy().T)
+            biases.append(layer.bias.detach().numpy())
+        elif isinstance(layer, nn.Tanh):
+            activation = 'tanh'
+        elif isinstance(layer, nn.ReLU):
+            activation = 'relu'
+        else:
+            raise ValueError(f"Unsupported layer: {layer}")
+
+    numpy_policy = NumpyPolicy(
+        weights, biases,
+        policy.action_net.weight.detach().numpy().T,
+        policy.action_net.bias.detach().numpy(),
+        activation
+    )
+    numpy_policy.save(output_path)
+
+    return output_path
@@ -2,9 +2,12 @@ import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
 
-from core.track import Track
-from core.track_loader import TrackLoader
+from core.track_registry import TrackRegistry
 from core.physics_engine import PhysicsEngine
+from core.lap_timer import LapTimer
+from core.replay import ReplayWriter
+from core.ray_table import load_ray_table
+from core.occupancy_patch import OccupancyPatch
 from entities.ai_car import AICar
 
 
@@ -17,6 +20,9 @@ class RacingEnv(gym.Env):
         - speed (normalized -1 to 1)
         - distance to next checkpoint (normalized 0-1)
 
+    With observation="patch" the raycasts are replaced by an egocentric
+    wall patch (see OBSERVATION_MODES).
+
     Actions (5 discrete):
         0: Nothing
         1: Gas
@@ -28,12 +34,53 @@ class RacingEnv(gym.Env):
         +200: Checkpoint crossed
         +1000 + time_bonus: Lap completed
         -5: Wall collision
-        +progress: Getting closer to checkpoint
+        +progress: Getting closer to checkpoint (distance along the track by
+            default - see progress_reward)
     """
 
     metadata = {"render_modes": ["human", "rgb_array"], "render_fps": 60}
 
-    def __init__(self, track_file="tracks/test.png", render_mode=None, max_steps=800):
+    TICK_DT = 1 / 60  # Simulated seconds per step
+
+    # "rays": Box (9,) as above
+    # "patch": Dict - "state" Box (2,) speed + checkpoint distance, "patch"
+    #     uint8 (patch_size, patch_size) walls around the car, heading up
+    # "patch_flat": Box (2 + patch_size**2,) - the same in one vector (MlpPolicy)
+    OBSERVATION_MODES = ("rays", "patch", "patch_flat")
+
+    def __init__(self, track_file="tracks/test.png", render_mode=None, max_steps=800,
+                 track_pool=None, track_weights=None, track_registry=None,
+                 progress_reward="geodesic", ray_table=None, collision="corners",
+                 observation="rays", patch_size=32, patch_cell_size=4.0):
+        """
+        Initialize environment.
+
+        Args:
+            track_file: Track PNG (used when no track_pool is given)
+            render_mode: None, "human" or "rgb_array"
+            max_steps: Episode step limit
+            track_pool: List of track PNGs - one is sampled on every reset()
+            track_weights: Sampling weights for track_pool (default: uniform)
+            track_registry: TrackRegistry to load tracks from (shared between
+                envs in one process; default: own registry)
+            progress_reward: "geodesic" rewards progress along the track
+                (precomputed progress field, falls back to straight-line on
+                tracks without one), "euclidean" straight-line distance to
+                the next checkpoint's midpoint
+            ray_table: Look raycasts up in a precomputed table instead of
+                casting them (interpolated, max error checked on load - see
+                core/ray_table.py). True uses
+                default table parameters, a dict is passed to
+                load_ray_table() (e.g. {"cell_size": 2}). Tables are built
+                on first use and cached next to the track PNG
+            collision: Wall collision test - "corners" (4 rectangle corners)
+                or "footprint" (whole rectangle, thin walls cannot pass
+                between corners)
+            observation: Observation mode (see OBSERVATION_MODES)
+            patch_size: Patch edge in cells (patch modes)
+            patch_cell_size: Pixels per patch cell - the car sees
+                patch_size * patch_cell_size pixels around it
+        """
         super().__init__()
 
         self.render_mode = render_mode
@@ -42,13 +89,30 @@ class RacingEnv(gym.Env):
         self._steps_without_progress = 0
         self._max_steps_without_progress = 300
 
-        # Load track
-        loader = TrackLoader()
-        track_data = loader.load_from_png(track_file)
-        self._track = Track(track_data=track_data)
+        if progress_reward not in ("geodesic", "euclidean"):
+            raise ValueError(f"Unknown progress_reward: {progress_reward}")
+        self._progress_reward = progress_reward
+        if observation not in self.OBSERVATION_MODES:
+            raise ValueError(f"Unknown observation mode: {observation}")
+        self._observation = observation
+
+        # Track pool - loaded through an LRU registry, switched on reset()
+        self._track_pool = list(track_pool) if track_pool else [track_file]
+        if track_weights is not None:
+            if len(track_weights) != len(self._track_pool):
+                raise ValueError("track_weights must have one weight per track in track_pool")
+            weights = np.asarray(track_weights, dtype=np.float64)
+            self._track_weights = weights / weights.sum()
+        else:
+            self._track_weights = None
+        if track_registry is None:
+            track_registry = TrackRegistry(self._track_pool)
+        self._track_registry = track_registry
+        self._track_file = self._track_pool[0]
+        self._track = self._track_registry.get(self._track_file)
 
         # Physics
-        self._physics = PhysicsEngine()
+        self._physics = PhysicsEngine(collision)
 
         # AI vehicle
         start_x, start_y = self._track.start_position
@@ -58,47 +122,80 @@ class RacingEnv(gym.Env):
         # Checkpoint tracking
         self._next_checkpoint = 0
         self._laps_completed = 0
+        self._dist_to_cp = None  # Carried over between steps (one lookup per step)
+
+        # Lap times in simulation time (independent of how fast env is stepped)
+        self._lap_timer = LapTimer(clock="ticks", tick_dt=self.TICK_DT)
 
         # Raycast range (longer = sees walls further away)
         self._max_raycast_distance = 500
 
+        # Ray tables (None = exact raycasts), one per track of the pool
+        if ray_table is None or ray_table is False:
+            self._ray_table_params = None
+        else:
+            self._ray_table_params = dict(ray_table) if isinstance(ray_table, dict) else {}
+            self._ray_table_params['max_distance'] = self._max_raycast_distance
+        self._ray_tables = {}
+        self._ray_table = self._get_ray_table(self._track_file)
+
+        # Occupancy patch (patch modes), padded grid prepared once per track
+        self._patch = OccupancyPatch(patch_size, patch_cell_size) if observation != "rays" else None
+        self._patch_grids = {}
+        self._patch_grid = self._get_patch_grid(self._track_file)
+
         # Action space: 5 discrete
         self.action_space = spaces.Discrete(5)
 
-        # Observation space: 7 raycasts + speed + checkpoint distance
-        self.observation_space = spaces.Box(
-            low=-1.0,
-            high=1.0,
-            shape=(9,),
-            dtype=np.float32
-        )
+        if observation == "rays":
+            # Observation space: 7 raycasts + speed + checkpoint distance
+            self.observation_space = spaces.Box(
+                low=-1.0,
+                high=1.0,
+                shape=(9,),
+                dtype=np.float32
+            )
+        elif observation == "patch":
+            self.observation_space = spaces.Dict({
+                "state": spaces.Box(low=-1.0, high=1.0, shape=(2,), dtype=np.float32),
+                "patch": spaces.Box(low=0, high=1, shape=self._patch.shape, dtype=np.uint8),
+            })
+        else:
+            self.observation_space = spaces.Box(
+                low=-1.0,
+                high=1.0,
+                shape=(2 + patch_size * patch_size,),
+                dtype=np.float32
+            )
 
         # Pygame for rendering (lazy init)
         self._screen = None
         self._clock = None
         self._renderer = None
+        self._frame = None  # Reusable rgb_array buffer backing the offscreen surface
+
+        # Replay recording (off until start_replay)
+        self._replay = None
+        self._replay_tick = 0
+        self._replay_episode = 0
 
     def _get_observation(self):
         """Returns normalized observations."""
-        # Raycasts (7 values, normalized 0-1)
-        distances, _ = self._car.get_raycasts(self._track, self._max_raycast_distance)
-        normalized_rays = [d / self._max_raycast_distance for d in distances]
-
-        # Speed (normalized -1 to 1)
-        normalized_speed = self._car.speed / self._car.MAX_SPEED
-
-        # Distance to next checkpoint
-        if self._next_checkpoint < len(self._track.checkpoints):
-            cp = self._track.checkpoints[self._next_checkpoint]
-            cp_x = (cp['x1'] + cp['x2']) / 2
-            cp_y = (cp['y1'] + cp['y2']) / 2
-            dist = np.sqrt((self._car.x - cp_x)**2 + (self._car.y - cp_y)**2)
-            max_dist = np.sqrt(self._track._width**2 + self._track._height**2)
-            normalized_cp_dist = min(dist / max_dist, 1.0)
-        else:
-            normalized_cp_dist = 0.0
-
-        obs = np.array(normalized_rays + [normalized_speed, normalized_cp_dist], dtype=np.float32)
+        if self._observation == "rays":
+            obs = self._car.get_observation(
+                self._track, self._next_checkpoint, self._max_raycast_distance, self._ray_table
+            )
+            return np.array(obs, dtype=np.float32)
+
+        state = AICar.get_state_features([self._car], self._track, [self._next_checkpoint])[0]
+        if self._observation == "patch":
+            patch = self._patch.sample(self._patch_grid, self._car.x, self._car.y, self._car.angle)
+            return {"state": state.astype(np.float32), "patch": patch}
+
+        obs = np.empty(self.observation_space.shape, dtype=np.float32)
+        obs[:2] = state
+        self._patch.sample(self._patch_grid, self._car.x, self._car.y, self._car.angle,
+                           out=obs[2:].reshape(self._patch.shape))
         return obs
 
     def _get_info(self):
@@ -108,13 +205,29 @@ class RacingEnv(gym.Env):
             "total_checkpoints": self._track.total_checkpoints,
             "laps": self._laps_completed,
             "speed": self._car.speed,
-            "position": (self._car.x, self._car.y)
+            "position": (self._car.x, self._car.y),
+            "lap_time": self._lap_timer.current_lap_time,
+            "last_lap_time": self._lap_timer.last_lap_time,
+            "best_lap_time": self._lap_timer.best_lap_time,
+            "track": self._track_file,
+            "distance_to_checkpoint": self._dist_to_cp
         }
 
     def reset(self, seed=None, options=None):
-        """Reset environment to initial state."""
+        """
+        Reset environment to initial state.
+
+        With a track pool a new track is sampled (options={"track": path}
+        selects one explicitly).
+        """
         super().reset(seed=seed)
 
+        if options and options.get("track"):
+            self._set_track(options["track"])
+        elif len(self._track_pool) > 1:
+            index = self.np_random.choice(len(self._track_pool), p=self._track_weights)
+            self._set_track(self._track_pool[index])
+
         # Reset position
         start_x, start_y = self._track.start_position
         self._car.set_position(start_x, start_y)
@@ -124,11 +237,17 @@ class RacingEnv(gym.Env):
         # Reset checkpoints
         self._next_checkpoint = 0
         self._laps_completed = 0
-        self._track.reset_checkpoints()
+        self._lap_timer.reset()
+        self._lap_timer.start_race()
 
         # Reset steps
         self._current_step = 0
         self._steps_without_progress = 0
+        self._dist_to_cp = self._get_distance_to_checkpoint()
+
+        if self._replay is not None:
+            self._replay_episode += 1
+            self._record_replay(action=-1)
 
         return self._get_observation(), self._get_info()
 
@@ -149,19 +268,14 @@ class RacingEnv(gym.Env):
         self._current_step += 1
         self._steps_without_progress += 1
 
-        # Save old position and distance to checkpoint
+        # Save old position (distance to checkpoint is kept from last step)
         old_x, old_y = self._car.x, self._car.y
-        old_dist_to_cp = self._get_distance_to_checkpoint()
+        old_dist_to_cp = self._dist_to_cp
 
         # Execute action
         self._car.set_action(action)
-        self._car.update(1/60)  # dt = 1/60
-
-        # New distance to checkpoint
-        new_dist_to_cp = self._get_distance_to_checkpoint()
-
-        # Calculate distance moved
-        distance_moved = np.sqrt((self._car.x - old_x)**2 + (self._car.y - old_y)**2)
+        self._car.update(self.TICK_DT)
+        self._lap_timer.tick()
 
         # === REWARD SYSTEM ===
         reward = 0.0
@@ -172,6 +286,10 @@ class RacingEnv(gym.Env):
             reward -= 5
             had_collision = True
 
+        # New distance to checkpoint (after collision push - where the car is)
+        new_dist_to_cp = self._get_distance_to_checkpoint()
+        self._dist_to_cp = new_dist_to_cp
+
         # Reward for getting closer to checkpoint
         if old_dist_to_cp is not None and new_dist_to_cp is not None:
             progress = old_dist_to_cp - new_dist_to_cp
@@ -188,11 +306,13 @@ class RacingEnv(gym.Env):
         terminated = False
         truncated = False
 
-        # Check checkpoint
-        if self._track.check_checkpoint_crossing(
+        # Check checkpoint (pure test - tracks may be shared between envs)
+        next_checkpoint = self._next_checkpoint
+        if self._track.crosses_checkpoint(
             old_x, old_y, self._car.x, self._car.y, self._next_checkpoint
         ):
             reward += 200  # Checkpoint reward
+            self._lap_timer.record_split(self._next_checkpoint)
             self._next_checkpoint += 1
             self._steps_without_progress = 0
 
@@ -202,11 +322,15 @@ class RacingEnv(gym.Env):
                 # Time bonus: faster lap = more points
                 time_bonus = 500 * (self.max_steps - self._current_step) / self.max_steps
                 reward += 1000 + time_bonus
+                self._lap_timer.complete_lap()
                 self._laps_completed += 1
                 self._next_checkpoint = 0
-                self._track.reset_checkpoints()
                 self._steps_without_progress = 0
 
+        # New target line - measure from here on
+        if self._next_checkpoint != next_checkpoint:
+            self._dist_to_cp = self._get_distance_to_checkpoint()
+
         # Check no-progress limit
         if self._steps_without_progress >= self._max_steps_without_progress:
             truncated = True
@@ -215,10 +339,157 @@ class RacingEnv(gym.Env):
         if self._current_step >= self.max_steps:
             truncated = True
 
+        if self._replay is not None:
+            self._record_replay(action)
+
         return self._get_observation(), reward, terminated, truncated, self._get_info()
 
+    # get_state() layout - fixed size, float64 (exact for all values)
+    _STATE_TRACK = 0        # Index in track_pool (get_state() refuses tracks outside it)
+    _STATE_CAR = 1          # x, y, speed, angle, action
+    _STATE_PROGRESS = 6     # next checkpoint, laps, step, steps without progress, distance to checkpoint
+    _STATE_TIMER = 11       # LapTimer.get_state()
+    STATE_SIZE = _STATE_TIMER + LapTimer.STATE_SIZE
+
+    def get_state(self, out=None):
+        """
+        Snapshot of all dynamic env state as a float64 array of STATE_SIZE.
+
+        Restoring it with set_state() (on this env or any env created with
+        the same track pool) continues with identical observations, rewards
+        and infos. Not included: the np_random generator (only used to
+        sample tracks on reset), replay recording, rendering, and lap split
+        history (not used by the env).
+
+        The track is stored as its index in the track pool, so a track
+        selected with reset(options={"track": ...}) that is not in the pool
+        cannot be saved.
+
+        Args:
+            out: Optional array to write into (e.g. a row of a batch)
+
+        Raises:
+            ValueError: Current track is not in the track pool
+        """
+        if self._track_file not in self._track_pool:
+            raise ValueError(f"Track {self._track_file} is not in the track pool - "
+                             f"state cannot be restored on it")
+        state = np.empty(self.STATE_SIZE, dtype=np.float64) if out is None else out
+        car = self._car
+        state[:self._STATE_TIMER] = (
+            self._track_pool.index(self._track_file),
+            car.x, car.y, car.speed, car.angle, car.action,
+            self._next_checkpoint, self._laps_completed, self._current_step,
+            self._steps_without_progress,
+            np.nan if self._dist_to_cp is None else self._dist_to_cp,
+        )
+        state[self._STATE_TIMER:] = self._lap_timer.get_state()
+        return state
+
+    def set_state(self, state, observe=True):
+        """
+        Restore state saved with get_state().
+
+        Args:
+            state: Array from get_state()
+            observe: Compute the observation (raycasts - most of the cost;
+                not needed when step() follows anyway)
+
+        Returns:
+            Observation in the restored state (None if observe is False)
+
+        Raises:
+            ValueError: State refers to a track outside this env's pool
+        """
+        (track, x, y, speed, angle, action, next_checkpoint, laps, step,
+         steps_without_progress, dist_to_cp) = state[:self._STATE_TIMER].tolist()
+
+        track = int(track)
+        if not 0 <= track < len(self._track_pool):
+            raise ValueError(f"State is for track {track}, track pool has {len(self._track_pool)} tracks")
+        if self._track_pool[track] != self._track_file:
+            self._set_track(self._track_pool[track])
+
+        self._car.set_position(x, y)
+        self._car.set_speed(speed)
+        self._car.set_angle(angle)
+        self._car.set_action(int(action))
+        self._next_checkpoint = int(next_checkpoint)
+        self._laps_completed = int(laps)
+        self._current_step = int(step)
+        self._steps_without_progress = int(steps_without_progress)
+        self._dist_to_cp = None if dist_to_cp != dist_to_cp else dist_to_cp  # NaN = None
+        self._lap_timer.set_state(state[self._STATE_TIMER:])
+        return self._get_observation() if observe else None
+
+    def _set_track(self, track_file):
+        self._track_file = track_file
+        self._track = self._track_registry.get(track_file)
+        self._ray_table = self._get_ray_table(track_file)
+        self._patch_grid = self._get_patch_grid(track_file)
+
+    def _get_patch_grid(self, track_file):
+        if self._patch is None:
+            return None
+        if track_file not in self._patch_grids:
+            self._patch_grids[track_file] = self._patch.prepare(self._track)
+        return self._patch_grids[track_file]
+
+    def _get_ray_table(self, track_file):
+        if self._ray_table_params is None:
+            return None
+        if track_file not in self._ray_tables:
+            # Memory-mapped - stays small even with large track pools
+            self._ray_tables[track_file] = load_ray_table(track_file, self._track,
+                                                          **self._ray_table_params)
+        return self._ray_tables[track_file]
+
+    @property
+    def track_file(self):
+        return self._track_file
+
+    @property
+    def track_pool(self):
+        return list(self._track_pool)
+
+    def start_replay(self, path, model=None):
+        """
+        Start recording every step into a binary replay file.
+
+        Args:
+            path: Replay file path
+            model: Model id stored in replay header (e.g. model path)
+        """
+        self.stop_replay()
+        self._replay = ReplayWriter(path, track=self._track_file, model=model,
+                                    tick_dt=self.TICK_DT)
+        self._replay_tick = 0
+        self._replay_episode = 0
+
+    def stop_replay(self):
+        """Stop recording and close replay file."""
+        if self._replay is not None:
+            self._replay.close()
+            self._replay = None
+
+    def _record_replay(self, action):
+        self._replay.record(
+            self._replay_tick, self._car, action=int(action),
+            checkpoint=self._next_checkpoint, lap=self._laps_completed,
+            episode=self._replay_episode % 65536
+        )
+        self._replay_tick += 1
+
     def _get_distance_to_checkpoint(self):
-        """Return distance to next checkpoint."""
+        """
+        Return distance to next checkpoint (None if there is none to measure).
+
+        Geodesic mode is a single progress field lookup and also measures
+        the way to the finish line after the last checkpoint.
+        """
+        if self._progress_reward == "geodesic" and self._track.progress_field is not None:
+            return self._track.distance_along_track(self._car.x, self._car.y, self._next_checkpoint)
+
         if self._next_checkpoint < len(self._track.checkpoints):
             cp = self._track.checkpoints[self._next_checkpoint]
             cp_x = (cp['x1'] + cp['x2']) / 2
@@ -227,30 +498,63 @@ class RacingEnv(gym.Env):
         return None
 
     def render(self):
-        """Render current game state."""
+        """
+        Render current game state.
+
+        In "human" mode draws to a window. In "rgb_array" mode draws into an
+        offscreen surface (no display needed, works with SDL_VIDEODRIVER=dummy)
+        and returns it as a (height, width, 3) uint8 array. The surface is
+        backed by that array, so no per-frame copy is made - the same buffer
+        is reused and overwritten on the next call (copy it to keep a frame).
+        """
         if self.render_mode is None:
             return
 
-        # Initialize pygame on first render
-        if self._screen is None:
-            import pygame
-            from core.renderer import Renderer
+        import pygame
+
+        # Initialize pygame on first render (and when track size changes)
+        if self._screen is None or self._screen.get_size() != (self._track.width, self._track.height):
+            self._init_rendering()
+
+        if self.render_mode == "human":
+            # Handle events (so window doesn't freeze)
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self.close()
+                    return
+
+        self._draw_frame()
+
+        if self.render_mode == "rgb_array":
+            self._renderer.finish_frame()
+            return self._frame
+
+        self._renderer.update_display()
+        self._clock.tick(self.metadata["render_fps"])
+
+    def _init_rendering(self):
+        """Create window (human) or array-backed offscreen surface (rgb_array)."""
+        import pygame
+        from core.renderer import Renderer
 
+        width, height = self._track.width, self._track.height
+
+        if self.render_mode == "rgb_array":
+            # Only fonts are needed offscreen - no display/video init
+            pygame.font.init()
+            self._frame = np.zeros((height, width, 3), dtype=np.uint8)
+            self._screen = pygame.image.frombuffer(self._frame, (width, height), "RGB")
+            # Static track is cached, so each frame only redraws the car and text
+            self._renderer = Renderer(self._screen, dirty_rects=True)
+        else:
             pygame.init()
-            self._screen = pygame.display.set_mode((self._track._width, self._track._height))
+            self._screen = pygame.display.set_mode((width, height))
             pygame.display.set_caption("Racing AI Training")
             self._clock = pygame.time.Clock()
             self._renderer = Renderer(self._screen)
 
-        import pygame
-
-        # Handle events (so window doesn't freeze)
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                self.close()
-                return
-
-        # Rendering
+    def _draw_frame(self):
+        """Draw track, car, raycasts and info onto the render surface."""
         self._renderer.clear(self._track.background_color)
         self._renderer.draw_track(self._track, show_checkpoints=True)
         self._renderer.draw_vehicle(self._car)
@@ -264,12 +568,12 @@ class RacingEnv(gym.Env):
         self._renderer.draw_text(f"Checkpoint: {self._next_checkpoint}/{self._track.total_checkpoints}", 10, 45)
         self._renderer.draw_text(f"Laps: {self._laps_completed}", 10, 80)
 
-        self._renderer.update_display()
-        self._clock.tick(60)
-
     def close(self):
         """Close environment."""
+        self.stop_replay()
         if self._screen is not None:
-            import pygame
-            pygame.quit()
+            if self.render_mode == "human":
+                import pygame
+                pygame.quit()
             self._screen = None
+            self._frame = None
@@ -0,0 +1,343 @@
+import ctypes
+import multiprocessing as mp
+
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper, VecEnv
+from stable_baselines3.common.vec_env.patch_gym import _patch_env
+
+
+# Worker commands (shared memory) - anything but a step goes through the pipe
+_CMD_STEP = 0
+_CMD_PIPE = 1
+
+_WORKER_TIMEOUT = 1.0  # Seconds between liveness checks while waiting for workers
+
+
+class _SharedArrays:
+    """
+    Numpy arrays over shared memory - one block per array, first axis is
+    the env index. Created in the parent, passed to workers on start.
+    """
+
+    def __init__(self, ctx, specs):
+        """
+        Args:
+            ctx: Multiprocessing context
+            specs: Dict name -> (shape, dtype)
+        """
+        self._specs = {name: (tuple(shape), np.dtype(dtype)) for name, (shape, dtype) in specs.items()}
+        self._raw = {name: ctx.RawArray(ctypes.c_byte, max(int(np.prod(shape)) * dtype.itemsize, 1))
+                     for name, (shape, dtype) in self._specs.items()}
+        self._arrays = None
+
+    def __getstate__(self):
+        return {'_specs': self._specs, '_raw': self._raw, '_arrays': None}
+
+    def __getitem__(self, name):
+        if self._arrays is None:
+            self._arrays = {
+                name: np.frombuffer(self._raw[name], dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+                for name, (shape, dtype) in self._specs.items()
+            }
+        return self._arrays[name]
+
+
+def _obs_keys(space):
+    """Buffer names of observation parts (one per Dict key, one for a Box)."""
+    if isinstance(space, spaces.Dict):
+        return list(space.spaces.keys())
+    return [None]
+
+
+def _obs_space(space, key):
+    return space if key is None else space.spaces[key]
+
+
+def _write_obs(buffers, index, space, obs):
+    for key in _obs_keys(space):
+        buffers[('obs', key)][index] = obs if key is None else obs[key]
+
+
+def _read_obs(buffers, space, indices=slice(None)):
+    """Copy of observations (buffers are overwritten by the next step)."""
+    if isinstance(space, spaces.Dict):
+        return {key: buffers[('obs', key)][indices].copy() for key in _obs_keys(space)}
+    return buffers[('obs', None)][indices].copy()
+
+
+def _probe_spaces(remote, env_fn_wrapper):
+    env = _patch_env(env_fn_wrapper.var())
+    remote.send((env.observation_space, env.action_space))
+    env.close()
+    remote.close()
+
+
+def _worker(index, remote, parent_remote, env_fn_wrapper, buffers, observation_space,
+            commands, go, done):
+    from stable_baselines3.common.env_util import is_wrapped
+
+    parent_remote.close()
+    env = _patch_env(env_fn_wrapper.var())
+    actions = buffers['actions']
+    rewards = buffers['rewards']
+    dones = buffers['dones']
+
+    while True:
+        try:
+            go[index].acquire()
+            if commands[index] == _CMD_STEP:
+                observation, reward, terminated, truncated, info = env.step(actions[index])
+                is_done = terminated or truncated
+                if is_done:
+                    info["TimeLimit.truncated"] = truncated and not terminated
+                    info["terminal_observation"] = observation
+                    observation, reset_info = env.reset()
+
+                _write_obs(buffers, index, observation_space, observation)
+                rewards[index] = reward
+                dones[index] = is_done
+                done[index].release()
+
+                # Infos only at episode end (after release - parent reads them
+                # once all envs stepped, a big info cannot block the pipe)
+                if is_done:
+                    remote.send((info, reset_info))
+                continue
+
+            cmd, data = remote.recv()
+            if cmd == "reset":
+                maybe_options = {"options": data[1]} if data[1] else {}
+                observation, reset_info = env.reset(seed=data[0], **maybe_options)
+                remote.send((observation, reset_info))
+            elif cmd == "render":
+                remote.send(env.render())
+            elif cmd == "close":
+                env.close()
+                remote.close()
+                break
+            elif cmd == "get_spaces":
+                remote.send((env.observation_space, env.action_space))
+            elif cmd == "env_method":
+                method = env.get_wrapper_attr(data[0])
+                remote.send(method(*data[1], **data[2]))
+            elif cmd == "get_attr":
+                remote.send(env.get_wrapper_attr(data))
+            elif cmd == "has_attr":
+                try:
+                    env.get_wrapper_attr(data)
+                    remote.send(True)
+                except AttributeError:
+                    remote.send(False)
+            elif cmd == "set_attr":
+                remote.send(setattr(env, data[0], data[1]))
+            elif cmd == "is_wrapped":
+                remote.send(is_wrapped(env, data))
+            else:
+                raise NotImplementedError(f"`{cmd}` is not implemented in the worker")
+        except (EOFError, KeyboardInterrupt):
+            break
+
+
+def _as_index(indices):
+    """Env indices as a slice if contiguous (buffer views, no fancy indexing)."""
+    if isinstance(indices, slice):
+        return indices
+    indices = np.asarray(indices, dtype=np.intp).ravel()
+    if len(indices) and np.array_equal(indices, np.arange(indices[0], indices[0] + len(indices))):
+        return slice(int(indices[0]), int(indices[0]) + len(indices))
+    return indices
+
+
+class SharedMemoryVecEnv(VecEnv):
+    """
+    Multiprocess VecEnv exchanging step data through shared memory.
+
+    Drop-in replacement for SubprocVecEnv. Actions, observations, rewards
+    and dones live in preallocated shared arrays; a step is one semaphore
+    release per worker and one shared semaphore the workers release when
+    done - nothing is pickled. Info dicts are only sent (through a pipe)
+    at episode end, other steps get an empty info. Everything else
+    (reset, get_attr, env_method, ...) uses the pipe like SubprocVecEnv.
+
+    Groups of envs can also be stepped independently (step_group_async /
+    step_group_wait), e.g. to compute actions for one group while the other
+    steps.
+
+    Supports Box and Dict observation spaces.
+    """
+
+    def __init__(self, env_fns, start_method=None):
+        """
+        Start one worker process per env.
+
+        Args:
+            env_fns: Env constructors (called in the workers)
+            start_method: Multiprocessing start method (default: forkserver
+                where available, spawn otherwise)
+        """
+        self.waiting = False
+        self.closed = False
+        n_envs = len(env_fns)
+
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+        ctx = mp.get_context(start_method)
+
+        # Spaces are needed for the buffer layout before workers start. Ask a
+        # throwaway process - env constructors may configure their process
+        # (e.g. CPU pinning), so they must not run in this one
+        remote, work_remote = ctx.Pipe()
+        probe = ctx.Process(target=_probe_spaces, args=(work_remote, CloudpickleWrapper(env_fns[0])),
+                            daemon=True)
+        probe.start()
+        work_remote.close()
+        observation_space, action_space = remote.recv()
+        probe.join()
+
+        specs = {
+            'actions': ((n_envs, *action_space.shape), action_space.dtype or np.int64),
+            'rewards': ((n_envs,), np.float64),  # SubprocVecEnv returns float64 rewards
+            'dones': ((n_envs,), np.bool_),
+        }
+        for key in _obs_keys(observation_space):
+            space = _obs_space(observation_space, key)
+            specs[('obs', key)] = ((n_envs, *space.shape), space.dtype)
+        self._buffers = _SharedArrays(ctx, specs)
+
+        self._commands = ctx.RawArray(ctypes.c_int, n_envs)
+        self._go = [ctx.Semaphore(0) for _ in range(n_envs)]
+        self._done = [ctx.Semaphore(0) for _ in range(n_envs)]
+
+        self.remotes, self.work_remotes = zip(*[ctx.Pipe() for _ in range(n_envs)])
+        self.processes = []
+        for index, (work_remote, remote, env_fn) in enumerate(zip(self.work_remotes, self.remotes, env_fns)):
+            args = (index, work_remote, remote, CloudpickleWrapper(env_fn), self._buffers,
+                    observation_space, self._commands, self._go, self._done)
+            # daemon=True: if the main process crashes, workers do not hang
+            process = ctx.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        super().__init__(n_envs, observation_space, action_space)
+
+    def _send(self, index, message):
+        """Wake a worker for a pipe command."""
+        self._commands[index] = _CMD_PIPE
+        self.remotes[index].send(message)
+        self._go[index].release()
+
+    def step_async(self, actions):
+        self.step_group_async(actions, range(self.num_envs))
+        self.waiting = True
+
+    def step_wait(self):
+        self.waiting = False
+        return self.step_group_wait(range(self.num_envs))
+
+    def step_group_async(self, actions, indices):
+        """
+        Start a step of some envs only.
+
+        Args:
+            actions: Actions of these envs (in indices order)
+            indices: Env indices (a contiguous range is fastest)
+        """
+        indices = _as_index(indices)
+        buffer = self._buffers['actions']
+        buffer[indices] = np.asarray(actions).reshape(buffer[indices].shape)
+        for index in np.arange(self.num_envs)[indices]:
+            self._commands[index] = _CMD_STEP
+            self._go[index].release()
+
+    def step_group_wait(self, indices):
+        """
+        Wait for a step started with step_group_async().
+
+        Returns:
+            (obs, rewards, dones, infos) of these envs, in indices order
+        """
+        indices = _as_index(indices)
+        env_indices = np.arange(self.num_envs)[indices]
+        self._wait_workers(env_indices)
+
+        dones = self._buffers['dones'][indices].copy()
+        infos = [{} for _ in env_indices]
+        for i in np.flatnonzero(dones):
+            infos[i], self.reset_infos[env_indices[i]] = self.remotes[env_indices[i]].recv()
+
+        return (_read_obs(self._buffers, self.observation_space, indices),
+                self._buffers['rewards'][indices].copy(), dones, infos)
+
+    def _wait_workers(self, indices):
+        """Wait until workers finished their step (fail if one died)."""
+        for index in indices:
+            while not self._done[index].acquire(timeout=_WORKER_TIMEOUT):
+                if not self.processes[index].is_alive():
+                    raise RuntimeError(f"Env worker {index} died during step")
+
+    def reset(self):
+        for index in range(self.num_envs):
+            self._send(index, ("reset", (self._seeds[index], self._options[index])))
+        results = [remote.recv() for remote in self.remotes]
+        obs, self.reset_infos = zip(*results)
+        self.reset_infos = list(self.reset_infos)
+        # Seeds and options are only used once
+        self._reset_seeds()
+        self._reset_options()
+
+        for index, observation in enumerate(obs):
+            _write_obs(self._buffers, index, self.observation_space, observation)
+        return _read_obs(self._buffers, self.observation_space)
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            self.step_wait()
+        for index in range(self.num_envs):
+            self._send(index, ("close", None))
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+    def get_images(self):
+        for index in range(self.num_envs):
+            self._send(index, ("render", None))
+        return [remote.recv() for remote in self.remotes]
+
+    def has_attr(self, attr_name):
+        """Check if an attribute exists for a vectorized environment. (see base class)."""
+        for index in range(self.num_envs):
+            self._send(index, ("has_attr", attr_name))
+        return all([remote.recv() for remote in self.remotes])
+
+    def get_attr(self, attr_name, indices=None):
+        """Return attribute from vectorized environment (see base class)."""
+        indices = list(self._get_indices(indices))
+        for index in indices:
+            self._send(index, ("get_attr", attr_name))
+        return [self.remotes[index].recv() for index in indices]
+
+    def set_attr(self, attr_name, value, indices=None):
+        """Set attribute inside vectorized environments (see base class)."""
+        indices = list(self._get_indices(indices))
+        for index in indices:
+            self._send(index, ("set_attr", (attr_name, value)))
+        for index in indices:
+            self.remotes[index].recv()
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        """Call instance methods of vectorized environments."""
+        indices = list(self._get_indices(indices))
+        for index in indices:
+            self._send(index, ("env_method", (method_name, method_args, method_kwargs)))
+        return [self.remotes[index].recv() for index in indices]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        """Check if worker environments are wrapped with a given wrapper."""
+        indices = list(self._get_indices(indices))
+        for index in indices:
+            self._send(index, ("is_wrapped", wrapper_class))
+        return [self.remotes[index].recv() for index in indices]
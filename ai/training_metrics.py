@@ -0,0 +1,132 @@
+import csv
+import os
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-size buffer of the last N values with a running sum.
+
+    Memory does not grow with training length, and the mean is O(1).
+    """
+
+    def __init__(self, capacity, dtype=np.float64):
+        self._values = np.zeros(capacity, dtype=dtype)
+        self._capacity = capacity
+        self._count = 0
+        self._index = 0
+        self._sum = 0.0
+
+    def append(self, value):
+        if self._count == self._capacity:
+            self._sum -= self._values[self._index]
+        else:
+            self._count += 1
+        self._values[self._index] = value
+        self._sum += value
+        self._index = (self._index + 1) % self._capacity
+        if self._index == 0:
+            self._sum = float(self._values.sum())  # Drop accumulated rounding error
+
+    @property
+    def values(self):
+        """Stored values, oldest first (a copy)."""
+        if self._count < self._capacity:
+            return self._values[:self._count].copy()
+        return np.roll(self._values, -self._index)
+
+    @property
+    def mean(self):
+        return self._sum / self._count if self._count else 0.0
+
+    @property
+    def max(self):
+        return self._values[:self._count].max() if self._count else 0.0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def __len__(self):
+        return self._count
+
+
+class MetricsLog:
+    """
+    Append-only CSV of training metrics, one row per log interval.
+
+    Every row is flushed right away, so the file can be read (or plotted)
+    while training runs and survives a crash.
+    """
+
+    def __init__(self, path, fields):
+        """
+        Create a new metrics file (an existing one is replaced).
+
+        Args:
+            path: CSV file path
+            fields: Column names
+        """
+        self._path = path
+        self._fields = list(fields)
+        self._file = open(path, 'w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self._fields)
+        self._file.flush()
+
+    def write(self, **row):
+        self._writer.writerow([row[field] for field in self._fields])
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    @property
+    def path(self):
+        return self._path
+
+
+def read_metrics(path):
+    """Read metrics CSV into a dict of column name -> float array."""
+    with open(path, 'r', newline='') as f:
+        rows = list(csv.reader(f))
+    if not rows:
+        return {}
+
+    header, data = rows[0], np.array(rows[1:], dtype=np.float64).reshape(-1, len(rows[0]))
+    return {name: data[:, i] for i, name in enumerate(header)}
+
+
+def plot_metrics(metrics_path, plot_path):
+    """
+    Render reward and checkpoint curves from a metrics CSV.
+
+    Returns:
+        True if the plot was saved (needs at least 2 rows)
+    """
+    metrics = read_metrics(metrics_path)
+    if not metrics or len(metrics['timesteps']) < 2:
+        return False
+
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8))
+
+    ax1.plot(metrics['timesteps'], metrics['mean_reward'], 'b-', linewidth=2)
+    ax1.set_xlabel('Steps')
+    ax1.set_ylabel('Mean Reward')
+    ax1.set_title('Reward over training')
+    ax1.grid(True)
+
+    ax2.plot(metrics['timesteps'], metrics['mean_checkpoints'], 'g-', linewidth=2)
+    ax2.set_xlabel('Steps')
+    ax2.set_ylabel('Mean Checkpoints')
+    ax2.set_title('Checkpoints over training')
+    ax2.grid(True)
+
+    plt.tight_layout()
+    os.makedirs(os.path.dirname(plot_path) or '.', exist_ok=True)
+    plt.savefig(plot_path, dpi=150)
+    plt.close(fig)
+    return True
@@ -0,0 +1,160 @@
+import csv
+import json
+import os
+
+import numpy as np
+
+
+class FrameRecorder:
+    """
+    Streams rendered frames to disk as a raw RGB file plus an index.
+
+    Output directory layout:
+        frames.rgb  - concatenated uint8 frames (height x width x 3 each)
+        index.csv   - one row per frame: frame, step, episode, offset
+        meta.json   - frame size, fps and frame count
+
+    Every frame is written as soon as it is added, so memory use does not
+    grow with recording length. Convert to video e.g. with:
+        ffmpeg -f rawvideo -pix_fmt rgb24 -s WxH -r FPS -i frames.rgb out.mp4
+    """
+
+    FRAMES_FILE = "frames.rgb"
+    INDEX_FILE = "index.csv"
+    META_FILE = "meta.json"
+
+    def __init__(self, output_dir, fps=60, frame_skip=1, scale=1, flush_every=60):
+        """
+        Initialize recorder.
+
+        Args:
+            output_dir: Directory for recorded files (created if missing)
+            fps: Playback frame rate of the source (before frame_skip)
+            frame_skip: Keep every N-th frame (lowers output frame rate)
+            scale: Keep every N-th pixel in both axes (lowers resolution)
+            flush_every: Flush files to disk every N written frames
+        """
+        self._output_dir = output_dir
+        self._fps = fps
+        self._frame_skip = max(1, int(frame_skip))
+        self._scale = max(1, int(scale))
+        self._flush_every = flush_every
+
+        self._frame_shape = None
+        self._frames_written = 0
+        self._frames_seen = 0
+        self._offset = 0
+
+        os.makedirs(output_dir, exist_ok=True)
+        self._frames_file = open(os.path.join(output_dir, self.FRAMES_FILE), 'wb')
+        self._index_file = open(os.path.join(output_dir, self.INDEX_FILE), 'w', newline='')
+        self._index_writer = csv.writer(self._index_file)
+        self._index_writer.writerow(['frame', 'step', 'episode', 'offset'])
+
+    def add_frame(self, frame, step=0, episode=0):
+        """
+        Add rendered frame (height x width x 3 uint8 array).
+
+        Frames are dropped according to frame_skip. The array is only read,
+        so a reused render buffer can be passed directly.
+
+        Returns:
+            True if frame was written
+        """
+        keep = self.wants_frame()
+        self._frames_seen += 1
+        if not keep:
+            return False
+
+        if self._scale > 1:
+            frame = frame[::self._scale, ::self._scale]
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+
+        if self._frame_shape is None:
+            self._frame_shape = frame.shape
+            self._write_meta()
+        elif frame.shape != self._frame_shape:
+            raise ValueError(f"Frame shape changed: {frame.shape} != {self._frame_shape}")
+
+        self._frames_file.write(frame.data)
+        self._index_writer.writerow([self._frames_written, step, episode, self._offset])
+        self._offset += frame.nbytes
+        self._frames_written += 1
+
+        if self._frames_written % self._flush_every == 0:
+            self._frames_file.flush()
+            self._index_file.flush()
+
+        return True
+
+    def wants_frame(self):
+        """Return True if next frame will be kept (lets callers skip rendering)."""
+        return self._frames_seen % self._frame_skip == 0
+
+    def skip_frame(self):
+        """Advance frame counter without rendering a frame that would be dropped."""
+        self._frames_seen += 1
+
+    def _write_meta(self):
+        height, width = self._frame_shape[:2]
+        meta = {
+            'width': width,
+            'height': height,
+            'channels': 3,
+            'dtype': 'uint8',
+            'fps': self._fps / self._frame_skip,
+            'frames': self._frames_written,
+            'frames_file': self.FRAMES_FILE,
+            'index_file': self.INDEX_FILE
+        }
+        with open(os.path.join(self._output_dir, self.META_FILE), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    def close(self):
+        """Flush remaining data and finalize metadata."""
+        if self._frames_file.closed:
+            return
+        self._frames_file.close()
+        self._index_file.close()
+        if self._frame_shape is not None:
+            self._write_meta()
+
+    @property
+    def frames_written(self):
+        return self._frames_written
+
+    @property
+    def output_dir(self):
+        return self._output_dir
+
+    def ffmpeg_command(self, output_file="video.mp4"):
+        """Return ffmpeg command converting recorded frames to video."""
+        if self._frame_shape is None:
+            return None
+        height, width = self._frame_shape[:2]
+        return (f"ffmpeg -f rawvideo -pix_fmt rgb24 -s {width}x{height} "
+                f"-r {self._fps / self._frame_skip:g} "
+                f"-i {os.path.join(self._output_dir, self.FRAMES_FILE)} "
+                f"-pix_fmt yuv420p {output_file}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def load_frames(output_dir):
+    """
+    Memory-map frames recorded by FrameRecorder.
+
+    Returns:
+        Read-only array of shape (frames, height, width, 3), frames are
+        read from disk only when accessed
+    """
+    with open(os.path.join(output_dir, FrameRecorder.META_FILE), 'r') as f:
+        meta = json.load(f)
+
+    shape = (meta['frames'], meta['height'], meta['width'], meta['channels'])
+    return np.memmap(os.path.join(output_dir, meta['frames_file']),
+                     dtype=meta['dtype'], mode='r', shape=shape)
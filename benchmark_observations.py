@@ -0,0 +1,83 @@
+"""
+Compare step cost of RacingEnv observation modes (rays vs occupancy patch).
+Usage: Run in PyCharm or: python benchmark_observations.py
+
+Every mode replays the same random action sequence on the same track, so
+the simulation work is identical - differences come from building the
+observation. Also times the observation alone (with the car parked at
+sampled poses of the run).
+"""
+
+from ai.racing_env import RacingEnv
+import numpy as np
+import time
+
+
+# === SETTINGS ===
+TRACK_FILE = "tracks/test.png"
+N_STEPS = 3000
+MODES = [
+    ("rays", {}),
+    ("rays (ray table)", {"ray_table": True}),
+    ("patch 32x32", {"observation": "patch"}),
+    ("patch_flat 32x32", {"observation": "patch_flat"}),
+    ("patch 64x64 / 2px", {"observation": "patch", "patch_size": 64, "patch_cell_size": 2.0}),
+]
+COLLISION = "footprint"
+
+
+def run_steps(env, actions):
+    """Step through actions, return (seconds, states sampled on the way)."""
+    env.reset(seed=0)
+    states = []
+    start = time.perf_counter()
+    for i, action in enumerate(actions):
+        _, _, terminated, truncated, _ = env.step(action)
+        if terminated or truncated:
+            env.reset()
+        if i % 10 == 0:
+            states.append(env.get_state())
+    return time.perf_counter() - start, states
+
+
+def time_observations(env, states):
+    """Mean seconds of building one observation."""
+    start = time.perf_counter()
+    for state in states:
+        env.set_state(state)  # observe=True - one observation per restore
+    with_obs = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for state in states:
+        env.set_state(state, observe=False)
+    without_obs = time.perf_counter() - start
+    return (with_obs - without_obs) / len(states)
+
+
+def main():
+    actions = np.random.default_rng(0).choice([0, 1, 1, 1, 2, 3, 4], N_STEPS)
+
+    print(f"Track: {TRACK_FILE}, {N_STEPS} steps, collision={COLLISION}\n")
+    print(f"{'Mode':<22} {'Obs size':>9} {'Step':>10} {'Observation':>12}")
+    print("-" * 57)
+
+    baseline = None
+    for name, options in MODES:
+        env = RacingEnv(track_file=TRACK_FILE, collision=COLLISION, **options)
+        env.reset(seed=0)
+        env.step(0)  # Build lazy structures (occupancy grid, tables) before timing
+
+        seconds, states = run_steps(env, actions)
+        step_us = seconds / N_STEPS * 1e6
+        obs_us = time_observations(env, states) * 1e6
+        size = sum(int(np.prod(space.shape)) for space in
+                   (env.observation_space.spaces.values() if hasattr(env.observation_space, "spaces")
+                    else [env.observation_space]))
+
+        baseline = baseline or step_us
+        print(f"{name:<22} {size:>9} {step_us:>8.0f}us {obs_us:>10.0f}us   ({step_us / baseline:.2f}x)")
+        env.close()
+
+
+if __name__ == "__main__":
+    main()
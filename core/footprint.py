@@ -0,0 +1,110 @@
+import math
+
+import numpy as np
+
+
+class FootprintMask:
+    """
+    Sample points covering a vehicle's whole rectangle, precomputed for
+    every angle bin.
+
+    Points form a grid in the vehicle's frame with at most `spacing` px
+    between neighbours (edges included), rotated once per angle bin. A
+    wall pixel is a closed unit square, so with spacing <= 1 no wall line
+    crossing the rectangle fits between samples - unlike the 4 corners of
+    Vehicle.get_corners().
+
+    Testing a pose is one Track.is_wall() gather of center + offsets of
+    the nearest angle bin.
+    """
+
+    def __init__(self, width, height, angle_step=1.0, spacing=1.0):
+        """
+        Args:
+            width: Vehicle length along its heading (Vehicle.width)
+            height: Vehicle width across its heading (Vehicle.height)
+            angle_step: Angle bin size in degrees (vehicles rotate in 3 degree
+                steps, so 1 keeps every reachable angle exact)
+            spacing: Max distance between samples in pixels
+        """
+        self._width = width
+        self._height = height
+        self._angle_step = angle_step
+        self._n_angles = int(round(360 / angle_step))
+
+        local_x = np.linspace(-width / 2, width / 2, int(math.ceil(width / spacing)) + 1)
+        local_y = np.linspace(-height / 2, height / 2, int(math.ceil(height / spacing)) + 1)
+        grid_x, grid_y = np.meshgrid(local_x, local_y)
+        grid_x, grid_y = grid_x.ravel(), grid_y.ravel()
+
+        # Same rotation as Vehicle.get_corners_at(), (n_angles, n_samples)
+        rad = np.radians(np.arange(self._n_angles) * angle_step)[:, np.newaxis]
+        cos_a, sin_a = np.cos(rad), np.sin(rad)
+        self._offsets_x = grid_x * cos_a - grid_y * sin_a
+        self._offsets_y = grid_x * sin_a + grid_y * cos_a
+
+    def _angle_bin(self, angles):
+        return np.rint(np.asarray(angles, dtype=np.float64) / self._angle_step).astype(np.intp) % self._n_angles
+
+    def points(self, x, y, angle):
+        """World coordinates (xs, ys) of the footprint samples at a pose."""
+        index = self._angle_bin(angle)
+        return x + self._offsets_x[index], y + self._offsets_y[index]
+
+    def hits(self, track, xs, ys, angles):
+        """
+        Wall test of every footprint sample for many poses at once.
+
+        Args:
+            track: Track (anything with is_wall())
+            xs, ys, angles: Arrays (N,) of vehicle poses
+
+        Returns:
+            Bool array (N, n_samples)
+        """
+        index = self._angle_bin(angles)
+        xs = np.asarray(xs, dtype=np.float64)[:, np.newaxis]
+        ys = np.asarray(ys, dtype=np.float64)[:, np.newaxis]
+        return track.is_wall(xs + self._offsets_x[index], ys + self._offsets_y[index])
+
+    def collides(self, track, x, y, angle):
+        """True if any part of the rectangle at this pose touches a wall."""
+        return bool(track.is_wall(*self.points(x, y, angle)).any())
+
+    def push_vector(self, track, x, y, angle, max_push=None):
+        """
+        Shortest shift out of the walls, away from the colliding part.
+
+        The direction points from the mean of the colliding samples to the
+        vehicle center; all whole-pixel shift lengths up to max_push
+        (default: half the diagonal) are tested in one gather and the
+        shortest free one is used.
+
+        Returns:
+            (push_x, push_y) - (0, 0) if no shift in that direction is
+            free - or None if the pose does not collide
+        """
+        xs, ys = self.points(x, y, angle)
+        hit = track.is_wall(xs, ys)
+        if not hit.any():
+            return None
+
+        dx, dy = x - xs[hit].mean(), y - ys[hit].mean()
+        length = math.hypot(dx, dy)
+        if length < 1e-9:
+            return 0.0, 0.0
+        dx, dy = dx / length, dy / length
+
+        if max_push is None:
+            max_push = int(math.ceil(math.hypot(self._width, self._height) / 2))
+        shifts = np.arange(1, max_push + 1, dtype=np.float64)[:, np.newaxis]
+        blocked = track.is_wall(xs + shifts * dx, ys + shifts * dy).any(axis=1)
+        free = np.flatnonzero(~blocked)
+        if not len(free):
+            return 0.0, 0.0
+        shift = shifts[free[0], 0]
+        return dx * shift, dy * shift
+
+    @property
+    def n_samples(self):
+        return self._offsets_x.shape[1]
@@ -1,16 +1,29 @@
+import math
+import os
 import pygame
 from entities.player_car import PlayerCar
+from entities.ai_car import AICar
 from core.track import Track
 from core.track_loader import TrackLoader
 from core.renderer import Renderer
 from core.physics_engine import PhysicsEngine
-from core.lap_timer import LapTimer
+from core.race_progress import RaceProgress
+from core.replay import ReplayWriter
+from core.ghost import Ghost, GhostRecorder, ghost_path
+from core.progress_field import load_progress_field
 
 
 class GameEngine:
     """Main game loop and logic controller."""
 
-    def __init__(self, width=1200, height=800, track_file=None):
+    START_ANGLE = 90
+    MAX_RAYCAST_DISTANCE = 500  # Must match RacingEnv the models were trained in
+    TICK_RATE = 60  # Physics ticks per second (same 1/60 s step as RacingEnv)
+    MAX_TICKS_PER_FRAME = 5  # Catch-up cap - beyond this simulation slows down
+
+    def __init__(self, width=1200, height=800, track_file=None, dirty_rects=False,
+                 ai_models=None, n_opponents=0, ai_deterministic=True, render_fps=60,
+                 replay_file=None, ghost=True, ghost_file=None, collision="corners"):
         """
         Initialize game engine.
 
@@ -18,6 +31,18 @@ class GameEngine:
             width: Window width
             height: Window height
             track_file: Path to PNG track file (optional, uses default track if None)
+            dirty_rects: Redraw only changed screen regions instead of full frames
+            ai_models: Model files (.zip or .npz) driving AI opponents
+            n_opponents: Number of AI opponents (models assigned round-robin)
+            ai_deterministic: Greedy AI actions (False = sampled, more varied driving)
+            render_fps: Frame rate cap for rendering (0 = uncapped), independent
+                of the fixed physics tick rate
+            replay_file: Record state of all vehicles every tick to this file
+            ghost: Show best lap as a translucent ghost car (toggle with G key)
+            ghost_file: Where the best lap is loaded from and saved to
+                (default: <track>_ghost.npz next to the track)
+            collision: Wall collision test - "corners" or "footprint" (whole
+                car rectangle, see PhysicsEngine)
         """
         pygame.init()
         self._width = width
@@ -27,13 +52,16 @@ class GameEngine:
         
         self._clock = pygame.time.Clock()
         self._running = True
-        self._fps = 60
+        self._fps = render_fps
+        self._tick_dt = 1.0 / self.TICK_RATE
         
         # Load track
+        self._track_file = track_file
         if track_file:
             loader = TrackLoader()
             track_data = loader.load_from_png(track_file)
             self._track = Track(track_data=track_data)
+            self._track.set_progress_field(load_progress_field(track_file, self._track))
             # Update window size to match track
             self._width = track_data['width']
             self._height = track_data['height']
@@ -41,46 +69,119 @@ class GameEngine:
         else:
             self._track = Track(width, height)
 
-        self._renderer = Renderer(self._screen)
-        self._physics = PhysicsEngine()
-        self._lap_timer = LapTimer()
+        self._renderer = Renderer(self._screen, dirty_rects=dirty_rects)
+        self._physics = PhysicsEngine(collision)
 
         start_x, start_y = self._track.start_position
         self._player = PlayerCar(start_x, start_y)
-        self._player.set_angle(90)
+        self._player.set_angle(self.START_ANGLE)
         self._vehicles = [self._player]
 
-        # Checkpoint tracking
-        self._next_checkpoint = 0
-        self._collision_count = 0
+        # AI opponents - actions for all of them come from one batched prediction
+        self._ai_cars = []
+        self._ai_model_keys = []
+        self._ai_policy = None
+        if ai_models and n_opponents > 0:
+            from ai.batch_policy import BatchPolicy
+            self._ai_policy = BatchPolicy.from_files(ai_models, deterministic=ai_deterministic)
+            for i in range(n_opponents):
+                car = AICar(start_x, start_y)
+                car.set_angle(self.START_ANGLE)
+                self._ai_cars.append(car)
+                self._ai_model_keys.append(ai_models[i % len(ai_models)])
+            self._vehicles.extend(self._ai_cars)
+
+        # Poses before last physics tick (render interpolation)
+        self._previous_poses = {}
+
+        # Checkpoint, lap and collision tracking per vehicle
+        self._progress = {vehicle: RaceProgress(vehicle, self._tick_dt) for vehicle in self._vehicles}
         self._show_checkpoints = False  # Toggle with C key
         self._show_raycasts = False  # Toggle with V key
 
+        # Replay recording - one record per vehicle per physics tick
+        self._tick = 0
+        self._episode = 0
+        self._replay = None
+        if replay_file:
+            self._replay = ReplayWriter(
+                replay_file, track=track_file, model=ai_models,
+                tick_dt=self._tick_dt, n_vehicles=len(self._vehicles), player_id=0
+            )
+
+        # Ghost of the best player lap - recorded every tick, saved per track
+        self._show_ghost = ghost  # Toggle with G key
+        self._ghost = None
+        self._ghost_file = ghost_file or (ghost_path(track_file) if track_file else None)
+        self._ghost_recorder = GhostRecorder(self._tick_dt)
+        self._ghost_lap = 0
+        if self._ghost_file and os.path.exists(self._ghost_file):
+            self._ghost = Ghost.load(self._ghost_file)
+
         # Start race
-        self._lap_timer.start_race()
+        for progress in self._progress.values():
+            progress.start()
+        self._ghost_recorder.start_lap(self._player)
 
     def run(self):
-        """Main game loop."""
+        """
+        Main game loop.
+
+        Physics runs in fixed ticks of 1/TICK_RATE s - as many per frame as
+        elapsed real time demands - so simulation speed does not depend on
+        frame rate. Rendering interpolates between the last two ticks.
+        """
+        accumulator = 0.0
+
         while self._running:
-            dt = self._clock.tick(self._fps) / 1000.0
-            
+            accumulator += self._clock.tick(self._fps) / 1000.0
+
             self._handle_events()
-            self._update(dt)
-            self._render()
-        
+
+            ticks = 0
+            while accumulator >= self._tick_dt and ticks < self.MAX_TICKS_PER_FRAME:
+                self._store_previous_poses()
+                self._update(self._tick_dt)
+                accumulator -= self._tick_dt
+                ticks += 1
+
+            # Too far behind (e.g. window dragged) - drop the backlog
+            if ticks == self.MAX_TICKS_PER_FRAME:
+                accumulator = min(accumulator, self._tick_dt)
+
+            self._render(alpha=accumulator / self._tick_dt)
+
+        if self._replay is not None:
+            self._replay.close()
         pygame.quit()
+
+    def _store_previous_poses(self):
+        """Remember poses before a tick (for render interpolation)."""
+        for vehicle in self._vehicles:
+            self._previous_poses[vehicle] = (vehicle.x, vehicle.y, vehicle.angle)
+
+    def _interpolated_pose(self, vehicle, alpha):
+        """Vehicle pose between previous and current tick (alpha 0-1)."""
+        prev_x, prev_y, prev_angle = self._previous_poses.get(
+            vehicle, (vehicle.x, vehicle.y, vehicle.angle)
+        )
+        return (prev_x + (vehicle.x - prev_x) * alpha,
+                prev_y + (vehicle.y - prev_y) * alpha,
+                prev_angle + (vehicle.angle - prev_angle) * alpha)
     
     def _reset_race(self):
         """Reset race to initial state."""
         start_x, start_y = self._track.start_position
-        self._player.set_position(start_x, start_y)
-        self._player.set_angle(0)
-        self._player.accelerate(-self._player.speed)
-        self._next_checkpoint = 0
-        self._collision_count = 0
+        for vehicle in self._vehicles:
+            vehicle.set_position(start_x, start_y)
+            vehicle.set_angle(self.START_ANGLE)
+            vehicle.accelerate(-vehicle.speed)
+            self._progress[vehicle].start()
         self._track.reset_checkpoints()
-        self._lap_timer.reset()
-        self._lap_timer.start_race()
+        self._previous_poses.clear()
+        self._episode += 1
+        self._ghost_recorder.start_lap(self._player)
+        self._ghost_lap = 0
 
     def _handle_events(self):
         for event in pygame.event.get():
@@ -95,45 +196,134 @@ class GameEngine:
                     self._show_checkpoints = not self._show_checkpoints
                 elif event.key == pygame.K_v:
                     self._show_raycasts = not self._show_raycasts
+                elif event.key == pygame.K_g:
+                    self._show_ghost = not self._show_ghost
 
     def _update(self, dt):
-        self._lap_timer.update()
+        for progress in self._progress.values():
+            progress.tick()
+
+        self._update_ai_actions()
 
         for vehicle in self._vehicles:
+            progress = self._progress[vehicle]
             old_x = vehicle.x
             old_y = vehicle.y
-            
+
             vehicle.update(dt)
 
             # Handle collision FIRST (before checking checkpoints)
             # This prevents false checkpoint detections when position is reset
             collision_occurred = False
             if self._physics.handle_collision(vehicle, self._track):
-                self._collision_count += 1
-                if self._track.check_collision(vehicle.get_corners()):
+                progress.add_collision()
+                if self._physics.check_collision(vehicle, self._track):
                     vehicle.set_position(old_x, old_y)
                     collision_occurred = True
 
             # Only check checkpoints if no collision occurred (to avoid false detections)
             if not collision_occurred:
-                if self._track.check_checkpoint_crossing(
-                    old_x, old_y, vehicle.x, vehicle.y, self._next_checkpoint
+                if self._track.crosses_checkpoint(
+                    old_x, old_y, vehicle.x, vehicle.y, progress.next_checkpoint
                 ):
-                    self._next_checkpoint += 1
+                    progress.pass_checkpoint()
 
                 # Check finish line only after all checkpoints are passed
-                if self._next_checkpoint >= self._track.total_checkpoints:
+                if progress.next_checkpoint >= self._track.total_checkpoints:
                     if self._track.check_finish_line_crossing(old_x, old_y, vehicle.x, vehicle.y):
-                        lap_info = self._lap_timer.complete_lap()
-                        self._next_checkpoint = 0
-                        self._track.reset_checkpoints()
+                        progress.complete_lap()
+
+        self._update_ghost()
+
+        if self._replay is not None:
+            self._record_replay()
+        self._tick += 1
+
+    def _update_ghost(self):
+        """Record player pose; on a new best lap, make it the ghost."""
+        self._ghost_recorder.record(self._player)
+
+        progress = self._progress[self._player]
+        if progress.laps == self._ghost_lap:
+            return
+        self._ghost_lap = progress.laps
+
+        lap_time = progress.lap_timer.last_lap_time
+        if self._ghost is None or lap_time < self._ghost.lap_time:
+            self._ghost = self._ghost_recorder.finish_lap(self._track_file, "player")
+            if self._ghost_file:
+                self._ghost.save(self._ghost_file)
+        self._ghost_recorder.start_lap(self._player)
+
+    def _record_replay(self):
+        """Append state of all vehicles at current tick to the replay."""
+        for vehicle_id, vehicle in enumerate(self._vehicles):
+            progress = self._progress[vehicle]
+            action = vehicle.action if isinstance(vehicle, AICar) else -1
+            self._replay.record(
+                self._tick, vehicle, action=action,
+                checkpoint=progress.next_checkpoint, lap=progress.laps,
+                vehicle_id=vehicle_id, episode=self._episode % 65536
+            )
+
+    def _update_ai_actions(self):
+        """Compute observations of all AI cars and their actions in one batch."""
+        if not self._ai_cars:
+            return
+
+        next_checkpoints = [self._progress[car].next_checkpoint for car in self._ai_cars]
+        observations = AICar.get_observations(
+            self._ai_cars, self._track, next_checkpoints, self.MAX_RAYCAST_DISTANCE
+        )
+        actions = self._ai_policy.predict(observations, self._ai_model_keys)
 
-    def _render(self):
+        for car, action in zip(self._ai_cars, actions):
+            car.set_action(action)
+
+    def _race_positions(self):
+        """Return vehicles ordered by race position (leader first)."""
+        distances = {vehicle: self._track.distance_along_track(
+            vehicle.x, vehicle.y, self._progress[vehicle].next_checkpoint) for vehicle in self._vehicles}
+
+        # One metric for the whole ranking - driving distance is never
+        # shorter than the straight line, so mixing them would misorder cars
+        if any(distance is None for distance in distances.values()):
+            # No progress field or a car off the road - straight-line distance
+            distances = {vehicle: self._straight_distance(vehicle) for vehicle in self._vehicles}
+
+        def race_key(vehicle):
+            progress = self._progress[vehicle]
+            return (-progress.laps, -progress.next_checkpoint, distances[vehicle])
+
+        return sorted(self._vehicles, key=race_key)
+
+    def _straight_distance(self, vehicle):
+        """Straight-line distance from a vehicle to its next target line center."""
+        checkpoints = self._track.checkpoints
+        next_checkpoint = self._progress[vehicle].next_checkpoint
+        if next_checkpoint < len(checkpoints):
+            cp = checkpoints[next_checkpoint]
+            target_x, target_y = (cp['x1'] + cp['x2']) / 2, (cp['y1'] + cp['y2']) / 2
+        elif self._track.start_finish_line:
+            line = self._track.start_finish_line
+            target_x, target_y = (line['x1'] + line['x2']) / 2, (line['y1'] + line['y2']) / 2
+        else:
+            target_x, target_y = vehicle.x, vehicle.y
+        return math.hypot(vehicle.x - target_x, vehicle.y - target_y)
+
+    def _render(self, alpha=1.0):
         self._renderer.clear(self._track.background_color)
         self._renderer.draw_track(self._track, self._show_checkpoints)
 
+        if self._show_ghost and self._ghost is not None:
+            # Player is drawn one tick behind (interpolated), so is the ghost
+            lap_time = self._progress[self._player].lap_timer.current_lap_time
+            pose = self._ghost.pose_at(lap_time - (1.0 - alpha) * self._tick_dt)
+            if pose is not None:
+                self._renderer.draw_ghost(self._player, pose)
+
         for vehicle in self._vehicles:
-            self._renderer.draw_vehicle(vehicle)
+            self._renderer.draw_vehicle(vehicle, self._interpolated_pose(vehicle, alpha))
 
             # Draw raycasts if enabled
             if self._show_raycasts:
@@ -141,22 +331,24 @@ class GameEngine:
                 self._renderer.draw_raycasts(vehicle, endpoints)
 
         # Draw statistics
+        player_progress = self._progress[self._player]
+        lap_timer = player_progress.lap_timer
         y_offset = 10
         line_height = 35
 
-        lap_text = f"Lap: {self._lap_timer.current_lap}"
+        lap_text = f"Lap: {lap_timer.current_lap}"
         self._renderer.draw_text(lap_text, 10, y_offset)
         y_offset += line_height
 
-        time_text = f"Time: {self._lap_timer.format_time(self._lap_timer.current_lap_time)}"
+        time_text = f"Time: {lap_timer.format_time(lap_timer.current_lap_time)}"
         self._renderer.draw_text(time_text, 10, y_offset)
         y_offset += line_height
 
-        best_text = f"Best: {self._lap_timer.format_time(self._lap_timer.best_lap_time)}"
+        best_text = f"Best: {lap_timer.format_time(lap_timer.best_lap_time)}"
         self._renderer.draw_text(best_text, 10, y_offset)
         y_offset += line_height
 
-        checkpoint_text = f"Checkpoint: {self._next_checkpoint}/{self._track.total_checkpoints}"
+        checkpoint_text = f"Checkpoint: {player_progress.next_checkpoint}/{self._track.total_checkpoints}"
         self._renderer.draw_text(checkpoint_text, 10, y_offset)
         y_offset += line_height
 
@@ -164,7 +356,13 @@ class GameEngine:
         self._renderer.draw_text(speed_text, 10, y_offset)
         y_offset += line_height
 
-        collision_text = f"Collisions: {self._collision_count}"
+        collision_text = f"Collisions: {player_progress.collision_count}"
         self._renderer.draw_text(collision_text, 10, y_offset)
 
+        if self._ai_cars:
+            y_offset += line_height
+            position = self._race_positions().index(self._player) + 1
+            position_text = f"Position: {position}/{len(self._vehicles)}"
+            self._renderer.draw_text(position_text, 10, y_offset)
+
         self._renderer.update_display()
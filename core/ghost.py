@@ -0,0 +1,155 @@
+import os
+
+import numpy as np
+
+
+def ghost_path(track_file):
+    """Default ghost file for a track (e.g. tracks/test.png -> tracks/test_ghost.npz)."""
+    return os.path.splitext(track_file)[0] + '_ghost.npz'
+
+
+class Ghost:
+    """
+    Recorded lap played back as a ghost car.
+
+    Poses are stored as a compact float32 array (x, y, angle), one row per
+    physics tick since lap start. Playback interpolates between two rows,
+    so showing the ghost costs one lookup per frame - nothing is simulated.
+    """
+
+    def __init__(self, poses, tick_dt=1 / 60, track=None, source=None):
+        """
+        Initialize ghost.
+
+        Args:
+            poses: Array (N, 3) of x, y, angle - row i is the pose i ticks
+                after lap start
+            tick_dt: Simulated seconds per tick
+            track: Track id the lap was driven on
+            source: Who drove the lap (e.g. "player" or model path)
+        """
+        self._poses = np.ascontiguousarray(poses, dtype=np.float32).reshape(-1, 3)
+        self._tick_dt = tick_dt
+        self._track = track
+        self._source = source
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            track = str(data['track']) or None
+            source = str(data['source']) or None
+            return cls(data['poses'], float(data['tick_dt']), track, source)
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez(path, poses=self._poses, tick_dt=self._tick_dt,
+                 track=self._track or '', source=self._source or '')
+
+    @classmethod
+    def from_replay(cls, replay, vehicle_id=0):
+        """
+        Build ghost from the fastest complete lap of a vehicle in a replay.
+
+        Args:
+            replay: ReplayReader
+            vehicle_id: Vehicle to take the lap from
+
+        Returns:
+            Ghost, or None if the vehicle never completed a lap
+        """
+        records = replay.vehicle_records(vehicle_id)
+        if len(records) < 2:
+            return None
+
+        # A lap ends on the record where the lap counter goes up. Laps are
+        # only comparable inside one episode (counter restarts on reset)
+        laps = records['lap'].astype(np.int64)
+        episodes = records['episode']
+        same_episode = episodes[1:] == episodes[:-1]
+        lap_ends = np.flatnonzero((laps[1:] == laps[:-1] + 1) & same_episode) + 1
+
+        if len(lap_ends) == 0:
+            return None
+
+        # Lap starts at previous lap end or at first record of the episode
+        episode_starts = np.flatnonzero(np.r_[True, ~same_episode])
+        boundaries = np.union1d(episode_starts, lap_ends)
+        starts = boundaries[np.searchsorted(boundaries, lap_ends) - 1]
+        best = np.argmin(lap_ends - starts)
+
+        lap = records[starts[best]:lap_ends[best] + 1]
+        poses = np.stack([lap['x'], lap['y'], lap['angle']], axis=1)
+        header = replay.header
+        return cls(poses, replay.tick_dt, header.get('track'), header.get('model'))
+
+    @property
+    def lap_time(self):
+        return (len(self._poses) - 1) * self._tick_dt
+
+    @property
+    def tick_dt(self):
+        return self._tick_dt
+
+    @property
+    def track(self):
+        return self._track
+
+    @property
+    def source(self):
+        return self._source
+
+    @property
+    def poses(self):
+        return self._poses
+
+    def pose_at(self, lap_time):
+        """
+        Interpolated ghost pose at given time since lap start.
+
+        Returns:
+            Tuple (x, y, angle), or None when the ghost lap is over
+        """
+        position = max(lap_time, 0.0) / self._tick_dt
+        index = int(position)
+        if index >= len(self._poses) - 1:
+            return None
+
+        alpha = position - index
+        pose = self._poses[index] + (self._poses[index + 1] - self._poses[index]) * alpha
+        return float(pose[0]), float(pose[1]), float(pose[2])
+
+
+class GhostRecorder:
+    """
+    Records poses of a vehicle during the current lap.
+
+    The buffer is preallocated and grows by doubling, so recording is a row
+    assignment per tick.
+    """
+
+    def __init__(self, tick_dt=1 / 60, capacity=4096):
+        self._tick_dt = tick_dt
+        self._buffer = np.zeros((capacity, 3), dtype=np.float32)
+        self._count = 0
+
+    def start_lap(self, vehicle):
+        """Discard current lap and start recording from vehicle's pose."""
+        self._count = 0
+        self.record(vehicle)
+
+    def record(self, vehicle):
+        """Append vehicle pose after a physics tick."""
+        if self._count == len(self._buffer):
+            self._buffer = np.concatenate([self._buffer, np.zeros_like(self._buffer)])
+        self._buffer[self._count] = (vehicle.x, vehicle.y, vehicle.angle)
+        self._count += 1
+
+    def finish_lap(self, track=None, source=None):
+        """Return recorded lap as a Ghost (recording buffer is reused)."""
+        return Ghost(self._buffer[:self._count].copy(), self._tick_dt, track, source)
+
+    @property
+    def recorded_ticks(self):
+        return self._count
@@ -2,40 +2,104 @@ import time
 
 
 class LapTimer:
-    """Tracks lap times and race progress."""
-
-    def __init__(self):
+    """
+    Tracks lap times and race progress.
+
+    Two clock modes:
+        "wall"  - real time from a monotonic clock (time.perf_counter),
+                  advanced by calling update() every frame
+        "ticks" - simulation time, advanced by calling tick() once per
+                  physics step, so lap times are correct at any simulation
+                  speed (headless, faster than real time)
+    """
+
+    def __init__(self, clock="wall", tick_dt=1 / 60):
+        """
+        Initialize lap timer.
+
+        Args:
+            clock: "wall" or "ticks"
+            tick_dt: Simulated seconds per tick (ticks mode)
+        """
+        if clock not in ("wall", "ticks"):
+            raise ValueError(f"Unknown clock mode: {clock}")
+
+        self._clock = clock
+        self._tick_dt = tick_dt
+        self._ticks = 0
         self._current_lap = 1
         self._lap_start_time = None
         self._current_lap_time = 0.0
         self._best_lap_time = float('inf')
         self._last_lap_time = 0.0
-        self._total_race_time = 0.0
+        self._completed_laps_time = 0.0
         self._race_started = False
         self._lap_times_history = []
 
+        # Sector splits (time since lap start at each checkpoint)
+        self._current_splits = []
+        self._last_lap_splits = []
+        self._best_splits = []
+
+    def _now(self):
+        if self._clock == "ticks":
+            return self._ticks * self._tick_dt
+        return time.perf_counter()
+
     def start_race(self):
         """Start race timer."""
-        self._lap_start_time = time.time()
+        self._ticks = 0
+        self._lap_start_time = self._now()
         self._race_started = True
         self._current_lap = 1
-        self._total_race_time = 0.0
+        self._current_lap_time = 0.0
+        self._completed_laps_time = 0.0
         self._lap_times_history = []
+        self._current_splits = []
 
     def update(self):
-        """Update current lap time."""
-        if self._race_started and self._lap_start_time:
-            self._current_lap_time = time.time() - self._lap_start_time
-            self._total_race_time += self._current_lap_time
+        """Update current lap time (wall clock mode)."""
+        if self._race_started and self._lap_start_time is not None:
+            self._current_lap_time = self._now() - self._lap_start_time
+
+    def tick(self, n=1):
+        """Advance simulation time by n physics steps (ticks mode)."""
+        self._ticks += n
+        self.update()
+
+    def record_split(self, sector):
+        """
+        Record split time for a sector (e.g. checkpoint index) of current lap.
+
+        Returns:
+            Split time in seconds since lap start
+        """
+        self.update()
+        split = self._current_lap_time
+
+        # Splits are stored by sector index; skipped sectors stay None
+        while len(self._current_splits) <= sector:
+            self._current_splits.append(None)
+        self._current_splits[sector] = split
+
+        while len(self._best_splits) <= sector:
+            self._best_splits.append(None)
+        if self._best_splits[sector] is None or split < self._best_splits[sector]:
+            self._best_splits[sector] = split
+
+        return split
 
     def complete_lap(self):
         """Complete current lap and start new one."""
         if not self._race_started:
             return None
 
+        self.update()
         lap_time = self._current_lap_time
         self._last_lap_time = lap_time
         self._lap_times_history.append(lap_time)
+        self._completed_laps_time += lap_time
+        self._last_lap_splits = self._current_splits
 
         is_best = False
         if lap_time < self._best_lap_time and self._current_lap > 0:
@@ -45,26 +109,65 @@ class LapTimer:
         lap_info = {
             'lap_number': self._current_lap,
             'time': lap_time,
-            'is_best': is_best
+            'is_best': is_best,
+            'splits': list(self._last_lap_splits)
         }
 
         # Start new lap
         self._current_lap += 1
-        self._lap_start_time = time.time()
+        self._lap_start_time = self._now()
         self._current_lap_time = 0.0
+        self._current_splits = []
 
         return lap_info
 
+    # Number of values in get_state()
+    STATE_SIZE = 8
+
+    def get_state(self):
+        """
+        Timer values as a list of STATE_SIZE floats (see set_state).
+
+        Lap history and splits are not included - they have no fixed size.
+        """
+        return [
+            self._ticks,
+            self._current_lap,
+            float('nan') if self._lap_start_time is None else self._lap_start_time,
+            self._current_lap_time,
+            self._best_lap_time,
+            self._last_lap_time,
+            self._completed_laps_time,
+            float(self._race_started),
+        ]
+
+    def set_state(self, values):
+        """Restore timer values saved with get_state()."""
+        (ticks, current_lap, lap_start_time, self._current_lap_time, self._best_lap_time,
+         self._last_lap_time, self._completed_laps_time, race_started) = (float(v) for v in values)
+        self._ticks = int(ticks)
+        self._current_lap = int(current_lap)
+        self._lap_start_time = None if lap_start_time != lap_start_time else lap_start_time  # NaN = None
+        self._race_started = bool(race_started)
+
     def reset(self):
         """Reset all timer values."""
+        self._ticks = 0
         self._current_lap = 1
         self._lap_start_time = None
         self._current_lap_time = 0.0
         self._best_lap_time = float('inf')
         self._last_lap_time = 0.0
-        self._total_race_time = 0.0
+        self._completed_laps_time = 0.0
         self._race_started = False
         self._lap_times_history = []
+        self._current_splits = []
+        self._last_lap_splits = []
+        self._best_splits = []
+
+    @property
+    def clock(self):
+        return self._clock
 
     @property
     def current_lap(self):
@@ -74,6 +177,10 @@ class LapTimer:
     def current_lap_time(self):
         return self._current_lap_time
 
+    @property
+    def total_race_time(self):
+        return self._completed_laps_time + self._current_lap_time
+
     @property
     def best_lap_time(self):
         return self._best_lap_time if self._best_lap_time != float('inf') else 0.0
@@ -86,6 +193,18 @@ class LapTimer:
     def lap_history(self):
         return self._lap_times_history.copy()
 
+    @property
+    def current_splits(self):
+        return self._current_splits.copy()
+
+    @property
+    def last_lap_splits(self):
+        return self._last_lap_splits.copy()
+
+    @property
+    def best_splits(self):
+        return self._best_splits.copy()
+
     def format_time(self, seconds):
         """Format time as MM:SS.mmm"""
         if seconds == 0 or seconds == float('inf'):
@@ -94,4 +213,3 @@ class LapTimer:
         minutes = int(seconds // 60)
         secs = seconds % 60
         return f"{minutes:02d}:{secs:06.3f}"
-
@@ -1,19 +1,56 @@
 import math
 
+from core.footprint import FootprintMask
+
 
 class PhysicsEngine:
-    
-    def __init__(self):
+
+    COLLISION_MODES = ("corners", "footprint")
+
+    def __init__(self, collision="corners"):
+        """
+        Args:
+            collision: "corners" tests the 4 rectangle corners against walls,
+                "footprint" the whole rectangle (catches thin walls passing
+                between corners, see FootprintMask)
+        """
+        if collision not in self.COLLISION_MODES:
+            raise ValueError(f"Unknown collision mode: {collision}")
         self._collision_response = 0.8
+        self._collision = collision
+        self._footprints = {}  # (width, height) -> FootprintMask
+
+    @property
+    def collision(self):
+        return self._collision
+
+    def _footprint(self, vehicle):
+        key = (vehicle.width, vehicle.height)
+        if key not in self._footprints:
+            self._footprints[key] = FootprintMask(vehicle.width, vehicle.height)
+        return self._footprints[key]
+
+    def check_collision(self, vehicle, track):
+        """Check if vehicle touches a wall (no response)."""
+        if self._collision == "footprint":
+            return self._footprint(vehicle).collides(track, vehicle.x, vehicle.y, vehicle.angle)
+        return track.check_collision(vehicle.get_corners())
 
     def handle_collision(self, vehicle, track):
         """Check collision and push vehicle away from walls."""
-        corners = vehicle.get_corners()
-        
-        if track.check_collision(corners):
-            # Find which corners collided and calculate push vector
-            push_x, push_y = self._calculate_push_vector(corners, track)
+        if self._collision == "footprint":
+            push = self._footprint(vehicle).push_vector(track, vehicle.x, vehicle.y, vehicle.angle)
+            collided = push is not None
+            if collided:
+                push_x, push_y = push
+        else:
+            corners = vehicle.get_corners()
+            collided = track.check_collision(corners)
+            if collided:
+                # Find which corners collided and calculate push vector
+                push_x, push_y = self._calculate_push_vector(corners, track)
 
+        if collided:
             if push_x == 0 and push_y == 0:
                 # Fallback - push backwards
                 rad = math.radians(vehicle.angle)
@@ -35,8 +72,14 @@ class PhysicsEngine:
         total_push_y = 0.0
         collision_count = 0
 
+        # Corners are within half a diagonal of the center
+        center_x = sum(x for x, _ in corners) / len(corners)
+        center_y = sum(y for _, y in corners) / len(corners)
+        radius = max(math.hypot(x - center_x, y - center_y) for x, y in corners)
+        walls = track.walls_near(center_x, center_y, radius)
+
         for corner_x, corner_y in corners:
-            for wall in track.walls:
+            for wall in walls:
                 wx, wy = wall['x'], wall['y']
                 ww, wh = wall['width'], wall['height']
 
@@ -0,0 +1,179 @@
+import os
+
+import numpy as np
+
+
+UNREACHABLE = np.iinfo(np.uint16).max
+
+# BFS steps alternate between 4- and 8-neighborhood - distances then follow
+# an octagonal metric, within ~8% of Euclidean (pure 8-neighborhood: ~41%)
+_OFFSETS_4 = ((0, 1), (0, -1), (1, 0), (-1, 0))
+_OFFSETS_8 = _OFFSETS_4 + ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+def progress_field_path(track_file):
+    """Sidecar file of a track (e.g. tracks/test.png -> tracks/test_progress.npy)."""
+    return os.path.splitext(track_file)[0] + '_progress.npy'
+
+
+def _line_pixels(line, width, height, extend=0.0):
+    """Pixels of a line segment (x1, y1, x2, y2 dict), optionally extended at both ends."""
+    x1, y1, x2, y2 = line['x1'], line['y1'], line['x2'], line['y2']
+    length = max(np.hypot(x2 - x1, y2 - y1), 1e-9)
+    t = np.linspace(-extend / length, 1 + extend / length, int(np.ceil(2 * (length + 2 * extend))) + 2)
+    xs = np.floor(x1 + (x2 - x1) * t).astype(np.intp)
+    ys = np.floor(y1 + (y2 - y1) * t).astype(np.intp)
+    inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+    return xs[inside], ys[inside]
+
+
+def _geodesic_distance(blocked, seeds):
+    """
+    Breadth-first distance (in pixels) from seed cells over free cells.
+
+    Args:
+        blocked: Bool grid with a blocked 1px border
+        seeds: Linear indices of start cells
+
+    Returns:
+        Uint16 grid (flattened) of distances, UNREACHABLE where not reached
+    """
+    width = blocked.shape[1]
+    offsets_4 = np.array([dy * width + dx for dy, dx in _OFFSETS_4])
+    offsets_8 = np.array([dy * width + dx for dy, dx in _OFFSETS_8])
+
+    visited = blocked.ravel().copy()
+    distance = np.full(visited.shape, UNREACHABLE, dtype=np.uint16)
+
+    frontier = np.unique(seeds)
+    frontier = frontier[~visited[frontier]]
+    visited[frontier] = True
+    distance[frontier] = 0
+
+    step = 0
+    while len(frontier) and step < UNREACHABLE - 1:
+        step += 1
+        offsets = offsets_4 if step % 2 else offsets_8
+        neighbors = (frontier[:, np.newaxis] + offsets).ravel()
+        neighbors = np.unique(neighbors[~visited[neighbors]])
+        visited[neighbors] = True
+        distance[neighbors] = step
+        frontier = neighbors
+
+    return distance
+
+
+def _fill_barrier(distance, barrier, width):
+    """
+    Give road cells under a barrier line the distance of their nearest
+    neighbor (+1). The forward side is always the nearer one, so a car on the
+    line (e.g. at the start) gets its forward distance.
+    """
+    offsets = np.array([dy * width + dx for dy, dx in _OFFSETS_8])
+    for _ in range(3):  # Barrier is at most 3 cells thick
+        neighbors = distance[barrier[:, np.newaxis] + offsets].astype(np.int64)
+        nearest = neighbors.min(axis=1) + 1
+        update = nearest < distance[barrier]
+        distance[barrier[update]] = np.minimum(nearest[update], UNREACHABLE - 1)
+
+
+def build_progress_field(track, barrier_extend=4.0):
+    """
+    Precompute distance along the track to every checkpoint and the finish.
+
+    Layer k holds, for every drivable pixel, the shortest driving distance
+    to checkpoint k; the last layer is the distance to the finish line. The
+    line passed before the target (previous checkpoint, or the finish line
+    for checkpoint 0) is a barrier, so the distance is always measured in
+    driving direction - around corners, not through walls.
+
+    Args:
+        track: Track with walls, checkpoints and start/finish line
+        barrier_extend: Barrier lines are extended by this many pixels at
+            both ends to close small gaps between line ends and walls
+
+    Returns:
+        Uint16 array (n_checkpoints + 1, height, width), UNREACHABLE on walls
+        and where the target cannot be reached
+    """
+    height, width = track.height, track.width
+    targets = list(track.checkpoints)
+    if track.start_finish_line:
+        targets.append(track.start_finish_line)
+
+    walls = np.ones((height + 2, width + 2), dtype=bool)
+    walls[1:-1, 1:-1] = track.occupancy
+
+    field = np.full((len(targets), height, width), UNREACHABLE, dtype=np.uint16)
+    for index, target in enumerate(targets):
+        blocked = walls.copy()
+
+        # Previous line is crossed before this target - block it. Thick
+        # enough that diagonal steps cannot slip through
+        barrier = np.zeros(0, dtype=np.intp)
+        previous = targets[index - 1] if len(targets) > 1 else None
+        if previous is not None:
+            xs, ys = _line_pixels(previous, width, height, barrier_extend)
+            barrier = np.unique(np.concatenate([
+                (ys + 1 + dy) * (width + 2) + xs + 1 + dx for dy, dx in ((0, 0), (0, 1), (1, 0))
+            ]))
+            barrier = barrier[~walls.ravel()[barrier]]
+            blocked.ravel()[barrier] = True
+
+        xs, ys = _line_pixels(target, width, height)
+        seeds = (ys + 1) * (width + 2) + xs + 1
+
+        distance = _geodesic_distance(blocked, seeds)
+        _fill_barrier(distance, barrier, width + 2)
+        field[index] = distance.reshape(height + 2, width + 2)[1:-1, 1:-1]
+
+    return field
+
+
+def load_progress_field(track_file, track, rebuild=False):
+    """
+    Load progress field sidecar of a track PNG, building it if missing or
+    older than the PNG. The file is memory-mapped (shared page cache across
+    env processes) and written atomically.
+    """
+    path = progress_field_path(track_file)
+    fresh = not rebuild and os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(track_file)
+
+    if fresh:
+        field = np.load(path, mmap_mode='r')
+        n_targets = len(track.checkpoints) + (1 if track.start_finish_line else 0)
+        if field.shape == (n_targets, track.height, track.width):
+            return field
+
+    field = build_progress_field(track)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+    try:
+        np.save(tmp_path, field)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return np.load(path, mmap_mode='r')
+
+
+def validate_progress_field(field, track):
+    """
+    Check that every target can be reached in driving order - from the start
+    to checkpoint 0, and from each line to the next one.
+
+    Returns:
+        List of problem descriptions (empty if the field is usable)
+    """
+    problems = []
+    height, width = field.shape[1:]
+    points = [track.start_position] + [
+        ((line['x1'] + line['x2']) / 2, (line['y1'] + line['y2']) / 2)
+        for line in list(track.checkpoints) + [track.start_finish_line]
+        if line
+    ]
+    for target in range(len(field)):
+        x, y = int(points[target][0]), int(points[target][1])
+        if not (0 <= x < width and 0 <= y < height) or field[target, y, x] == UNREACHABLE:
+            source = "start" if target == 0 else f"line {target - 1}"
+            problems.append(f"target {target} unreachable from {source}")
+    return problems
@@ -0,0 +1,66 @@
+from core.lap_timer import LapTimer
+
+
+class RaceProgress:
+    """Race state of a single vehicle: checkpoints, laps, collisions and lap timer."""
+
+    def __init__(self, vehicle, tick_dt=1 / 60):
+        """
+        Initialize race progress.
+
+        Args:
+            vehicle: Tracked vehicle
+            tick_dt: Simulated seconds per physics tick (lap timer runs on
+                simulation time, advanced by tick())
+        """
+        self._vehicle = vehicle
+        self._next_checkpoint = 0
+        self._laps = 0
+        self._collision_count = 0
+        self._lap_timer = LapTimer(clock="ticks", tick_dt=tick_dt)
+
+    def start(self):
+        """Reset progress and start lap timer."""
+        self._next_checkpoint = 0
+        self._laps = 0
+        self._collision_count = 0
+        self._lap_timer.reset()
+        self._lap_timer.start_race()
+
+    def tick(self):
+        """Advance lap timer by one physics tick."""
+        self._lap_timer.tick()
+
+    def pass_checkpoint(self):
+        """Advance to next checkpoint and record its sector split."""
+        self._lap_timer.record_split(self._next_checkpoint)
+        self._next_checkpoint += 1
+
+    def complete_lap(self):
+        """Complete lap and return lap info from the lap timer."""
+        self._next_checkpoint = 0
+        self._laps += 1
+        return self._lap_timer.complete_lap()
+
+    def add_collision(self):
+        self._collision_count += 1
+
+    @property
+    def vehicle(self):
+        return self._vehicle
+
+    @property
+    def next_checkpoint(self):
+        return self._next_checkpoint
+
+    @property
+    def laps(self):
+        return self._laps
+
+    @property
+    def collision_count(self):
+        return self._collision_count
+
+    @property
+    def lap_timer(self):
+        return self._lap_timer
@@ -0,0 +1,282 @@
+import json
+import os
+
+import numpy as np
+
+
+RAY_TABLE_VERSION = 2
+MAX_ERROR = 20.0  # Default limit of the measured max lookup error (pixels)
+
+
+def ray_table_path(track_file):
+    """Sidecar files of a track (tracks/test.png -> tracks/test_rays.npy + tracks/test_rays.json)."""
+    base = os.path.splitext(track_file)[0] + '_rays'
+    return base + '.npy', base + '.json'
+
+
+class RayTable:
+    """
+    Precomputed raycast distances of a track.
+
+    Distances are stored for every cell_size pixels and every angle_step
+    degrees as uint16 array (ny, nx, n_angles). A lookup interpolates
+    bilinearly between the 4 grid points around a position (and linearly
+    between angles not on the grid), so most rays are one gather instead
+    of a march.
+
+    Interpolation only holds where the hit distance changes smoothly. When
+    the 4 grid rays disagree by more than max_spread (default 2 ray steps)
+    - the ray passes a wall corner or edge between them - or a grid point
+    lies inside a wall, that ray is cast exactly instead. (Correcting each
+    grid value by the offset along the ray, d(p0) - (p - p0) . dir, does
+    not help: with bilinear weights the corrections sum to zero.)
+
+    The error measured against exact casting is kept in error_stats.
+    """
+
+    def __init__(self, distances, meta):
+        """
+        Args:
+            distances: Uint16 array (ny, nx, n_angles), may be memory-mapped
+            meta: Table parameters (cell_size, angle_step, max_distance, ray_step, ...)
+        """
+        self._distances = distances
+        self._meta = dict(meta)
+        self._cell_size = meta['cell_size']
+        self._angle_step = meta['angle_step']
+        self._max_distance = meta['max_distance']
+        self._ray_step = meta['ray_step']
+        self._max_spread = meta.get('max_spread', 2 * self._ray_step)
+        self._ny, self._nx, self._n_angles = distances.shape
+
+        # Flat view for single-gather lookups: offsets of the 4 grid points
+        # (top-left, top-right, bottom-left, bottom-right) around a position
+        self._flat = distances.reshape(-1)
+        row = self._nx * self._n_angles
+        self._corner_offsets = np.array([0, self._n_angles, row, row + self._n_angles])
+        # Corner weight = a + b * fraction (1 - f for left/top, f for right/bottom)
+        self._weight_x = (np.array([1.0, 0.0, 1.0, 0.0]), np.array([-1.0, 1.0, -1.0, 1.0]))
+        self._weight_y = (np.array([1.0, 1.0, 0.0, 0.0]), np.array([-1.0, -1.0, 1.0, 1.0]))
+
+    def lookup(self, xs, ys, angles_deg, track):
+        """
+        Ray distances (broadcast like Track.cast_rays, e.g. x/y of shape
+        (N, 1) and angles of shape (N, R)).
+
+        Args:
+            xs, ys, angles_deg: Ray starts and directions
+            track: Track the table was built for - rays the table cannot
+                interpolate are cast on it
+
+        Positions outside the table are clamped to its border.
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        angles = np.asarray(angles_deg, dtype=np.float64)
+
+        # 4 grid points around each position - flat indices (..., 4) and
+        # bilinear weights, broadcast against angle indices (..., 1)
+        gx = np.minimum(np.maximum(xs * (1.0 / self._cell_size), 0), self._nx - 1)
+        gy = np.minimum(np.maximum(ys * (1.0 / self._cell_size), 0), self._ny - 1)
+        x0 = np.minimum(gx.astype(np.intp), self._nx - 2)
+        y0 = np.minimum(gy.astype(np.intp), self._ny - 2)
+        fx = (gx - x0)[..., np.newaxis]
+        fy = (gy - y0)[..., np.newaxis]
+        corners = ((y0 * self._nx + x0) * self._n_angles)[..., np.newaxis] + self._corner_offsets
+        weights = (self._weight_x[0] + self._weight_x[1] * fx) * (self._weight_y[0] + self._weight_y[1] * fy)
+
+        ga = np.mod(angles * (1.0 / self._angle_step), self._n_angles)
+        a0 = ga.astype(np.intp)
+        fa = ga - a0
+
+        result, unreliable = self._interpolate(corners, weights, a0)
+        if fa.any():
+            a1 = (a0 + 1) % self._n_angles
+            result_next, unreliable_next = self._interpolate(corners, weights, a1)
+            result += (result_next - result) * fa
+            unreliable |= unreliable_next
+
+        if unreliable.any():
+            shape = result.shape
+            result[unreliable] = track.cast_rays(np.broadcast_to(xs, shape)[unreliable],
+                                                 np.broadcast_to(ys, shape)[unreliable],
+                                                 np.broadcast_to(angles, shape)[unreliable],
+                                                 self._max_distance, self._ray_step)
+        return result
+
+    def _interpolate(self, corners, weights, angle_index):
+        """Bilinear distances and mask of rays whose grid values disagree."""
+        values = self._flat[corners + angle_index[..., np.newaxis]]
+        low = values.min(axis=-1)
+        unreliable = (values.max(axis=-1) - low > self._max_spread) | (low == 0)
+        return np.einsum('...c,...c->...', values, weights), unreliable
+
+    def matches(self, max_distance, ray_step=5):
+        """True if the table was built for these cast_rays parameters."""
+        return self._max_distance == max_distance and self._ray_step == ray_step
+
+    def measure_error(self, track, n_samples=20000, seed=0):
+        """
+        Compare lookups with exact Track.cast_rays at random drivable
+        positions and grid angles.
+
+        Returns:
+            Dict with max, p99, mean absolute error (pixels), the fraction
+            of lookups within one ray step (the sampling resolution of exact
+            casts) and the fraction of rays that had to be cast
+        """
+        rng = np.random.default_rng(seed)
+        xs = rng.uniform(0, track.width - 1, n_samples * 2)
+        ys = rng.uniform(0, track.height - 1, n_samples * 2)
+        drivable = ~track.is_wall(xs, ys)
+        xs, ys = xs[drivable][:n_samples], ys[drivable][:n_samples]
+        angles = rng.integers(0, self._n_angles, len(xs)) * self._angle_step
+
+        exact = track.cast_rays(xs, ys, angles, self._max_distance, self._ray_step)
+        error = np.abs(self.lookup(xs, ys, angles, track) - exact)
+
+        ix = np.minimum((xs / self._cell_size).astype(np.intp), self._nx - 2)
+        iy = np.minimum((ys / self._cell_size).astype(np.intp), self._ny - 2)
+        corners = (iy * self._nx + ix)[:, np.newaxis] * self._n_angles + self._corner_offsets
+        _, cast = self._interpolate(corners, np.zeros((1, 4)), (angles / self._angle_step).astype(np.intp))
+        return {
+            'samples': int(len(xs)),
+            'max': float(error.max()),
+            'p99': float(np.percentile(error, 99)),
+            'mean': float(error.mean()),
+            'within_ray_step': float(np.mean(error <= self._ray_step)),
+            'cast_fraction': float(np.mean(cast)),
+        }
+
+    @property
+    def distances(self):
+        return self._distances
+
+    @property
+    def cell_size(self):
+        return self._cell_size
+
+    @property
+    def angle_step(self):
+        return self._angle_step
+
+    @property
+    def max_distance(self):
+        return self._max_distance
+
+    @property
+    def error_stats(self):
+        return self._meta.get('error')
+
+    @property
+    def memory_size(self):
+        return self._distances.nbytes
+
+
+def build_ray_table(track, cell_size=4, angle_step=3, max_distance=500, ray_step=5):
+    """
+    Cast rays from every grid point at every angle.
+
+    Rays march like Track.cast_rays (same samples and wall test), but only
+    rays that have not hit a wall yet are advanced.
+
+    Args:
+        track: Track to cast on
+        cell_size: Grid spacing in pixels
+        angle_step: Angle spacing in degrees (must divide 360); 3 matches
+            the car's rotation step, so car rays are always on the grid
+        max_distance: Ray range (must match the env's raycast range)
+        ray_step: Sampling step along rays
+
+    Returns:
+        RayTable (in memory, see load_ray_table for the cached version)
+    """
+    if 360 % angle_step:
+        raise ValueError(f"angle_step must divide 360, got {angle_step}")
+    if max_distance >= np.iinfo(np.uint16).max:
+        raise ValueError(f"max_distance must fit uint16, got {max_distance}")
+
+    nx = (track.width - 1) // cell_size + 2
+    ny = (track.height - 1) // cell_size + 2
+    n_angles = 360 // angle_step
+
+    grid_y, grid_x = np.mgrid[0:ny, 0:nx]
+    px = (grid_x * cell_size).ravel().astype(np.float64)
+    py = (grid_y * cell_size).ravel().astype(np.float64)
+    samples = np.arange(0, max_distance, ray_step, dtype=np.float64)
+
+    distances = np.empty((ny * nx, n_angles), dtype=np.uint16)
+    for angle_index in range(n_angles):
+        rad = np.radians(float(angle_index * angle_step))
+        cos_a, sin_a = np.cos(rad), np.sin(rad)
+
+        hits = np.full(len(px), max_distance, dtype=np.float64)
+        alive = np.arange(len(px))
+        for sample in samples:
+            hit = track.is_wall(px[alive] + cos_a * sample, py[alive] + sin_a * sample)
+            hits[alive[hit]] = sample
+            alive = alive[~hit]
+            if not len(alive):
+                break
+        distances[:, angle_index] = np.rint(hits)
+
+    meta = {
+        'version': RAY_TABLE_VERSION,
+        'cell_size': cell_size,
+        'angle_step': angle_step,
+        'max_distance': max_distance,
+        'ray_step': ray_step,
+        'width': track.width,
+        'height': track.height,
+    }
+    return RayTable(distances.reshape(ny, nx, n_angles), meta)
+
+
+def load_ray_table(track_file, track, cell_size=4, angle_step=3, max_distance=500, ray_step=5,
+                   rebuild=False, max_error=MAX_ERROR):
+    """
+    Load ray table sidecar of a track PNG, building it if missing, older
+    than the PNG or built with other parameters. The array is memory-mapped
+    (shared page cache across env processes), files are written atomically.
+
+    Raises:
+        ValueError: Measured max lookup error (stored with the table) is
+            above max_error pixels - exact casting should be used instead
+    """
+    table_file, meta_file = ray_table_path(track_file)
+    params = {'version': RAY_TABLE_VERSION, 'cell_size': cell_size, 'angle_step': angle_step,
+              'max_distance': max_distance, 'ray_step': ray_step,
+              'width': track.width, 'height': track.height}
+
+    fresh = (not rebuild and os.path.exists(table_file) and os.path.exists(meta_file) and
+             os.path.getmtime(table_file) >= os.path.getmtime(track_file))
+    if fresh:
+        with open(meta_file, 'r') as f:
+            meta = json.load(f)
+        if all(meta.get(key) == value for key, value in params.items()):
+            _check_error(track_file, meta, max_error)
+            return RayTable(np.load(table_file, mmap_mode='r'), meta)
+
+    table = build_ray_table(track, cell_size, angle_step, max_distance, ray_step)
+    meta = dict(params, error=table.measure_error(track))
+
+    suffix = f".{os.getpid()}.tmp"
+    try:
+        np.save(table_file + suffix + '.npy', table.distances)
+        with open(meta_file + suffix, 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(table_file + suffix + '.npy', table_file)
+        os.replace(meta_file + suffix, meta_file)
+    finally:
+        for path in (table_file + suffix + '.npy', meta_file + suffix):
+            if os.path.exists(path):
+                os.remove(path)
+    _check_error(track_file, meta, max_error)
+    return RayTable(np.load(table_file, mmap_mode='r'), meta)
+
+
+def _check_error(track_file, meta, max_error):
+    error = meta['error']
+    if max_error is not None and error['max'] > max_error:
+        raise ValueError(f"Ray table of {track_file} is off by up to {error['max']:.1f} px "
+                         f"(limit {max_error} px) - use exact raycasts or a smaller cell_size")
@@ -4,26 +4,70 @@ import pygame
 class Renderer:
     """Handles all rendering operations."""
 
-    def __init__(self, screen):
+    def __init__(self, screen, dirty_rects=False):
+        """
+        Initialize renderer.
+
+        Args:
+            screen: Pygame surface to draw on
+            dirty_rects: If True, only regions changed since last frame are
+                redrawn and pushed to the display (static track is cached)
+        """
         self._screen = screen
         self._font = pygame.font.Font(None, 36)
-    
+
+        # Dirty-rect mode state
+        self._dirty_rects = dirty_rects
+        self._background = None
+        self._background_key = None
+        self._full_update = True
+        self._current_rects = []
+        self._previous_rects = []
+
+    @property
+    def dirty_rects(self):
+        return self._dirty_rects
+
     def clear(self, color):
         """Fill screen with background color."""
+        if self._dirty_rects and self._background is not None:
+            # Erase only what was drawn last frame
+            for rect in self._previous_rects:
+                self._screen.blit(self._background, rect, rect)
+            return
+
         self._screen.fill(color)
-    
+
     def draw_track(self, track, show_checkpoints=False):
         """Draw track walls and checkpoints."""
-        for wall in track.walls:
+        if not self._dirty_rects:
+            self._draw_track_to(self._screen, track, show_checkpoints)
+            return
+
+        # Static track is drawn once into a cached surface
+        key = (id(track), show_checkpoints)
+        if self._background is None or self._background_key != key:
+            self._background = pygame.Surface(self._screen.get_size())
+            self._background.fill(track.background_color)
+            self._draw_track_to(self._background, track, show_checkpoints)
+            self._background_key = key
+            self._screen.blit(self._background, (0, 0))
+            self._full_update = True
+
+    def _draw_track_to(self, surface, track, show_checkpoints):
+        # Walls of the whole surface area - a tiled track loads the tiles
+        # it covers, so the cached background is complete
+        width, height = surface.get_size()
+        for wall in track.walls_in(0, 0, width, height):
             pygame.draw.rect(
-                self._screen, 
+                surface,
                 track.wall_color,
                 (wall['x'], wall['y'], wall['width'], wall['height'])
             )
 
         if track.start_finish_line:
             pygame.draw.line(
-                self._screen,
+                surface,
                 (255, 255, 0),
                 (track.start_finish_line['x1'], track.start_finish_line['y1']),
                 (track.start_finish_line['x2'], track.start_finish_line['y2']),
@@ -33,38 +77,95 @@ class Renderer:
         if show_checkpoints:
             for checkpoint in track.checkpoints:
                 pygame.draw.line(
-                    self._screen,
+                    surface,
                     track.checkpoint_color,
                     (checkpoint['x1'], checkpoint['y1']),
                     (checkpoint['x2'], checkpoint['y2']),
                     5
                 )
 
-    def draw_vehicle(self, vehicle):
-        """Draw vehicle with front indicator."""
-        corners = vehicle.get_corners()
+    def draw_vehicle(self, vehicle, pose=None):
+        """
+        Draw vehicle with front indicator.
+
+        Args:
+            vehicle: Vehicle to draw
+            pose: Optional (x, y, angle) to draw at instead of the vehicle's
+                own pose (e.g. interpolated between physics ticks)
+        """
+        corners = vehicle.get_corners() if pose is None else vehicle.get_corners_at(*pose)
         # Draw main body
-        pygame.draw.polygon(self._screen, vehicle.color, corners)
+        self._mark(pygame.draw.polygon(self._screen, vehicle.color, corners))
         # Draw front indicator (red line)
-        pygame.draw.line(self._screen, (255, 0, 0), corners[1], corners[2], 3)
+        self._mark(pygame.draw.line(self._screen, (255, 0, 0), corners[1], corners[2], 3))
+
+    def draw_ghost(self, vehicle, pose, alpha=100):
+        """
+        Draw translucent ghost car.
+
+        Args:
+            vehicle: Vehicle whose shape and color is used
+            pose: (x, y, angle) of the ghost
+            alpha: Opacity 0-255
+        """
+        corners = vehicle.get_corners_at(*pose)
+        xs = [x for x, _ in corners]
+        ys = [y for _, y in corners]
+        left, top = int(min(xs)) - 1, int(min(ys)) - 1
+        width, height = int(max(xs)) - left + 2, int(max(ys)) - top + 2
+
+        # Alpha shapes need their own surface - only as big as the car
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        local = [(x - left, y - top) for x, y in corners]
+        pygame.draw.polygon(surface, (*vehicle.color, alpha), local)
+        pygame.draw.line(surface, (255, 0, 0, alpha), local[1], local[2], 3)
+        self._mark(self._screen.blit(surface, (left, top)))
 
     def draw_raycasts(self, vehicle, endpoints):
         """Draw raycasts as lines from vehicle to endpoints."""
         for end_x, end_y in endpoints:
-            pygame.draw.line(
+            self._mark(pygame.draw.line(
                 self._screen,
                 (0, 255, 0),  # Green color
                 (int(vehicle.x), int(vehicle.y)),
                 (int(end_x), int(end_y)),
                 1
-            )
+            ))
             # Red dot at ray end
-            pygame.draw.circle(self._screen, (255, 0, 0), (int(end_x), int(end_y)), 3)
+            self._mark(pygame.draw.circle(self._screen, (255, 0, 0), (int(end_x), int(end_y)), 3))
 
     def draw_text(self, text, x, y, color=(255, 255, 255)):
         """Draw text on screen."""
         surface = self._font.render(text, True, color)
-        self._screen.blit(surface, (x, y))
-    
+        self._mark(self._screen.blit(surface, (x, y)))
+
+    def _mark(self, rect):
+        """Remember region touched this frame (dirty-rect mode only)."""
+        if self._dirty_rects:
+            # Pad by 1px - antialiased/thick primitives may bleed past bounds
+            self._current_rects.append(rect.inflate(2, 2))
+
     def update_display(self):
-        pygame.display.flip()
+        full_update = not self._dirty_rects or self._full_update
+        rects = self.finish_frame()
+
+        if full_update:
+            pygame.display.flip()
+        else:
+            # Push last frame's regions (now erased) and this frame's drawings
+            pygame.display.update(rects)
+
+    def finish_frame(self):
+        """
+        End current frame without presenting it (e.g. offscreen rendering).
+
+        Returns:
+            List of screen regions changed since previous frame
+        """
+        screen_rect = self._screen.get_rect()
+        rects = [r.clip(screen_rect) for r in self._previous_rects + self._current_rects]
+
+        self._full_update = False
+        self._previous_rects = self._current_rects
+        self._current_rects = []
+        return [r for r in rects if r.width and r.height]
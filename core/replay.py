@@ -0,0 +1,190 @@
+import bisect
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+
+# One record per vehicle per tick (28 bytes, fixed width)
+REPLAY_DTYPE = np.dtype([
+    ('tick', '<u4'),
+    ('episode', '<u2'),
+    ('vehicle', '<u2'),
+    ('x', '<f4'),
+    ('y', '<f4'),
+    ('angle', '<f4'),
+    ('speed', '<f4'),
+    ('action', 'i1'),  # -1 = no discrete action (player, reset state)
+    ('checkpoint', 'u1'),
+    ('lap', '<u2'),
+])
+
+REPLAY_MAGIC = b'RPLY'
+REPLAY_VERSION = 1
+
+# magic, version, header length
+_PREFIX = struct.Struct('<4sHI')
+
+
+class ReplayWriter:
+    """
+    Records per-tick vehicle state into a compact binary replay file.
+
+    File layout:
+        prefix  - magic, format version, header length
+        header  - JSON (track, model, tick_dt, ...), padded to 8 bytes
+        records - REPLAY_DTYPE records, appended in chunks
+
+    Records are collected in a preallocated chunk and written when it fills
+    up, so recording costs one row assignment per vehicle per tick.
+    """
+
+    def __init__(self, path, track=None, model=None, tick_dt=1 / 60, chunk_size=4096, **extra):
+        """
+        Open replay file for writing.
+
+        Args:
+            path: Output file (e.g. "replays/run.replay")
+            track: Track id stored in header (e.g. PNG path)
+            model: Model id stored in header (e.g. model path)
+            tick_dt: Simulated seconds per tick
+            chunk_size: Records buffered before writing to disk
+            extra: Additional JSON-serializable header fields
+        """
+        header = {
+            'track': track,
+            'model': model,
+            'tick_dt': tick_dt,
+            'dtype': [list(field) for field in REPLAY_DTYPE.descr],
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        header.update(extra)
+
+        header_bytes = json.dumps(header).encode('utf-8')
+        padding = (-(_PREFIX.size + len(header_bytes))) % 8
+        header_bytes += b' ' * padding
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._path = path
+        self._file = open(path, 'wb')
+        self._file.write(_PREFIX.pack(REPLAY_MAGIC, REPLAY_VERSION, len(header_bytes)))
+        self._file.write(header_bytes)
+
+        self._chunk = np.zeros(chunk_size, dtype=REPLAY_DTYPE)
+        self._count = 0
+        self._total = 0
+
+    def record(self, tick, vehicle, action=-1, checkpoint=0, lap=0, vehicle_id=0, episode=0):
+        """Append state of one vehicle at given tick."""
+        self._chunk[self._count] = (tick, episode, vehicle_id, vehicle.x, vehicle.y,
+                                    vehicle.angle, vehicle.speed, action, checkpoint, lap)
+        self._count += 1
+        if self._count == len(self._chunk):
+            self.flush()
+
+    def flush(self):
+        """Write buffered records to disk."""
+        if self._count:
+            self._file.write(self._chunk[:self._count].tobytes())
+            self._total += self._count
+            self._count = 0
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def records_written(self):
+        return self._total + self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ReplayReader:
+    """
+    Memory-mapped access to a replay file.
+
+    Only the header is parsed on open. Records are read from disk on
+    access, so seeking to any tick is a binary search over the tick column
+    (ticks are non-decreasing) instead of a scan of the whole file.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, version, header_length = _PREFIX.unpack(f.read(_PREFIX.size))
+            if magic != REPLAY_MAGIC:
+                raise ValueError(f"Not a replay file: {path}")
+            if version != REPLAY_VERSION:
+                raise ValueError(f"Unsupported replay version {version}: {path}")
+            self._header = json.loads(f.read(header_length).decode('utf-8'))
+
+        offset = _PREFIX.size + header_length
+        n_records = (os.path.getsize(path) - offset) // REPLAY_DTYPE.itemsize
+
+        if n_records > 0:
+            self._records = np.memmap(path, dtype=REPLAY_DTYPE, mode='r',
+                                      offset=offset, shape=(n_records,))
+        else:
+            self._records = np.zeros(0, dtype=REPLAY_DTYPE)
+
+    @property
+    def header(self):
+        return dict(self._header)
+
+    @property
+    def records(self):
+        """All records (memory-mapped structured array)."""
+        return self._records
+
+    @property
+    def tick_dt(self):
+        return self._header.get('tick_dt', 1 / 60)
+
+    @property
+    def first_tick(self):
+        return int(self._records['tick'][0]) if len(self._records) else 0
+
+    @property
+    def last_tick(self):
+        return int(self._records['tick'][-1]) if len(self._records) else 0
+
+    def __len__(self):
+        return len(self._records)
+
+    def _tick_index(self, tick, side='left'):
+        """Binary search over tick column, reading only O(log n) records."""
+        # bisect indexes the memmap element by element - np.searchsorted
+        # would first copy the whole (strided) column into memory
+        ticks = self._records['tick']
+        if side == 'left':
+            return bisect.bisect_left(ticks, tick)
+        return bisect.bisect_right(ticks, tick)
+
+    def at_tick(self, tick):
+        """Return records of all vehicles at given tick (empty if none)."""
+        start = self._tick_index(tick, 'left')
+        end = self._tick_index(tick, 'right')
+        return self._records[start:end]
+
+    def vehicle_records(self, vehicle_id, start_tick=None, end_tick=None):
+        """Return records of one vehicle, optionally limited to a tick range."""
+        start = 0 if start_tick is None else self._tick_index(start_tick, 'left')
+        end = len(self._records) if end_tick is None else self._tick_index(end_tick, 'right')
+        window = self._records[start:end]
+        return window[window['vehicle'] == vehicle_id]
@@ -0,0 +1,501 @@
+import json
+import math
+import os
+import shutil
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from core.track import Track
+from core.track_loader import TrackLoader
+
+
+TILE_META = 'meta.json'
+TILE_FORMAT_VERSION = 1
+
+
+def tiles_path(track_file):
+    """Default tile directory for a track (e.g. tracks/big.png -> tracks/big_tiles)."""
+    return os.path.splitext(track_file)[0] + '_tiles'
+
+
+def is_tiled_track(path):
+    return os.path.isfile(os.path.join(path, TILE_META))
+
+
+def _wall_mask(pixels):
+    return (pixels[..., 0] < 50) & (pixels[..., 1] < 50) & (pixels[..., 2] < 50)
+
+
+def _read_band(image, y0, y1):
+    """Rows y0..y1 of an image as an int16 RGB array (signed for color math)."""
+    return np.array(image.crop((0, y0, image.width, y1)).convert('RGB'), dtype=np.int16)
+
+
+def _wall_runs(mask, row_offset=0):
+    """
+    Horizontal runs of wall pixels per row.
+
+    Returns:
+        Arrays rows, starts, ends (end exclusive) in row-major order
+    """
+    height, width = mask.shape
+    padded = np.zeros((height, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return rows + row_offset, starts, ends
+
+
+def _wall_rects(rows, starts, ends):
+    """
+    Merge wall runs into rectangles (vectorized).
+
+    Runs with the same x span in consecutive rows form one rectangle, so
+    runs of several row bands (see _wall_runs()) can be merged together.
+
+    Returns:
+        Int32 array (N, 4) of x, y, width, height
+    """
+    if len(rows) == 0:
+        return np.zeros((0, 4), dtype=np.int32)
+
+    order = np.lexsort((rows, ends, starts))
+    rows, starts, ends = rows[order], starts[order], ends[order]
+    new_rect = np.r_[True, (starts[1:] != starts[:-1]) |
+                           (ends[1:] != ends[:-1]) |
+                           (rows[1:] != rows[:-1] + 1)]
+    first = np.flatnonzero(new_rect)
+    heights = np.diff(np.r_[first, len(rows)])
+
+    return np.stack([starts[first], rows[first], ends[first] - starts[first], heights],
+                    axis=1).astype(np.int32)
+
+
+def _distance_field(mask, cap):
+    """
+    Euclidean distance (px) from each pixel center to the nearest wall pixel
+    center, capped at `cap`. Exact for distances below the cap.
+    """
+    height, width = mask.shape
+    rows = np.arange(height)[:, np.newaxis]
+    far = height + cap + 1
+
+    # Vertical distance to nearest wall in the same column
+    above = np.maximum.accumulate(np.where(mask, rows, -far), axis=0)
+    below = np.minimum.accumulate(np.where(mask, rows, 2 * far)[::-1], axis=0)[::-1]
+    vertical = np.minimum(np.minimum(rows - above, below - rows), cap + 1).astype(np.float32)
+
+    # Combine columns: d^2 = min over dx of (vertical at x + dx)^2 + dx^2
+    squared = vertical ** 2
+    result = squared.copy()
+    for dx in range(1, min(cap, width - 1) + 1):
+        np.minimum(result[:, dx:], squared[:, :-dx] + dx * dx, out=result[:, dx:])
+        np.minimum(result[:, :-dx], squared[:, dx:] + dx * dx, out=result[:, :-dx])
+
+    return np.minimum(np.floor(np.sqrt(result)), cap).astype(np.uint8)
+
+
+def build_tiled_track(track_file, output_dir=None, tile_size=256, distance_cap=64):
+    """
+    Convert a track PNG into the tiled format.
+
+    Layout of output_dir:
+        meta.json            - size, tile size, start line, checkpoints
+        tile_<ty>_<tx>.npz   - packed occupancy, distance field and wall
+                               rectangles (full, unclipped) touching the tile
+
+    Walls, checkpoints and start line come from the track's JSON cache if
+    it is up to date (identical collision response), otherwise walls are
+    extracted directly as merged pixel runs. Tiles with no wall within
+    distance_cap are not written - missing tiles are free road.
+
+    The build goes to a temporary directory next to output_dir that
+    replaces it only when complete, so a failed or interrupted rebuild
+    leaves the previous build untouched and readers never see a mix of
+    old and new tiles.
+
+    The image is converted and scanned one row of tiles at a time (plus
+    distance_cap rows around it for the distance field), so memory beyond
+    the decoded image grows with the width of the map, not its area.
+
+    Args:
+        track_file: Track PNG
+        output_dir: Tile directory (default: <track>_tiles next to PNG)
+        tile_size: Tile edge in pixels
+        distance_cap: Distance field saturates at this many pixels
+
+    Returns:
+        Track metadata dict (like TrackLoader track data, without walls)
+    """
+    output_dir = os.path.normpath(output_dir or tiles_path(track_file))
+    build_dir = f"{output_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+    try:
+        meta = _write_tiles(track_file, build_dir, tile_size, distance_cap)
+        _replace_dir(build_dir, output_dir)
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+    return meta
+
+
+def _replace_dir(new_dir, target_dir):
+    """
+    Move new_dir to target_dir, replacing the previous directory.
+
+    Directories cannot be replaced in one rename, so the old one is moved
+    aside first - target_dir is missing (not half-written) for the moment
+    between the two renames, and restored if the second one fails.
+    """
+    old_dir = f"{target_dir}.{os.getpid()}.old"
+    had_old = os.path.exists(target_dir)
+    if had_old:
+        os.replace(target_dir, old_dir)
+    try:
+        os.replace(new_dir, target_dir)
+    except OSError:
+        if had_old:
+            os.replace(old_dir, target_dir)
+        raise
+    if had_old:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def _write_tiles(track_file, output_dir, tile_size, distance_cap):
+    """Write tiles and meta.json of a track into an empty directory (see build_tiled_track())."""
+    loader = TrackLoader()
+    image = Image.open(track_file)
+    width, height = image.size
+    n_tiles_y = math.ceil(height / tile_size)
+    n_tiles_x = math.ceil(width / tile_size)
+
+    if loader.is_cached(track_file):
+        # Same walls as the regular track - collision response stays identical
+        track_data = loader.load_from_png(track_file)
+        start_finish_line = track_data['start_finish_line']
+        start_position = tuple(track_data['start_position'])
+        checkpoints = track_data['checkpoints']
+        rects = np.array([(w['x'], w['y'], w['width'], w['height']) for w in track_data['walls']],
+                         dtype=np.int32).reshape(-1, 4)
+    else:
+        # Collect wall runs, start line and checkpoint pixels band by band,
+        # then merge them as if the whole image was scanned at once
+        runs, yellow, checkpoint_pixels = [], [], {}
+        for ty in range(n_tiles_y):
+            y0 = ty * tile_size
+            pixels = _read_band(image, y0, min(y0 + tile_size, height))
+            runs.append(_wall_runs(_wall_mask(pixels), y0))
+            yellow.append(loader.start_line_pixels(pixels, y0))
+            for key, coordinates in loader.checkpoint_pixels(pixels, y0).items():
+                checkpoint_pixels.setdefault(key, []).append(coordinates)
+        del pixels
+
+        start_finish_line, start_position = loader.start_finish_line(
+            *(np.concatenate(axis) for axis in zip(*yellow)))
+        if start_position is None:
+            start_position = (100, height // 2)
+        checkpoints = loader.fit_checkpoints(
+            {key: tuple(np.concatenate(axis) for axis in zip(*parts))
+             for key, parts in checkpoint_pixels.items()}, width)
+        rects = _wall_rects(*(np.concatenate(axis) for axis in zip(*runs)))
+
+    # Every rectangle is stored in each tile it overlaps
+    tile_rects = {}
+    for rect in rects:
+        x, y, w, h = (int(v) for v in rect)
+        for ty in range(y // tile_size, (y + h - 1) // tile_size + 1):
+            for tx in range(x // tile_size, (x + w - 1) // tile_size + 1):
+                tile_rects.setdefault((ty, tx), []).append(rect)
+
+    n_written = 0
+
+    for ty in range(n_tiles_y):
+        y0 = ty * tile_size
+        y1 = min(y0 + tile_size, height)
+
+        # Distance field needs walls up to distance_cap around the tile
+        hy0, hy1 = max(y0 - distance_cap, 0), min(y1 + distance_cap, height)
+        band = _wall_mask(_read_band(image, hy0, hy1))
+        if not band.any():
+            continue
+
+        for tx in range(n_tiles_x):
+            x0 = tx * tile_size
+            x1 = min(x0 + tile_size, width)
+            hx0, hx1 = max(x0 - distance_cap, 0), min(x1 + distance_cap, width)
+            region = band[:, hx0:hx1]
+            if not region.any():
+                continue
+
+            distance = _distance_field(region, distance_cap)[y0 - hy0:y1 - hy0, x0 - hx0:x1 - hx0]
+            occupancy = band[y0 - hy0:y1 - hy0, x0:x1]
+            walls = np.array(tile_rects.get((ty, tx), []), dtype=np.int32).reshape(-1, 4)
+
+            np.savez_compressed(
+                os.path.join(output_dir, f'tile_{ty}_{tx}.npz'),
+                occupancy=np.packbits(occupancy, axis=1),
+                distance=distance,
+                walls=walls,
+                shape=np.array(occupancy.shape)
+            )
+            n_written += 1
+
+    meta = {
+        'version': TILE_FORMAT_VERSION,
+        'source': track_file,
+        'width': width,
+        'height': height,
+        'tile_size': tile_size,
+        'distance_cap': distance_cap,
+        'start_position': list(start_position),
+        'start_finish_line': start_finish_line,
+        'checkpoints': checkpoints,
+        'n_walls': len(rects),
+        'n_tiles': n_written,
+    }
+    with open(os.path.join(output_dir, TILE_META), 'w') as f:
+        json.dump(meta, f)
+
+    return meta
+
+
+class _Tile:
+    """Decoded tile data kept in memory."""
+
+    __slots__ = ('occupancy', 'distance', 'walls')
+
+    def __init__(self, occupancy, distance, walls):
+        self.occupancy = occupancy
+        self.distance = distance
+        self.walls = walls
+
+    @property
+    def nbytes(self):
+        return self.occupancy.nbytes + self.distance.nbytes + self.walls.nbytes
+
+
+class TiledTrack(Track):
+    """
+    Track stored as tiles that are loaded on demand.
+
+    Only checkpoints and the start line are kept globally. Occupancy,
+    distance field and walls are read per tile when a lookup first touches
+    it and kept in least-recently-used order; above max_tiles the least
+    recently used tiles are dropped. Tiles around vehicles are touched every
+    step (collisions, raycasts), so distant tiles are the ones evicted and
+    memory stays bounded regardless of track size.
+
+    Lookups take point arrays spanning any number of tiles, so collision
+    tests and raycasts work across tile borders like on a regular Track.
+    """
+
+    def __init__(self, tile_dir, max_tiles=64):
+        """
+        Open tiled track.
+
+        Args:
+            tile_dir: Directory written by build_tiled_track()
+            max_tiles: Tiles kept in memory
+        """
+        with open(os.path.join(tile_dir, TILE_META), 'r') as f:
+            meta = json.load(f)
+        if meta.get('version') != TILE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported tile format version {meta.get('version')}: {tile_dir}")
+
+        super().__init__(track_data={
+            'width': meta['width'],
+            'height': meta['height'],
+            'walls': [],
+            'checkpoints': meta['checkpoints'],
+            'start_position': tuple(meta['start_position']),
+            'start_finish_line': meta['start_finish_line'],
+        })
+
+        self._tile_dir = tile_dir
+        self._tile_size = meta['tile_size']
+        self._distance_cap = meta['distance_cap']
+        self._n_tiles_x = math.ceil(self._width / self._tile_size)
+        self._max_tiles = max_tiles
+        self._tiles = OrderedDict()
+        self._tile_loads = 0
+
+    def _tile(self, key):
+        """Tile by key (ty * n_tiles_x + tx); None for empty tiles."""
+        if key in self._tiles:
+            self._tiles.move_to_end(key)
+            return self._tiles[key]
+
+        ty, tx = divmod(key, self._n_tiles_x)
+        path = os.path.join(self._tile_dir, f'tile_{ty}_{tx}.npz')
+        tile = None
+        if os.path.exists(path):
+            with np.load(path) as data:
+                tile_height, tile_width = data['shape']
+                occupancy = np.unpackbits(data['occupancy'], axis=1, count=tile_width).astype(bool)
+                tile = _Tile(occupancy, data['distance'], data['walls'])
+            self._tile_loads += 1
+
+        self._tiles[key] = tile
+        return tile
+
+    def _evict(self):
+        while len(self._tiles) > self._max_tiles:
+            self._tiles.popitem(last=False)
+
+    def _gather(self, ix, iy, field, outside_value):
+        """Read per-pixel tile data for integer pixel arrays of any shape."""
+        out = np.full(ix.shape, outside_value, dtype=np.uint8)
+        inside = (ix >= 0) & (ix < self._width) & (iy >= 0) & (iy < self._height)
+        if not inside.any():
+            return out
+
+        ix, iy = ix[inside], iy[inside]
+        size = self._tile_size
+        keys = (iy // size) * self._n_tiles_x + ix // size
+        values = np.full(ix.shape, outside_value, dtype=np.uint8)
+
+        unique_keys = np.unique(keys)
+        for key in unique_keys:
+            tile = self._tile(int(key))
+            if tile is None:
+                continue
+            ty, tx = divmod(int(key), self._n_tiles_x)
+            rows = keys == key if len(unique_keys) > 1 else slice(None)
+            values[rows] = getattr(tile, field)[iy[rows] - ty * size, ix[rows] - tx * size]
+
+        self._evict()
+        out[inside] = values
+        return out
+
+    def _wall_pixels(self, ix, iy):
+        return self._gather(ix, iy, 'occupancy', 0).astype(bool)
+
+    def distance_to_wall(self, xs, ys):
+        """
+        Distance (px, capped at distance_cap) from the pixel containing each
+        point to the nearest wall pixel.
+        """
+        ix = np.clip(np.floor(np.asarray(xs, dtype=np.float64)), -1, self._width).astype(np.intp)
+        iy = np.clip(np.floor(np.asarray(ys, dtype=np.float64)), -1, self._height).astype(np.intp)
+        return self._gather(ix, iy, 'distance', self._distance_cap).astype(np.float64)
+
+    def cast_rays(self, start_x, start_y, angles_deg, max_distance=300, step=5):
+        """
+        Cast many rays at once - same samples and results as Track.cast_rays.
+
+        Instead of testing every sample, each ray skips samples that the
+        distance field proves wall-free (sphere tracing), so open road costs
+        a few lookups per ray.
+        """
+        start_x, start_y, angles = np.broadcast_arrays(
+            np.asarray(start_x, dtype=np.float64),
+            np.asarray(start_y, dtype=np.float64),
+            np.asarray(angles_deg, dtype=np.float64)
+        )
+        shape = angles.shape
+        rad = np.radians(angles).ravel()
+        cos, sin = np.cos(rad), np.sin(rad)
+        start_x, start_y = start_x.ravel(), start_y.ravel()
+        samples = np.arange(0, max_distance, step, dtype=np.float64)
+
+        result = np.full(rad.shape, float(max_distance))
+        sample_index = np.zeros(rad.shape, dtype=np.intp)
+        active = np.arange(rad.size)
+
+        while active.size:
+            distance = samples[sample_index[active]]
+            xs = start_x[active] + cos[active] * distance
+            ys = start_y[active] + sin[active] * distance
+
+            hit = self.is_wall(xs, ys)
+            result[active[hit]] = distance[hit]
+
+            # Points closer than (wall distance - half pixel diagonals) to
+            # this sample cannot touch a wall pixel
+            safe = self.distance_to_wall(xs, ys) - 1.5
+            skip = np.maximum(np.ceil(safe / step).astype(np.intp) - 1, 1)
+            sample_index[active] += skip
+
+            active = active[~hit & (sample_index[active] < len(samples))]
+
+        return result.reshape(shape)
+
+    def prepare(self):
+        """Load tiles around the start position."""
+        x, y = self._start_position
+        self.prefetch(x, y, self._tile_size)
+
+    def prefetch(self, x, y, radius):
+        """Load tiles overlapping a square around a point (e.g. a vehicle)."""
+        for key in self._tile_keys(x - radius, y - radius, x + radius, y + radius):
+            self._tile(key)
+        self._evict()
+
+    def _tile_keys(self, x0, y0, x1, y1):
+        size = self._tile_size
+        tx0, ty0 = max(int(x0) // size, 0), max(int(y0) // size, 0)
+        tx1 = min(int(x1) // size, self._n_tiles_x - 1)
+        ty1 = min(int(y1) // size, math.ceil(self._height / size) - 1)
+        return [ty * self._n_tiles_x + tx for ty in range(ty0, ty1 + 1) for tx in range(tx0, tx1 + 1)]
+
+    def walls_near(self, x, y, radius):
+        """Walls overlapping a square around a point (from tiles it touches)."""
+        return self.walls_in(x - radius, y - radius, x + radius, y + radius)
+
+    def walls_in(self, x0, y0, x1, y1):
+        """
+        Walls overlapping a rectangle, loading every tile it touches.
+
+        Rectangles are stored in each tile they overlap, so the result is
+        complete even if some of the tiles are evicted again right after.
+        """
+        arrays = [tile.walls for tile in (self._tile(key) for key in self._tile_keys(x0, y0, x1, y1))
+                  if tile is not None and len(tile.walls)]
+        self._evict()
+        if not arrays:
+            return []
+
+        walls = np.unique(np.concatenate(arrays), axis=0)
+        return [{'x': int(wx), 'y': int(wy), 'width': int(ww), 'height': int(wh)}
+                for wx, wy, ww, wh in walls]
+
+    @property
+    def walls(self):
+        """
+        Walls of tiles currently in memory (the whole track is never loaded).
+        Use walls_in() for all walls of a region.
+        """
+        arrays = [tile.walls for tile in self._tiles.values() if tile is not None and len(tile.walls)]
+        if not arrays:
+            return []
+        return [{'x': int(wx), 'y': int(wy), 'width': int(ww), 'height': int(wh)}
+                for wx, wy, ww, wh in np.unique(np.concatenate(arrays), axis=0)]
+
+    @property
+    def occupancy(self):
+        raise AttributeError("TiledTrack has no global occupancy grid - use is_wall()")
+
+    @property
+    def tile_size(self):
+        return self._tile_size
+
+    @property
+    def distance_cap(self):
+        return self._distance_cap
+
+    @property
+    def loaded_tiles(self):
+        return sum(1 for tile in self._tiles.values() if tile is not None)
+
+    @property
+    def tile_loads(self):
+        """Tile reads from disk so far (grows on every reload after eviction)."""
+        return self._tile_loads
+
+    @property
+    def memory_size(self):
+        size = len(self._checkpoints) * self._DICT_BYTES
+        return size + sum(tile.nbytes for tile in self._tiles.values() if tile is not None)
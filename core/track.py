@@ -1,5 +1,10 @@
+import numpy as np
+
+
 class Track:
 
+    _DICT_BYTES = 360  # Rough size of one wall/checkpoint dict (memory estimates)
+
     def __init__(self, width=None, height=None, track_data=None):
         """
         Initialize track either from dimensions (creates default track)
@@ -27,6 +32,13 @@ class Track:
             self._setup_basic_track()
             self._setup_checkpoints()
 
+        # Wall occupancy grid (built on first use)
+        self._occupancy = None
+
+        # Distance along the track to each checkpoint/finish (optional, see
+        # core/progress_field.py)
+        self._progress_field = None
+
         self._background_color = (50, 50, 50)
         self._wall_color = (100, 100, 100)
         self._checkpoint_color = (255, 215, 0)
@@ -105,42 +117,43 @@ class Track:
         if checkpoint.get('passed', False):
             return False
 
+        if self.crosses_checkpoint(prev_x, prev_y, curr_x, curr_y, next_checkpoint_id):
+            checkpoint['passed'] = True
+            return True
+
+        return False
+
+    def crosses_checkpoint(self, prev_x, prev_y, curr_x, curr_y, checkpoint_id):
+        """
+        Check if movement segment crosses given checkpoint line.
+
+        Unlike check_checkpoint_crossing() this does not use or modify the
+        shared 'passed' flags, so many vehicles can track checkpoints on
+        the same track independently.
+        """
+        if checkpoint_id >= len(self._checkpoints):
+            return False
+
+        checkpoint = self._checkpoints[checkpoint_id]
         cp_x1, cp_y1 = checkpoint['x1'], checkpoint['y1']
         cp_x2, cp_y2 = checkpoint['x2'], checkpoint['y2']
 
         # Simple line-line intersection using determinant method
         # Line 1: from (prev_x, prev_y) to (curr_x, curr_y)
         # Line 2: from (cp_x1, cp_y1) to (cp_x2, cp_y2)
+        s1_x = curr_x - prev_x
+        s1_y = curr_y - prev_y
+        s2_x = cp_x2 - cp_x1
+        s2_y = cp_y2 - cp_y1
 
-        def line_intersection(p0_x, p0_y, p1_x, p1_y, p2_x, p2_y, p3_x, p3_y):
-            """
-            Check if line segment p0-p1 intersects with line segment p2-p3
-            Returns True if they intersect
-            """
-            s1_x = p1_x - p0_x
-            s1_y = p1_y - p0_y
-            s2_x = p3_x - p2_x
-            s2_y = p3_y - p2_y
-
-            denom = (-s2_x * s1_y + s1_x * s2_y)
-            if abs(denom) < 1e-10:  # Lines are parallel
-                return False
-
-            s = (-s1_y * (p0_x - p2_x) + s1_x * (p0_y - p2_y)) / denom
-            t = ( s2_x * (p0_y - p2_y) - s2_y * (p0_x - p2_x)) / denom
-
-            if 0 <= s <= 1 and 0 <= t <= 1:
-                return True
+        denom = (-s2_x * s1_y + s1_x * s2_y)
+        if abs(denom) < 1e-10:  # Lines are parallel
             return False
 
-        # Check if movement line crosses checkpoint line
-        intersects = line_intersection(prev_x, prev_y, curr_x, curr_y, cp_x1, cp_y1, cp_x2, cp_y2)
-
-        if intersects:
-            checkpoint['passed'] = True
-            return True
+        s = (-s1_y * (prev_x - cp_x1) + s1_x * (prev_y - cp_y1)) / denom
+        t = ( s2_x * (prev_y - cp_y1) - s2_y * (prev_x - cp_x1)) / denom
 
-        return False
+        return 0 <= s <= 1 and 0 <= t <= 1
 
     def check_finish_line_crossing(self, prev_x, prev_y, curr_x, curr_y):
         """Check if vehicle crossed the finish line (any direction)."""
@@ -170,6 +183,14 @@ class Track:
         for checkpoint in self._checkpoints:
             checkpoint['passed'] = False
 
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
     @property
     def walls(self):
         return self._walls
@@ -202,38 +223,147 @@ class Track:
     def checkpoint_color(self):
         return self._checkpoint_color
 
+    def set_progress_field(self, field):
+        """Attach precomputed progress field (n_checkpoints + 1, height, width)."""
+        self._progress_field = field
+
+    @property
+    def progress_field(self):
+        return self._progress_field
+
+    def distance_along_track(self, x, y, next_checkpoint):
+        """
+        Driving distance from a point to the next target line - checkpoint
+        next_checkpoint, or the finish line once all checkpoints are passed.
+
+        Returns:
+            Distance in pixels, or None without a progress field or where
+            the target is unreachable (walls)
+        """
+        field = self._progress_field
+        if field is None:
+            return None
+
+        ix, iy = int(x), int(y)
+        target = min(next_checkpoint, len(field) - 1)
+        if not (0 <= ix < self._width and 0 <= iy < self._height):
+            return None
+
+        distance = field[target, iy, ix]
+        if distance == np.iinfo(field.dtype).max:
+            return None
+        return float(distance)
+
+    def prepare(self):
+        """Build lookup structures now instead of on first collision test."""
+        self._padded_occupancy()
+
+    def walls_near(self, x, y, radius):
+        """Walls that may touch a circle around a point (all walls here)."""
+        return self._walls
+
+    def walls_in(self, x0, y0, x1, y1):
+        """Walls that may overlap a rectangle (all walls here)."""
+        return self._walls
+
+    @property
+    def memory_size(self):
+        """Approximate bytes held by track data (wall dicts + occupancy grid)."""
+        size = (len(self._walls) + len(self._checkpoints)) * self._DICT_BYTES
+        if self._occupancy is not None:
+            size += self._occupancy.nbytes
+        if self._progress_field is not None:
+            size += self._progress_field.nbytes
+        return size
+
+    @property
+    def occupancy(self):
+        """Boolean wall grid (height x width), True where a wall covers the pixel."""
+        return self._padded_occupancy()[1:-1, 1:-1]
+
+    def _padded_occupancy(self):
+        """Occupancy grid with a free 1px border (built on first use)."""
+        if self._occupancy is None:
+            occupancy = np.zeros((self._height + 2, self._width + 2), dtype=bool)
+            for wall in self._walls:
+                x, y = max(int(wall['x']), 0), max(int(wall['y']), 0)
+                x_end = min(int(wall['x'] + wall['width']), self._width)
+                y_end = min(int(wall['y'] + wall['height']), self._height)
+                occupancy[y + 1:y_end + 1, x + 1:x_end + 1] = True
+            self._occupancy = occupancy
+        return self._occupancy
+
+    def is_wall(self, xs, ys):
+        """
+        Vectorized wall test for arrays of points (outside the map is free).
+
+        Same result as testing every wall rectangle with closed bounds
+        (x <= px <= x + width): a point hits if any pixel whose closed
+        unit square contains it is a wall, so points lying exactly on a
+        wall's right/bottom edge also hit.
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        fx = np.floor(xs)
+        fy = np.floor(ys)
+
+        # Pixel containing the point; anything outside the map is clipped
+        # just outside it (always free)
+        ix = np.clip(fx, -1, self._width).astype(np.intp)
+        iy = np.clip(fy, -1, self._height).astype(np.intp)
+        hit = self._wall_pixels(ix, iy)
+
+        # Points on integer coordinates also touch the pixel to the left/top
+        on_x_edge = xs == fx
+        on_y_edge = ys == fy
+        if on_x_edge.any() or on_y_edge.any():
+            hit = (hit |
+                   (on_x_edge & self._wall_pixels(ix - 1, iy)) |
+                   (on_y_edge & self._wall_pixels(ix, iy - 1)) |
+                   (on_x_edge & on_y_edge & self._wall_pixels(ix - 1, iy - 1)))
+        return hit
+
+    def _wall_pixels(self, ix, iy):
+        """Occupancy of integer pixels (anything outside the map is free)."""
+        occupancy = self._padded_occupancy()
+        px = np.clip(ix + 1, 0, self._width + 1)
+        py = np.clip(iy + 1, 0, self._height + 1)
+        return occupancy[py, px]
+
     def check_collision(self, corners):
         """Check if any corner collides with walls."""
-        for corner_x, corner_y in corners:
-            for wall in self._walls:
-                if (wall['x'] <= corner_x <= wall['x'] + wall['width'] and
-                    wall['y'] <= corner_y <= wall['y'] + wall['height']):
-                    return True
-        return False
+        corners = np.asarray(corners, dtype=np.float64)
+        return bool(self.is_wall(corners[:, 0], corners[:, 1]).any())
 
     def cast_ray(self, start_x, start_y, angle_deg, max_distance=300):
         """
         Cast a ray from start position at given angle.
         Returns distance to nearest wall (or max_distance if no hit).
         """
-        import math
-        rad = math.radians(angle_deg)
-        dx = math.cos(rad)
-        dy = math.sin(rad)
+        return float(self.cast_rays(start_x, start_y, angle_deg, max_distance))
 
-        step = 5
-        distance = 0
-
-        while distance < max_distance:
-            check_x = start_x + dx * distance
-            check_y = start_y + dy * distance
-
-            for wall in self._walls:
-                if (wall['x'] <= check_x <= wall['x'] + wall['width'] and
-                    wall['y'] <= check_y <= wall['y'] + wall['height']):
-                    return distance
-
-            distance += step
+    def cast_rays(self, start_x, start_y, angles_deg, max_distance=300, step=5):
+        """
+        Cast many rays at once (vectorized).
 
-        return max_distance
+        Rays are sampled every `step` units like cast_ray. Start positions
+        and angles are broadcast together, e.g. x/y of shape (N, 1) and
+        angles of shape (N, R) cast R rays for each of N cars.
 
+        Returns:
+            Array of distances to nearest wall (max_distance if no hit)
+        """
+        start_x, start_y, angles = np.broadcast_arrays(
+            np.asarray(start_x, dtype=np.float64),
+            np.asarray(start_y, dtype=np.float64),
+            np.asarray(angles_deg, dtype=np.float64)
+        )
+        rad = np.radians(angles)[..., np.newaxis]
+        samples = np.arange(0, max_distance, step, dtype=np.float64)
+
+        check_x = start_x[..., np.newaxis] + np.cos(rad) * samples
+        check_y = start_y[..., np.newaxis] + np.sin(rad) * samples
+        hit = self.is_wall(check_x, check_y)
+
+        first_hit = hit.argmax(axis=-1)
+        return np.where(hit.any(axis=-1), samples[first_hit], float(max_distance))
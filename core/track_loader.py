@@ -15,13 +15,25 @@ class TrackLoader:
     - Green (0,255,0): Checkpoint 0 (first)
     - Blue (0,0,255): Checkpoint 1 (second)
     - Red (255,0,0): Checkpoint 2 (third)
+    - Magenta with ID (255,k,255), k = 0..200: Checkpoint k - any number of
+      checkpoints, ordered by k (replaces the colors above when present)
     """
 
-    def __init__(self):
+    MAX_CHECKPOINT_ID = 200  # Higher G would make ID pixels look like road
+    CHECKPOINT_MERGE_DISTANCE = 50  # Same-color pieces closer than this form one line
+
+    def __init__(self, checkpoint_colors=None):
+        """
+        Initialize loader.
+
+        Args:
+            checkpoint_colors: Ordered palette of checkpoint colors (default:
+                green, blue, red)
+        """
         self.wall_color = (0, 0, 0)
         self.road_color = (255, 255, 255)
         # Checkpoint colors in order: Green -> Blue -> Red
-        self.checkpoint_colors = [
+        self.checkpoint_colors = [tuple(color) for color in checkpoint_colors] if checkpoint_colors else [
             (0, 255, 0),    # Green - Checkpoint 0
             (0, 0, 255),    # Blue - Checkpoint 1
             (255, 0, 0),    # Red - Checkpoint 2
@@ -33,55 +45,94 @@ class TrackLoader:
         Load track from PNG. First checks if cached JSON exists.
         If not, processes PNG and creates cache.
         """
-        cache_file = filepath.replace('.png', '_cache.json')
+        return self.build_cache(filepath)
 
-        # Try to load from cache first
-        if os.path.exists(cache_file):
-            png_time = os.path.getmtime(filepath)
-            cache_time = os.path.getmtime(cache_file)
+    def build_cache(self, filepath, force=False):
+        """
+        Load track data, processing the PNG and writing its cache when the
+        cache is missing or outdated.
+
+        Args:
+            filepath: Track PNG
+            force: Process the PNG and rewrite the cache even if it is up to date
 
-            # Use cache if it's newer than PNG
-            if cache_time >= png_time:
-                with open(cache_file, 'r') as f:
-                    return json.load(f)
+        Returns:
+            Track data dict
+        """
+        cache_file = self.cache_path(filepath)
+
+        # Try to load from cache first
+        if not force and self.is_cached(filepath):
+            with open(cache_file, 'r') as f:
+                return json.load(f)
 
         # No cache or outdated - process PNG
         print(f"Processing {filepath}...")
         track_data = self._process_png(filepath)
 
         # Save to cache
-        with open(cache_file, 'w') as f:
-            json.dump(track_data, f)
+        self._write_cache(cache_file, track_data)
         print(f"Cached to {cache_file}")
 
         return track_data
 
+    @staticmethod
+    def cache_path(filepath):
+        return filepath.replace('.png', '_cache.json')
+
+    def is_cached(self, filepath):
+        """Check if cache exists and is newer than PNG."""
+        cache_file = self.cache_path(filepath)
+        if not os.path.exists(cache_file):
+            return False
+        return os.path.getmtime(cache_file) >= os.path.getmtime(filepath)
+
+    @staticmethod
+    def _write_cache(cache_file, track_data):
+        """
+        Write cache atomically - other processes see either no cache or the
+        complete file, never a partially written one.
+        """
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(track_data, f)
+            os.replace(tmp_file, cache_file)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    @staticmethod
+    def validate(track_data):
+        """
+        Check that track is raceable.
+
+        Returns:
+            List of problems (empty if track is valid)
+        """
+        problems = []
+        if not track_data.get('start_finish_line'):
+            problems.append("no start/finish line (yellow)")
+        if not track_data.get('checkpoints'):
+            problems.append("no checkpoints")
+        if not track_data.get('walls'):
+            problems.append("no walls")
+        return problems
+
     def _process_png(self, filepath):
         """Process PNG file completely - all pixels."""
         img = Image.open(filepath).convert('RGB')
         width, height = img.size
-        pixels = np.array(img)
+        pixels = np.array(img, dtype=np.int16)  # Signed - color math on uint8 would wrap around
 
         walls = []
         checkpoints = []
         start_position = (100, height // 2)
-        start_finish_line = None
 
         # Find yellow start/finish line
-        yellow_pixels = []
-        for y in range(height):
-            for x in range(width):
-                r, g, b = pixels[y, x]
-                if abs(r - 255) < 30 and abs(g - 255) < 30 and b < 50:
-                    yellow_pixels.append((x, y))
-
-        if yellow_pixels:
-            avg_x = sum(p[0] for p in yellow_pixels) // len(yellow_pixels)
-            avg_y = sum(p[1] for p in yellow_pixels) // len(yellow_pixels)
-            start_position = (avg_x, avg_y)
-            x1, y1 = yellow_pixels[0]
-            x2, y2 = yellow_pixels[-1]
-            start_finish_line = {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2}
+        start_finish_line, yellow_center = self._find_start_finish_line(pixels)
+        if yellow_center is not None:
+            start_position = yellow_center
 
         # Extract walls - group adjacent black pixels
         visited = np.zeros((height, width), dtype=bool)
@@ -99,8 +150,8 @@ class TrackLoader:
                     if wall_rect:
                         walls.append(wall_rect)
 
-        # Extract checkpoints from green pixels
-        checkpoints = self._extract_checkpoints(pixels, width, height, start_position)
+        # Extract checkpoints (ID-encoded or palette colors)
+        checkpoints = self._extract_checkpoints(pixels, width)
 
         return {
             'walls': walls,
@@ -111,6 +162,49 @@ class TrackLoader:
             'height': height
         }
 
+    @staticmethod
+    def _find_start_finish_line(pixels):
+        """
+        Find yellow start/finish line.
+
+        Returns:
+            Tuple (line dict, center (x, y)) - both None if there is no line
+        """
+        return TrackLoader.start_finish_line(*TrackLoader.start_line_pixels(pixels))
+
+    @staticmethod
+    def start_line_pixels(pixels, row_offset=0):
+        """
+        Coordinates of yellow start/finish line pixels.
+
+        Args:
+            pixels: Int16 RGB array - the whole image or a band of its rows
+            row_offset: Image row of the first pixel row
+
+        Returns:
+            Arrays (xs, ys) in row-major order
+        """
+        r, g, b = pixels[..., 0], pixels[..., 1], pixels[..., 2]
+        ys, xs = np.nonzero((np.abs(r - 255) < 30) & (np.abs(g - 255) < 30) & (b < 50))
+        return xs, ys + row_offset
+
+    @staticmethod
+    def start_finish_line(xs, ys):
+        """
+        Start/finish line from start_line_pixels() coordinates (of one image
+        or of its row bands concatenated in order).
+
+        Returns:
+            Tuple (line dict, center (x, y)) - both None if there is no line
+        """
+        if len(xs) == 0:
+            return None, None
+
+        # First/last pixel in row-major order are the line ends
+        center = (int(xs.sum()) // len(xs), int(ys.sum()) // len(ys))
+        line = {'x1': int(xs[0]), 'y1': int(ys[0]), 'x2': int(xs[-1]), 'y2': int(ys[-1])}
+        return line, center
+
     def _extract_wall_rect(self, pixels, visited, start_x, start_y, width, height):
         """Extract rectangular wall from starting position."""
         # Find max width
@@ -159,217 +253,237 @@ class TrackLoader:
             'height': rect_height
         }
 
-    def _extract_checkpoints(self, pixels, width, height, start_position):
-        """Extract checkpoint lines from colored pixels (green, blue, red)."""
-        # Dictionary to store checkpoints by color
-        checkpoints_by_color = {}
-
-        # Detect checkpoints for each color
-        for checkpoint_id, color in enumerate(self.checkpoint_colors):
-            visited = np.zeros((height, width), dtype=bool)
-            checkpoint_lines = []
-
-            target_r, target_g, target_b = color
-
-            for y in range(height):
-                for x in range(width):
-                    if visited[y, x]:
-                        continue
-
-                    r, g, b = pixels[y, x]
-
-                    # Check if pixel matches checkpoint color with specific logic for each color
-                    is_match = self._is_color_match(r, g, b, target_r, target_g, target_b)
-
-                    if is_match:
-                        line = self._trace_checkpoint_line(pixels, visited, x, y, width, height, color)
-                        if line and len(line) > 3:
-                            # Find extreme points of the line
-                            all_x = [p[0] for p in line]
-                            all_y = [p[1] for p in line]
-                            min_x, max_x = min(all_x), max(all_x)
-                            min_y, max_y = min(all_y), max(all_y)
-
-                            # Determine if line is more horizontal or vertical
-                            if max_y - min_y > max_x - min_x:
-                                # Vertical line
-                                avg_x = sum(all_x) // len(all_x)
-                                x1, y1 = avg_x, min_y
-                                x2, y2 = avg_x, max_y
-                            else:
-                                # Horizontal line
-                                avg_y = sum(all_y) // len(all_y)
-                                x1, y1 = min_x, avg_y
-                                x2, y2 = max_x, avg_y
-
-                            checkpoint_lines.append({
-                                'x1': x1, 'y1': y1,
-                                'x2': x2, 'y2': y2,
-                                'id': checkpoint_id,
-                                'color': color,
-                                'passed': False
-                            })
-
-            # Group nearby checkpoints for this color
-            if checkpoint_lines:
-                grouped = self._group_checkpoints(checkpoint_lines)
-                if grouped:
-                    # Take the first grouped checkpoint for this color
-                    checkpoints_by_color[checkpoint_id] = grouped[0]
-                    checkpoints_by_color[checkpoint_id]['id'] = checkpoint_id
-
-        # Convert to sorted list by ID
-        checkpoints = []
-        for i in range(len(self.checkpoint_colors)):
-            if i in checkpoints_by_color:
-                checkpoints.append(checkpoints_by_color[i])
+    def _extract_checkpoints(self, pixels, width):
+        """
+        Extract ordered checkpoint lines.
 
-        return checkpoints
+        ID-encoded pixels (255, k, 255) define checkpoint k - any number of
+        them, ordered by k (gaps allowed). Without them, checkpoints come from
+        checkpoint_colors in palette order.
 
-    def _group_checkpoints(self, checkpoints):
-        """Group nearby checkpoints that are part of the same line."""
-        if not checkpoints:
-            return []
+        Each checkpoint is the largest group of nearby connected components
+        of its color, fitted with a line along its principal axis.
+        """
+        return self.fit_checkpoints(self.checkpoint_pixels(pixels), width)
 
-        # Distance threshold for grouping (pixels)
-        distance_threshold = 50
+    def checkpoint_pixels(self, pixels, row_offset=0):
+        """
+        Coordinates of checkpoint pixels, grouped by checkpoint.
 
-        grouped = []
-        used = [False] * len(checkpoints)
+        Args:
+            pixels: Int16 RGB array - the whole image or a band of its rows
+            row_offset: Image row of the first pixel row
 
-        for i, cp1 in enumerate(checkpoints):
-            if used[i]:
-                continue
+        Returns:
+            Dict ('id', k) or ('color', palette index) -> (ys, xs) in
+            row-major order. Palette colors are skipped when ID-encoded
+            pixels are present.
+        """
+        r, g, b = pixels[..., 0], pixels[..., 1], pixels[..., 2]
+        id_mask = (r == 255) & (b == 255) & (g <= self.MAX_CHECKPOINT_ID)
+
+        groups = {}
+        if id_mask.any():
+            ys, xs = np.nonzero(id_mask)
+            ids = g[ys, xs]
+            for checkpoint_id in np.unique(ids):
+                selected = ids == checkpoint_id
+                groups[('id', int(checkpoint_id))] = (ys[selected] + row_offset, xs[selected])
+        else:
+            for index, color in enumerate(self.checkpoint_colors):
+                ys, xs = np.nonzero(self._color_mask(pixels, color))
+                if len(xs):
+                    groups[('color', index)] = (ys + row_offset, xs)
+        return groups
+
+    def fit_checkpoints(self, groups, width):
+        """
+        Ordered checkpoint lines from checkpoint_pixels() groups.
 
-            # Start a new group
-            group = [cp1]
-            used[i] = True
+        Groups of row bands can be merged (coordinates concatenated in band
+        order) first - ID-encoded checkpoints then win over palette colors
+        of bands without IDs, like on the whole image.
+        """
+        keys = sorted(key for key in groups if key[0] == 'id') or sorted(groups)
 
-            # Find all nearby checkpoints
-            for j, cp2 in enumerate(checkpoints):
-                if used[j]:
-                    continue
+        checkpoints = []
+        for key in keys:
+            ys, xs = groups[key]
+            line = self._fit_checkpoint(ys, xs, width)
+            if line is not None:
+                line['id'] = len(checkpoints)
+                checkpoints.append(line)
 
-                # Check if cp2 is close to any checkpoint in current group
-                for cp in group:
-                    # Calculate average distance between endpoints
-                    dist1 = ((cp['x1'] - cp2['x1'])**2 + (cp['y1'] - cp2['y1'])**2)**0.5
-                    dist2 = ((cp['x2'] - cp2['x2'])**2 + (cp['y2'] - cp2['y2'])**2)**0.5
-                    avg_dist = (dist1 + dist2) / 2
-
-                    if avg_dist < distance_threshold:
-                        group.append(cp2)
-                        used[j] = True
-                        break
-
-            # Merge group into single checkpoint
-            if group:
-                # Find extreme points
-                all_x = [cp['x1'] for cp in group] + [cp['x2'] for cp in group]
-                all_y = [cp['y1'] for cp in group] + [cp['y2'] for cp in group]
-
-                # Calculate center line
-                min_x, max_x = min(all_x), max(all_x)
-                min_y, max_y = min(all_y), max(all_y)
-
-                # Determine if line is more horizontal or vertical
-                width_span = max_x - min_x
-                height_span = max_y - min_y
-
-                if height_span > width_span:
-                    # Vertical line - use average x
-                    avg_x = sum(all_x) / len(all_x)
-                    merged = {
-                        'x1': int(avg_x), 'y1': min_y,
-                        'x2': int(avg_x), 'y2': max_y,
-                        'id': 0,
-                        'passed': False
-                    }
-                else:
-                    # Horizontal line - use average y
-                    avg_y = sum(all_y) / len(all_y)
-                    merged = {
-                        'x1': min_x, 'y1': int(avg_y),
-                        'x2': max_x, 'y2': int(avg_y),
-                        'id': 0,
-                        'passed': False
-                    }
-
-                grouped.append(merged)
-
-        return grouped
-
-    def _trace_checkpoint_line(self, pixels, visited, start_x, start_y, width, height, target_color):
-        """Trace a line of colored pixels in both directions from start point."""
-        target_r, target_g, target_b = target_color
-
-        # Collect all connected pixels of the same color
-        to_visit = [(start_x, start_y)]
-        line = []
-        local_visited = set()
-
-        # Use flood fill to find all connected pixels
-        while to_visit:
-            x, y = to_visit.pop()
-
-            if (x, y) in local_visited:
-                continue
-            if x < 0 or x >= width or y < 0 or y >= height:
-                continue
-            if visited[y, x]:
-                continue
-
-            r, g, b = pixels[y, x]
-            # Use the same color matching logic
-            if not self._is_color_match(r, g, b, target_r, target_g, target_b):
-                continue
-
-            local_visited.add((x, y))
-            visited[y, x] = True
-            line.append((x, y))
-
-            # Add neighbors (prioritize straight directions)
-            for dx, dy in [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (-1, -1), (1, -1), (-1, 1)]:
-                to_visit.append((x + dx, y + dy))
-
-        return line
-
-    def _is_color_match(self, r, g, b, target_r, target_g, target_b):
-        """
-        Check if pixel color matches target color.
-        Uses specific logic for each checkpoint color to avoid conflicts.
-        """
-        tolerance = 60
+        return checkpoints
 
-        # Skip black pixels (walls)
-        if r < 50 and g < 50 and b < 50:
-            return False
+    def _fit_checkpoint(self, ys, xs, width):
+        """Fit one checkpoint line to the largest group of components of the pixels."""
+        if len(xs) == 0:
+            return None
 
-        # Skip white pixels (road)
-        if r > 200 and g > 200 and b > 200:
-            return False
+        labels = label_components(ys, xs, width)
+        x1, y1, x2, y2, counts = fit_lines(xs, ys, labels)
 
-        # Skip yellow pixels (finish line)
-        if r > 200 and g > 200 and b < 80:
-            return False
+        # Merge components whose lines are close (e.g. a line broken by
+        # antialiasing or drawn in several strokes)
+        groups = _group_segments(x1, y1, x2, y2, self.CHECKPOINT_MERGE_DISTANCE)
+        group_sizes = np.bincount(groups, weights=counts)
+        group_sizes[group_sizes <= 3] = 0  # Stray pixels are not checkpoints
+        if not group_sizes.any():
+            return None
 
-        # Green checkpoint (0, 255, 0): G dominates, high G, low R and B
-        if target_r == 0 and target_g == 255 and target_b == 0:
-            return g > 150 and g > r + 50 and g > b + 50
+        best = np.argmax(group_sizes)
+        in_group = groups[labels] == best
+        x1, y1, x2, y2, _ = fit_lines(xs[in_group], ys[in_group],
+                                      np.zeros(in_group.sum(), dtype=np.intp))
+        start = (int(round(x1[0])), int(round(y1[0])))
+        end = (int(round(x2[0])), int(round(y2[0])))
+        start, end = min(start, end), max(start, end)  # Stable endpoint order
+        return {
+            'x1': start[0], 'y1': start[1],
+            'x2': end[0], 'y2': end[1],
+            'id': 0,
+            'passed': False
+        }
 
-        # Blue checkpoint (0, 0, 255): B dominates, high B, low R and G
-        if target_r == 0 and target_g == 0 and target_b == 255:
-            return b > 150 and b > r + 50 and b > g + 50
+    @staticmethod
+    def _color_mask(pixels, color):
+        """
+        Pixels matching a checkpoint color (vectorized).
+        Uses specific logic for the default colors to avoid conflicts.
+        """
+        r, g, b = pixels[..., 0], pixels[..., 1], pixels[..., 2]
+        target_r, target_g, target_b = color
+        tolerance = 60
+
+        # Skip walls (black), road (white) and finish line (yellow)
+        excluded = ((r < 50) & (g < 50) & (b < 50)) | \
+                   ((r > 200) & (g > 200) & (b > 200)) | \
+                   ((r > 200) & (g > 200) & (b < 80))
+
+        if color == (0, 255, 0):
+            # Green: G dominates, high G, low R and B
+            match = (g > 150) & (g > r + 50) & (g > b + 50)
+        elif color == (0, 0, 255):
+            # Blue: B dominates, high B, low R and G
+            match = (b > 150) & (b > r + 50) & (b > g + 50)
+        elif color == (255, 0, 0):
+            # Red: R dominates, high R, low G and B
+            match = (r > 150) & (r > g + 50) & (r > b + 50)
+        else:
+            # Other palette colors: general tolerance matching
+            match = ((np.abs(r - target_r) < tolerance) &
+                     (np.abs(g - target_g) < tolerance) &
+                     (np.abs(b - target_b) < tolerance))
+
+        return match & ~excluded
+
+
+def label_components(ys, xs, width):
+    """
+    Label 8-connected components of pixels (vectorized union-find).
+
+    Args:
+        ys, xs: Pixel coordinates in row-major order (as from np.nonzero)
+        width: Image width
 
-        # Red checkpoint (255, 0, 0): R dominates, high R, low G and B
-        if target_r == 255 and target_g == 0 and target_b == 0:
-            return r > 150 and r > g + 50 and r > b + 50
+    Returns:
+        Array of component labels 0..n_components-1, one per pixel
+    """
+    n = len(xs)
+    linear = ys.astype(np.int64) * width + xs
+    parent = np.arange(n)
+
+    # Edges to right, down-left, down and down-right neighbors
+    edges_a, edges_b = [], []
+    for dy, dx in ((0, 1), (1, -1), (1, 0), (1, 1)):
+        neighbor_x = xs + dx
+        neighbor = linear + dy * width + dx
+        position = np.minimum(np.searchsorted(linear, neighbor), n - 1)
+        found = (linear[position] == neighbor) & (neighbor_x >= 0) & (neighbor_x < width)
+        edges_a.append(np.flatnonzero(found))
+        edges_b.append(position[found])
+    edges_a = np.concatenate(edges_a)
+    edges_b = np.concatenate(edges_b)
+
+    # Hook larger roots under smaller ones, then compress paths, until every
+    # edge connects pixels with the same root
+    while True:
+        root_a, root_b = parent[edges_a], parent[edges_b]
+        differ = root_a != root_b
+        if not differ.any():
+            break
+        low = np.minimum(root_a[differ], root_b[differ])
+        high = np.maximum(root_a[differ], root_b[differ])
+        np.minimum.at(parent, high, low)
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
 
-        # Fallback: general tolerance matching
-        return (abs(r - target_r) < tolerance and
-                abs(g - target_g) < tolerance and
-                abs(b - target_b) < tolerance)
+    return np.unique(parent, return_inverse=True)[1].reshape(-1)
 
 
+def fit_lines(xs, ys, labels):
+    """
+    Fit a line segment to the pixels of every label (vectorized PCA).
 
+    The line runs along the principal axis through the pixels' mean; its
+    ends are the extreme projections of the pixels onto that axis.
 
+    Returns:
+        Arrays x1, y1, x2, y2 and pixel counts, indexed by label
+    """
+    xs = xs.astype(np.float64)
+    ys = ys.astype(np.float64)
+    counts = np.bincount(labels)
+    n_labels = len(counts)
+
+    mean_x = np.bincount(labels, xs, n_labels) / counts
+    mean_y = np.bincount(labels, ys, n_labels) / counts
+    dx = xs - mean_x[labels]
+    dy = ys - mean_y[labels]
+    cov_xx = np.bincount(labels, dx * dx, n_labels)
+    cov_yy = np.bincount(labels, dy * dy, n_labels)
+    cov_xy = np.bincount(labels, dx * dy, n_labels)
+
+    angle = 0.5 * np.arctan2(2 * cov_xy, cov_xx - cov_yy)
+    cos, sin = np.cos(angle), np.sin(angle)
+    t = dx * cos[labels] + dy * sin[labels]
+
+    t_min = np.full(n_labels, np.inf)
+    t_max = np.full(n_labels, -np.inf)
+    np.minimum.at(t_min, labels, t)
+    np.maximum.at(t_max, labels, t)
+
+    return (mean_x + t_min * cos, mean_y + t_min * sin,
+            mean_x + t_max * cos, mean_y + t_max * sin, counts)
+
+
+def _group_segments(x1, y1, x2, y2, max_distance):
+    """Group segments whose endpoints come within max_distance of each other segment."""
+    n = len(x1)
+    if n == 1:
+        return np.zeros(1, dtype=np.intp)
+
+    def point_segment_distance(px, py):
+        # Distance of every point (rows) to every segment (columns)
+        sx, sy = (x2 - x1)[np.newaxis], (y2 - y1)[np.newaxis]
+        length2 = np.maximum(sx * sx + sy * sy, 1e-12)
+        t = np.clip(((px[:, None] - x1) * sx + (py[:, None] - y1) * sy) / length2, 0.0, 1.0)
+        return np.hypot(px[:, None] - (x1 + t * sx), py[:, None] - (y1 + t * sy))
+
+    distance = np.minimum(point_segment_distance(x1, y1), point_segment_distance(x2, y2))
+    distance = np.minimum(distance, distance.T)
+    close = distance < max_distance
+
+    # Components of the (small) closeness graph
+    groups = np.arange(n)
+    while True:
+        merged = np.where(close, groups[np.newaxis, :], n).min(axis=1)
+        merged = np.minimum(merged, groups)
+        merged = merged[merged]
+        if np.array_equal(merged, groups):
+            return np.unique(groups, return_inverse=True)[1].reshape(-1)
+        groups = merged
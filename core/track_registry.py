@@ -0,0 +1,112 @@
+import glob
+import os
+from collections import OrderedDict
+
+from core.track import Track
+from core.track_loader import TrackLoader
+from core.tiled_track import TiledTrack, is_tiled_track
+from core.progress_field import load_progress_field
+
+
+class TrackRegistry:
+    """
+    Shared store of loaded tracks with a memory budget.
+
+    Tracks are loaded on first request (or up front with preload()) and
+    kept in least-recently-used order. When the estimated size of loaded
+    tracks goes over the budget, the least recently used ones are dropped
+    and loaded again if requested later.
+
+    Collision lookups are prepared when a track is loaded, so switching to a
+    cached track costs nothing during the first steps on it. PNG tracks also
+    get their progress field (memory-mapped sidecar, built if missing).
+    """
+
+    def __init__(self, track_files=None, memory_budget_mb=256, max_tiles=64):
+        """
+        Initialize registry.
+
+        Args:
+            track_files: Known track PNG paths or tile directories (more can
+                be requested later)
+            memory_budget_mb: Upper bound for loaded tracks (estimated)
+            max_tiles: Tiles kept in memory per tiled track
+        """
+        self._track_files = list(track_files or [])
+        self._memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self._loader = TrackLoader()
+        self._max_tiles = max_tiles
+        self._tracks = OrderedDict()
+        self._loads = 0
+
+    @classmethod
+    def from_directory(cls, directory="tracks", memory_budget_mb=256):
+        """Create registry with all PNG tracks (and tiled tracks) in a directory."""
+        track_files = sorted(glob.glob(os.path.join(directory, "*.png")))
+        track_files += sorted(path for path in glob.glob(os.path.join(directory, "*_tiles"))
+                              if is_tiled_track(path))
+        return cls(track_files, memory_budget_mb)
+
+    def get(self, track_file):
+        """Return loaded track, loading it (and evicting others) if needed."""
+        track = self._tracks.get(track_file)
+        if track is not None:
+            self._tracks.move_to_end(track_file)
+            return track
+
+        if is_tiled_track(track_file):
+            track = TiledTrack(track_file, max_tiles=self._max_tiles)
+        else:
+            track = Track(track_data=self._loader.load_from_png(track_file))
+            track.set_progress_field(load_progress_field(track_file, track))
+        track.prepare()  # Build collision grid (or load start tiles) now, not on first step
+        self._loads += 1
+
+        if track_file not in self._track_files:
+            self._track_files.append(track_file)
+        self._tracks[track_file] = track
+        self._evict(keep=track_file)
+        return track
+
+    def preload(self, track_files=None):
+        """Load tracks up front (as many as fit in the memory budget)."""
+        for track_file in track_files or self._track_files:
+            self.get(track_file)
+            if self.memory_used >= self._memory_budget:
+                break
+
+    def _evict(self, keep):
+        """Drop least recently used tracks until loaded tracks fit the budget."""
+        while self.memory_used > self._memory_budget and len(self._tracks) > 1:
+            oldest = next(iter(self._tracks))
+            if oldest == keep:
+                break
+            del self._tracks[oldest]
+
+    @property
+    def track_files(self):
+        return list(self._track_files)
+
+    @property
+    def loaded_tracks(self):
+        """Paths of tracks in memory, least recently used first."""
+        return list(self._tracks.keys())
+
+    @property
+    def memory_used(self):
+        return sum(track.memory_size for track in self._tracks.values())
+
+    @property
+    def memory_budget(self):
+        return self._memory_budget
+
+    @property
+    def load_count(self):
+        """Number of track loads so far (repeated loads mean the budget is too small)."""
+        return self._loads
+
+    def __contains__(self, track_file):
+        return track_file in self._tracks
+
+    def __len__(self):
+        return len(self._tracks)
@@ -1,3 +1,4 @@
+import numpy as np
 from entities.vehicle import Vehicle
 
 
@@ -22,6 +23,10 @@ class AICar(Vehicle):
         """
         self._current_action = int(action)
 
+    @property
+    def action(self):
+        return self._current_action
+
     def handle_input(self):
         """Execute action set by AI."""
         action = self._current_action
@@ -38,3 +43,100 @@ class AICar(Vehicle):
                 self.rotate(self.ROTATION_SPEED)
         elif action == 4:  # Reverse
             self.accelerate(-self.ACCELERATION)
+
+    def get_observation(self, track, next_checkpoint, max_raycast_distance=500, ray_table=None):
+        """
+        Return observation for the RL model (9 values).
+
+        Args:
+            track: Track to observe
+            next_checkpoint: Index of the checkpoint this car drives to
+            max_raycast_distance: Raycast range used for normalization
+            ray_table: Optional RayTable of the track - raycasts are looked
+                up (interpolated where that is reliable) instead of cast
+
+        Returns:
+            Array: 7 raycasts (0-1), speed (-1 to 1), distance to next checkpoint (0-1)
+        """
+        return AICar.get_observations([self], track, [next_checkpoint], max_raycast_distance, ray_table)[0]
+
+    @staticmethod
+    def get_observations(cars, track, next_checkpoints, max_raycast_distance=500, ray_table=None):
+        """
+        Compute observations of many cars at once (vectorized).
+
+        Args:
+            cars: List of N vehicles
+            track: Track to observe
+            next_checkpoints: Next checkpoint index of each car
+            max_raycast_distance: Raycast range used for normalization
+            ray_table: Optional RayTable of the track (must be built for
+                max_raycast_distance) - raycasts are looked up instead of cast
+
+        Returns:
+            Array (N, 9) - same values as get_observation() for each car
+        """
+        n = len(cars)
+        obs = np.zeros((n, 9), dtype=np.float64)
+        if n == 0:
+            return obs
+
+        xs = np.array([car.x for car in cars])
+        ys = np.array([car.y for car in cars])
+        angles = np.array([car.angle for car in cars])
+
+        # Raycasts (7 values, normalized 0-1) - all cars in one cast / lookup
+        ray_angles = angles[:, np.newaxis] + np.array(cars[0].get_raycast_angles())
+        if ray_table is not None:
+            if not ray_table.matches(max_raycast_distance):
+                raise ValueError(f"Ray table was built for max_distance {ray_table.max_distance}, "
+                                 f"observations use {max_raycast_distance}")
+            distances = ray_table.lookup(xs[:, np.newaxis], ys[:, np.newaxis], ray_angles, track)
+        else:
+            distances = track.cast_rays(xs[:, np.newaxis], ys[:, np.newaxis],
+                                        ray_angles, max_raycast_distance)
+        obs[:, :7] = distances / max_raycast_distance
+
+        # Speed and distance to next checkpoint
+        obs[:, 7:] = AICar.get_state_features(cars, track, next_checkpoints, xs, ys)
+        return obs
+
+    @staticmethod
+    def get_state_features(cars, track, next_checkpoints, xs=None, ys=None):
+        """
+        Non-raycast part of the observation (last 2 of get_observations()).
+
+        Args:
+            cars: List of N vehicles
+            track: Track the cars drive on
+            next_checkpoints: Next checkpoint index of each car
+            xs, ys: Car positions if already gathered
+
+        Returns:
+            Array (N, 2): speed (-1 to 1), distance to next checkpoint (0-1,
+            0 when no checkpoint left)
+        """
+        features = np.zeros((len(cars), 2), dtype=np.float64)
+        if not cars:
+            return features
+        if xs is None:
+            xs = np.array([car.x for car in cars])
+            ys = np.array([car.y for car in cars])
+
+        # Speed (normalized -1 to 1)
+        features[:, 0] = np.array([car.speed for car in cars]) / cars[0].MAX_SPEED
+
+        # Distance to next checkpoint (0 when no checkpoint left)
+        checkpoints = track.checkpoints
+        next_checkpoints = np.asarray(next_checkpoints)
+        has_checkpoint = next_checkpoints < len(checkpoints)
+        if has_checkpoint.any():
+            centers = np.array([((cp['x1'] + cp['x2']) / 2, (cp['y1'] + cp['y2']) / 2)
+                                for cp in checkpoints])
+            target = centers[next_checkpoints[has_checkpoint]]
+            dist = np.sqrt((xs[has_checkpoint] - target[:, 0])**2 +
+                           (ys[has_checkpoint] - target[:, 1])**2)
+            max_dist = np.sqrt(track.width**2 + track.height**2)
+            features[has_checkpoint, 1] = np.minimum(dist / max_dist, 1.0)
+
+        return features
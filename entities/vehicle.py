@@ -54,6 +54,10 @@ class Vehicle(ABC):
     def set_angle(self, angle):
         self.__angle = float(angle)
 
+    def set_speed(self, speed):
+        """Set speed directly (e.g. restoring a saved state), no limits applied."""
+        self.__speed = float(speed)
+
     def accelerate(self, amount):
         self.__speed += amount
         if self.__speed > self.MAX_SPEED:
@@ -70,14 +74,19 @@ class Vehicle(ABC):
             self.__speed = 0.0
     
     def update_position(self, dt):
+        """Move by one physics tick (speed is in pixels per tick, dt unused)."""
         if abs(self.__speed) > 0.01:
             rad = math.radians(self.__angle)
             self.__x += math.cos(rad) * self.__speed
             self.__y += math.sin(rad) * self.__speed
     
     def get_corners(self):
+        return self.get_corners_at(self.__x, self.__y, self.__angle)
+
+    def get_corners_at(self, x, y, angle):
+        """Return corners of this vehicle's rectangle placed at given pose."""
         # Standard rectangle shape
-        rad = math.radians(self.__angle)
+        rad = math.radians(angle)
         cos_a = math.cos(rad)
         sin_a = math.sin(rad)
         
@@ -93,7 +102,7 @@ class Vehicle(ABC):
         for cx, cy in corners:
             rx = cx * cos_a - cy * sin_a
             ry = cx * sin_a + cy * cos_a
-            rotated.append((self.__x + rx, self.__y + ry))
+            rotated.append((x + rx, y + ry))
         
         return rotated
 
@@ -107,14 +116,12 @@ class Vehicle(ABC):
         Also returns endpoints for visualization.
         """
         ray_angles = self.get_raycast_angles()
-        distances = []
-        endpoints = []
-
-        for relative_angle in ray_angles:
-            absolute_angle = self.__angle + relative_angle
-            distance = track.cast_ray(self.__x, self.__y, absolute_angle, max_distance)
-            distances.append(distance)
+        absolute_angles = [self.__angle + relative_angle for relative_angle in ray_angles]
+        distances = [float(d) for d in
+                     track.cast_rays(self.__x, self.__y, absolute_angles, max_distance)]
 
+        endpoints = []
+        for absolute_angle, distance in zip(absolute_angles, distances):
             rad = math.radians(absolute_angle)
             end_x = self.__x + math.cos(rad) * distance
             end_y = self.__y + math.sin(rad) * distance
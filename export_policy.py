@@ -0,0 +1,49 @@
+"""
+Export trained PPO models to compact .npz files for torch-free inference.
+Usage: Run in PyCharm or: python export_policy.py
+"""
+
+from stable_baselines3 import PPO
+from ai.numpy_policy import NumpyPolicy, export_policy
+import glob
+import os
+import numpy as np
+
+
+# === SETTINGS ===
+MODEL_DIR = "models/v4"
+N_CHECK_SAMPLES = 10000  # Random observations used to verify exported actions
+
+
+def verify_export(model_path, npz_path, n_samples=N_CHECK_SAMPLES):
+    """Compare deterministic actions of PPO and NumpyPolicy on random observations."""
+    model = PPO.load(model_path, device="cpu")
+    numpy_policy = NumpyPolicy.load(npz_path)
+
+    rng = np.random.default_rng(0)
+    obs = rng.uniform(-1.0, 1.0, (n_samples, numpy_policy.observation_size)).astype(np.float32)
+
+    expected, _ = model.predict(obs, deterministic=True)
+    actual, _ = numpy_policy.predict(obs, deterministic=True)
+    return np.mean(expected == actual)
+
+
+def main():
+    models = sorted(glob.glob(os.path.join(MODEL_DIR, "racing_ppo_*.zip")))
+
+    if not models:
+        print(f"No models in {MODEL_DIR}")
+        return
+
+    print(f"Exporting {len(models)} models from {MODEL_DIR}\n")
+
+    for model_path in models:
+        npz_path = export_policy(model_path)
+        match = verify_export(model_path, npz_path)
+        size_kb = os.path.getsize(npz_path) / 1024
+        print(f"  {os.path.basename(npz_path):<32} {size_kb:6.1f} KB   "
+              f"action match: {match * 100:.2f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,28 @@ Usage: python main.py
 from core.game_engine import GameEngine
 
 
+# === SETTINGS ===
+TRACK_FILE = "tracks/test.png"
+AI_MODELS = ["models/v3/racing_ppo_final.zip"]  # .zip or exported .npz
+N_OPPONENTS = 0  # Race against N AI cars (0 = drive alone)
+AI_DETERMINISTIC = False  # Sampled actions - opponents with same model drive differently
+GHOST = True  # Show best lap as a ghost car (saved as tracks/<name>_ghost.npz)
+COLLISION = "corners"  # "corners" = 4 car corners hit walls (AI_MODELS were trained with it),
+                       # "footprint" = whole car
+REPLAY_FILE = None  # e.g. "replays/race.replay" - record race for watch_replay.py
+
+
 def main():
-    track_file = "tracks/test.png"
-    game = GameEngine(track_file=track_file)
+    game = GameEngine(
+        track_file=TRACK_FILE,
+        dirty_rects=True,
+        ai_models=AI_MODELS,
+        n_opponents=N_OPPONENTS,
+        ai_deterministic=AI_DETERMINISTIC,
+        replay_file=REPLAY_FILE,
+        ghost=GHOST,
+        collision=COLLISION
+    )
     game.run()
 
 
@@ -0,0 +1,164 @@
+"""
+Preprocess track PNGs into JSON caches in parallel and validate them.
+Usage: Run in PyCharm or: python preprocess_tracks.py [paths ...] [--force] [--workers N] [--tiled] [--ray-table]
+
+Paths can be PNG files or directories (all PNGs inside). Caches (and the
+progress field sidecars, <track>_progress.npy) are written atomically, so
+training envs never read a half-written cache. With --tiled
+tracks are converted to the tiled format (<track>_tiles/) for large maps instead.
+With --ray-table raycast lookup tables (<track>_rays.npy, used by
+RacingEnv(ray_table=True)) are built too.
+"""
+
+from core.track_loader import TrackLoader
+from core.tiled_track import build_tiled_track, tiles_path, is_tiled_track, TILE_META
+from core.track import Track
+from core.progress_field import load_progress_field, validate_progress_field
+from core.ray_table import load_ray_table
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+
+# === SETTINGS ===
+TRACK_DIR = "tracks"
+N_WORKERS = os.cpu_count()
+TILE_SIZE = 256
+
+
+def find_tracks(paths):
+    """Expand directories into sorted PNG paths."""
+    track_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            track_files.extend(sorted(glob.glob(os.path.join(path, "*.png"))))
+        else:
+            track_files.append(path)
+    return track_files
+
+
+def preprocess_track(track_file, force=False, tiled=False, tile_size=TILE_SIZE, ray_table=False):
+    """Build (or load) cache of one track and return its stats (process pool worker)."""
+    if tiled:
+        return _preprocess_tiled(track_file, force, tile_size)
+
+    loader = TrackLoader()
+    start = time.perf_counter()
+
+    cached = loader.is_cached(track_file) and not force
+    track_data = loader.build_cache(track_file, force=force)
+
+    problems = loader.validate(track_data)
+    if not problems:
+        # Progress field needs a valid track (start line, checkpoints)
+        track = Track(track_data=track_data)
+        field = load_progress_field(track_file, track, rebuild=force)
+        problems = validate_progress_field(field, track)
+        if ray_table:
+            load_ray_table(track_file, track, rebuild=force)
+
+    return {
+        'track': track_file,
+        'cached': cached,
+        'walls': len(track_data['walls']),
+        'checkpoints': len(track_data['checkpoints']),
+        'size': (track_data['width'], track_data['height']),
+        'seconds': time.perf_counter() - start,
+        'problems': problems,
+    }
+
+
+def _preprocess_tiled(track_file, force, tile_size):
+    start = time.perf_counter()
+    tile_dir = tiles_path(track_file)
+    meta_file = os.path.join(tile_dir, TILE_META)
+
+    cached = (not force and is_tiled_track(tile_dir) and
+              os.path.getmtime(meta_file) >= os.path.getmtime(track_file))
+    if cached:
+        with open(meta_file, 'r') as f:
+            meta = json.load(f)
+        cached = meta['tile_size'] == tile_size
+    if not cached:
+        meta = build_tiled_track(track_file, tile_dir, tile_size)
+
+    return {
+        'track': tile_dir,
+        'cached': cached,
+        'walls': meta['n_walls'],
+        'checkpoints': len(meta['checkpoints']),
+        'size': (meta['width'], meta['height']),
+        'seconds': time.perf_counter() - start,
+        'problems': TrackLoader.validate(dict(meta, walls=meta['n_walls'])),
+    }
+
+
+def preprocess_tracks(track_files, n_workers=N_WORKERS, force=False, tiled=False, tile_size=TILE_SIZE,
+                      ray_table=False):
+    """Preprocess tracks in parallel, return list of stats dicts (input order)."""
+    if not track_files:
+        return []
+
+    n = len(track_files)
+    n_workers = max(1, min(n_workers or 1, n))
+    if n_workers == 1:
+        return [preprocess_track(track_file, force, tiled, tile_size, ray_table) for track_file in track_files]
+
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        return list(pool.map(preprocess_track, track_files, [force] * n, [tiled] * n, [tile_size] * n,
+                             [ray_table] * n))
+
+
+def print_stats(results):
+    print(f"\n{'Track':<32} {'Size':>10} {'Walls':>7} {'CP':>4} {'Time':>8}  Status")
+    print("-" * 80)
+    for r in results:
+        size = f"{r['size'][0]}x{r['size'][1]}"
+        status = "cached" if r['cached'] else "built"
+        if r['problems']:
+            status = "INVALID: " + ", ".join(r['problems'])
+        print(f"{os.path.basename(r['track']):<32} {size:>10} {r['walls']:>7} "
+              f"{r['checkpoints']:>4} {r['seconds']:>7.2f}s  {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preprocess track PNGs into JSON caches.")
+    parser.add_argument("paths", nargs="*", default=[TRACK_DIR],
+                        help=f"Track PNGs or directories (default: {TRACK_DIR})")
+    parser.add_argument("--force", action="store_true",
+                        help="Rebuild caches even if they are up to date")
+    parser.add_argument("--workers", type=int, default=N_WORKERS,
+                        help="Number of worker processes")
+    parser.add_argument("--tiled", action="store_true",
+                        help="Build tiled tracks (<track>_tiles/) for large maps")
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE,
+                        help="Tile edge in pixels (with --tiled)")
+    parser.add_argument("--ray-table", action="store_true",
+                        help="Also build raycast lookup tables (<track>_rays.npy)")
+    args = parser.parse_args()
+
+    track_files = find_tracks(args.paths)
+    if not track_files:
+        print(f"No tracks in {', '.join(args.paths)}")
+        return 1
+
+    print(f"Preprocessing {len(track_files)} tracks with {min(args.workers, len(track_files))} workers")
+    start = time.perf_counter()
+    # Tiled build reuses fresh JSON caches if present, but does not need them
+    # (large maps skip the slow per-pixel wall extraction)
+    results = preprocess_tracks(track_files, args.workers, args.force, args.tiled, args.tile_size,
+                                args.ray_table)
+    print_stats(results)
+
+    invalid = [r for r in results if r['problems']]
+    print(f"\nDone in {time.perf_counter() - start:.2f}s - "
+          f"{len(results) - len(invalid)} valid, {len(invalid)} invalid")
+    return 1 if invalid else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
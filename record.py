@@ -0,0 +1,65 @@
+"""
+Record trained agent to disk without a window (headless servers).
+Usage: Run in PyCharm or: python record.py
+"""
+
+import os
+
+# Offscreen rendering - no display needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from stable_baselines3 import PPO
+from ai.racing_env import RacingEnv
+from ai.video_recorder import FrameRecorder
+
+
+# === SETTINGS ===
+MODEL_PATH = "models/v3/racing_ppo_final.zip"
+TRACK_PATH = "tracks/test.png"
+OUTPUT_DIR = "recordings/v3_final"
+N_EPISODES = 1
+MAX_STEPS = 800
+FRAME_SKIP = 2  # Record every N-th step (60 -> 30 FPS)
+SCALE = 2  # Keep every N-th pixel (1200x800 -> 600x400)
+
+
+def main():
+    print(f"Model: {MODEL_PATH}")
+    print(f"Track: {TRACK_PATH}")
+    print(f"Output: {OUTPUT_DIR}/")
+
+    model = PPO.load(MODEL_PATH)
+    env = RacingEnv(track_file=TRACK_PATH, render_mode="rgb_array", max_steps=MAX_STEPS)
+
+    with FrameRecorder(OUTPUT_DIR, fps=env.metadata["render_fps"],
+                       frame_skip=FRAME_SKIP, scale=SCALE) as recorder:
+        for episode in range(N_EPISODES):
+            obs, info = env.reset()
+
+            total_reward = 0
+            steps = 0
+            done = False
+            while not done:
+                action, _ = model.predict(obs, deterministic=True)
+                obs, reward, terminated, truncated, info = env.step(action)
+                total_reward += reward
+                steps += 1
+                done = terminated or truncated
+
+                # Render only frames that will actually be kept
+                if recorder.wants_frame():
+                    recorder.add_frame(env.render(), step=steps, episode=episode)
+                else:
+                    recorder.skip_frame()
+
+            print(f"  Episode {episode + 1}: reward {total_reward:.1f}, "
+                  f"CP: {info.get('checkpoint', 0)}, laps: {info.get('laps', 0)}, steps: {steps}")
+
+    env.close()
+
+    print(f"\nFrames written: {recorder.frames_written}")
+    print(f"Convert to video:\n  {recorder.ffmpeg_command()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,35 +4,84 @@ Usage: Run in PyCharm or: python train.py
 """
 
 from stable_baselines3 import PPO
-from stable_baselines3.common.callbacks import CheckpointCallback, BaseCallback
+from stable_baselines3.common.callbacks import BaseCallback
 from stable_baselines3.common.vec_env import SubprocVecEnv, VecMonitor
 from stable_baselines3.common.monitor import Monitor
 from ai.racing_env import RacingEnv
+from ai.training_metrics import RingBuffer, MetricsLog, plot_metrics
+from ai.checkpoint_writer import BackgroundCheckpointCallback
+from ai.shared_vec_env import SharedMemoryVecEnv
+from ai.async_ppo import AsyncPPO
+from ai.cpu_budget import (plan_cpu_budget, limit_child_threads, configure_learner,
+                           configure_worker, LearnerThreads, PhaseUtilization)
+from core.track_registry import TrackRegistry
+from preprocess_tracks import preprocess_tracks, print_stats
 import os
-import numpy as np
-import matplotlib.pyplot as plt
 
 
 # === SETTINGS ===
 SAVE_PATH = "models/v4"
-TRACK_FILE = "tracks/test.png"
+TRACK_FILES = ["tracks/test.png", "tracks/test2.png", "tracks/test3.png"]
+TRACK_WEIGHTS = None  # Sampling weight per track (None = uniform)
+TRACK_MEMORY_MB = 256  # Loaded-track budget per env process (LRU eviction above it)
 TOTAL_TIMESTEPS = 100000
 N_ENVS = 8
+SHARED_MEMORY_ENVS = True  # Step data through shared memory (False = SB3 SubprocVecEnv, pipes)
+ASYNC_ROLLOUTS = False  # Infer for one half of envs while the other steps (needs SHARED_MEMORY_ENVS
+                        # and spare cores - compare steps/s in the cpu/ stats)
+CHECKPOINT_FREQ = 10000  # Save model every N steps (all envs together)
+COLLISION = "corners"  # Wall test: "corners" (4 corners, thin walls slip through) or "footprint" (whole car)
+OBSERVATION = "rays"  # "rays", "patch" (Dict, wall map around the car) or "patch_flat" - see RacingEnv
+RAY_TABLE = False  # Look raycasts up in precomputed tables (interpolated, max ~10 px off - see core/ray_table.py)
+
+# CPU budget - env workers get one pinned core and ENV_THREADS threads each,
+# the learner ROLLOUT_THREADS torch threads while they step (None = spare
+# cores, 1-2) and LEARNER_THREADS in the update (None = all cores)
+PIN_ENV_WORKERS = True
+ENV_THREADS = 1
+ROLLOUT_THREADS = None
+LEARNER_THREADS = None
 
 
 class TrainingLogger(BaseCallback):
-    """Logs rewards and checkpoints, saves plots."""
-
-    def __init__(self, log_freq=8192, save_path=SAVE_PATH):
+    """
+    Logs rewards and checkpoints, saves plots.
+
+    Episode stats are kept in fixed-size ring buffers (memory does not grow
+    with training length). Every log_freq steps a row is appended to
+    metrics.csv; the plot is rendered from that file.
+    """
+
+    METRIC_FIELDS = ('timesteps', 'episodes', 'mean_reward', 'max_reward',
+                     'mean_length', 'mean_checkpoints', 'max_checkpoints')
+
+    def __init__(self, log_freq=8192, save_path=SAVE_PATH, window=50):
+        """
+        Initialize logger.
+
+        Args:
+            log_freq: Log every this many steps (all envs together)
+            save_path: Directory for metrics.csv and training_plot.png
+            window: Number of recent episodes the stats are computed over
+        """
         super().__init__(verbose=1)
         self.log_freq = log_freq
         self.save_path = save_path
-        self.episode_rewards = []
-        self.episode_lengths = []
-        self.episode_checkpoints = []
-        self.log_timesteps = []
-        self.log_rewards = []
-        self.log_checkpoints = []
+        self._rewards = RingBuffer(window)
+        self._lengths = RingBuffer(window)
+        self._checkpoints = RingBuffer(window)
+        self._episodes = 0
+        self._next_log = log_freq
+        self._metrics = None
+
+    @property
+    def metrics_path(self):
+        return os.path.join(self.save_path, "metrics.csv")
+
+    def _on_training_start(self):
+        os.makedirs(self.save_path, exist_ok=True)
+        self._metrics = MetricsLog(self.metrics_path, self.METRIC_FIELDS)
+        self._next_log = (self.num_timesteps // self.log_freq + 1) * self.log_freq
 
     def _on_step(self):
         infos = self.locals.get('infos', [])
@@ -41,79 +90,107 @@ class TrainingLogger(BaseCallback):
         for info, done in zip(infos, dones):
             if done:
                 if 'episode' in info:
-                    self.episode_rewards.append(info['episode']['r'])
-                    self.episode_lengths.append(info['episode']['l'])
+                    self._rewards.append(info['episode']['r'])
+                    self._lengths.append(info['episode']['l'])
+                    self._episodes += 1
                 if 'checkpoint' in info:
-                    self.episode_checkpoints.append(info['checkpoint'])
-
-        if self.num_timesteps % self.log_freq == 0 and len(self.episode_rewards) > 0:
-            last_n = 50
-            mean_rew = np.mean(self.episode_rewards[-last_n:])
-            max_rew = np.max(self.episode_rewards[-last_n:])
-            mean_len = np.mean(self.episode_lengths[-last_n:]) if self.episode_lengths else 0
-            mean_cp = np.mean(self.episode_checkpoints[-last_n:]) if self.episode_checkpoints else 0
-            max_cp = np.max(self.episode_checkpoints[-last_n:]) if self.episode_checkpoints else 0
-
-            self.log_timesteps.append(self.num_timesteps)
-            self.log_rewards.append(mean_rew)
-            self.log_checkpoints.append(mean_cp)
+                    self._checkpoints.append(info['checkpoint'])
 
-            print(f"\n=== [{self.num_timesteps}] ===")
-            print(f"  Reward: {mean_rew:.1f} (max: {max_rew:.1f})")
-            print(f"  Checkpoints: {mean_cp:.2f} (max: {max_cp})")
-            print(f"  Episode length: {mean_len:.0f}")
+        # num_timesteps grows by N_ENVS per call - log when a multiple is crossed
+        if self.num_timesteps >= self._next_log:
+            self._next_log = (self.num_timesteps // self.log_freq + 1) * self.log_freq
+            if len(self._rewards) > 0:
+                self._log()
 
         return True
 
+    def _log(self):
+        row = dict(
+            timesteps=self.num_timesteps,
+            episodes=self._episodes,
+            mean_reward=self._rewards.mean,
+            max_reward=self._rewards.max,
+            mean_length=self._lengths.mean,
+            mean_checkpoints=self._checkpoints.mean,
+            max_checkpoints=self._checkpoints.max,
+        )
+        self._metrics.write(**row)
+
+        print(f"\n=== [{self.num_timesteps}] ===")
+        print(f"  Reward: {row['mean_reward']:.1f} (max: {row['max_reward']:.1f})")
+        print(f"  Checkpoints: {row['mean_checkpoints']:.2f} (max: {row['max_checkpoints']:.0f})")
+        print(f"  Episode length: {row['mean_length']:.0f}")
+
     def _on_training_end(self):
         """Save training plots."""
-        if len(self.log_timesteps) < 2:
+        if self._metrics is None:
             return
+        self._metrics.close()
 
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8))
-
-        ax1.plot(self.log_timesteps, self.log_rewards, 'b-', linewidth=2)
-        ax1.set_xlabel('Steps')
-        ax1.set_ylabel('Mean Reward')
-        ax1.set_title('Reward over training')
-        ax1.grid(True)
-
-        ax2.plot(self.log_timesteps, self.log_checkpoints, 'g-', linewidth=2)
-        ax2.set_xlabel('Steps')
-        ax2.set_ylabel('Mean Checkpoints')
-        ax2.set_title('Checkpoints over training')
-        ax2.grid(True)
-
-        plt.tight_layout()
         plot_path = os.path.join(self.save_path, "training_plot.png")
-        plt.savefig(plot_path, dpi=150)
-        plt.close()
-        print(f"\nPlot saved: {plot_path}")
+        if plot_metrics(self.metrics_path, plot_path):
+            print(f"\nPlot saved: {plot_path}")
 
 
-def make_env(track_file):
+def make_env(track_files, track_weights=None, cores=None):
     def _init():
-        env = RacingEnv(track_file=track_file, render_mode=None)
+        configure_worker(cores if PIN_ENV_WORKERS else None, ENV_THREADS)
+
+        # Tracks are loaded once per process, a new one is sampled every episode
+        registry = TrackRegistry(track_files, memory_budget_mb=TRACK_MEMORY_MB)
+        registry.preload()
+        env = RacingEnv(
+            track_pool=track_files,
+            track_weights=track_weights,
+            track_registry=registry,
+            ray_table=RAY_TABLE,
+            collision=COLLISION,
+            observation=OBSERVATION,
+            render_mode=None
+        )
         return Monitor(env)
     return _init
 
 
 def train():
-    os.makedirs(SAVE_PATH, exist_ok=True)
+    # Check settings before worker processes are started
+    if ASYNC_ROLLOUTS and not SHARED_MEMORY_ENVS:
+        raise ValueError("ASYNC_ROLLOUTS needs SHARED_MEMORY_ENVS")
 
-    env = SubprocVecEnv([make_env(TRACK_FILE) for _ in range(N_ENVS)])
-    env = VecMonitor(env)
+    os.makedirs(SAVE_PATH, exist_ok=True)
 
-    checkpoint_callback = CheckpointCallback(
-        save_freq=10000 // N_ENVS,
+    # Build missing track caches up front - env workers then only read them
+    track_stats = preprocess_tracks(TRACK_FILES, ray_table=RAY_TABLE)
+    print_stats(track_stats)
+    invalid = [r['track'] for r in track_stats if r['problems']]
+    if invalid:
+        raise ValueError(f"Invalid tracks: {', '.join(invalid)}")
+
+    # Thread limits before workers start (they inherit the environment)
+    budget = plan_cpu_budget(N_ENVS, LEARNER_THREADS, rollout_threads=ROLLOUT_THREADS)
+    limit_child_threads(ENV_THREADS)
+    configure_learner(budget['learner_threads'])
+
+    vec_env_class = SharedMemoryVecEnv if SHARED_MEMORY_ENVS else SubprocVecEnv
+    env = vec_env_class([make_env(TRACK_FILES, TRACK_WEIGHTS, cores) for cores in budget['env_cores']])
+    if not ASYNC_ROLLOUTS:
+        env = VecMonitor(env)  # Async rollouts step env groups directly (Monitor in make_env records episodes)
+
+    # Snapshot in memory, zip + disk write on a background thread
+    checkpoint_callback = BackgroundCheckpointCallback(
+        save_freq=CHECKPOINT_FREQ,
         save_path=SAVE_PATH,
-        name_prefix="racing_ppo"
+        name_prefix="racing_ppo",
+        max_pending=2
     )
 
     logger = TrainingLogger(log_freq=8192, save_path=SAVE_PATH)
+    utilization = PhaseUtilization(budget['cores'])
+    learner_threads = LearnerThreads(budget['rollout_threads'], budget['learner_threads'])
 
-    model = PPO(
-        "MlpPolicy",
+    model_class = AsyncPPO if ASYNC_ROLLOUTS else PPO
+    model = model_class(
+        "MultiInputPolicy" if OBSERVATION == "patch" else "MlpPolicy",
         env,
         learning_rate=0.0003,
         n_steps=2048,
@@ -127,12 +204,15 @@ def train():
     )
 
     print(f"Starting PPO training: {TOTAL_TIMESTEPS} steps")
-    print(f"Parallel envs: {N_ENVS}")
+    print(f"Parallel envs: {N_ENVS} on {len(budget['cores'])} cores, "
+          f"learner threads: {budget['rollout_threads']} in rollouts, "
+          f"{budget['learner_threads']} in updates")
+    print(f"Tracks: {', '.join(TRACK_FILES)}")
     print(f"Save path: {SAVE_PATH}/")
 
     model.learn(
         total_timesteps=TOTAL_TIMESTEPS,
-        callback=[checkpoint_callback, logger]
+        callback=[checkpoint_callback, logger, utilization, learner_threads]
     )
 
     final_path = os.path.join(SAVE_PATH, "racing_ppo_final")
@@ -3,8 +3,8 @@ Watch trained agent driving.
 Usage: Run in PyCharm or: python watch.py
 """
 
-from stable_baselines3 import PPO
 from ai.racing_env import RacingEnv
+from ai.batch_policy import BatchPolicy, load_model
 import pygame
 
 
@@ -17,7 +17,7 @@ def main():
     print(f"Model: {MODEL_PATH}")
     print(f"Track: {TRACK_PATH}")
 
-    model = PPO.load(MODEL_PATH)
+    policy = BatchPolicy({MODEL_PATH: load_model(MODEL_PATH)})
     env = RacingEnv(track_file=TRACK_PATH, render_mode="human", max_steps=999999)
 
     obs, info = env.reset()
@@ -43,7 +43,7 @@ def main():
         if not running:
             break
 
-        action, _ = model.predict(obs, deterministic=True)
+        action = policy.predict(obs)[0]
         obs, reward, terminated, truncated, info = env.step(action)
 
         # Count laps
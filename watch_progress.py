@@ -3,22 +3,40 @@ Watch training progress - compare models from different epochs.
 Usage: Run in PyCharm or: python watch_progress.py
 """
 
-from stable_baselines3 import PPO
 from ai.racing_env import RacingEnv
+from ai.batch_policy import BatchPolicy, load_model
+from ai.checkpoint_manifest import read_manifest
+from concurrent.futures import ProcessPoolExecutor
 import os
 import pygame
 import glob
+import numpy as np
 
 
 # === SETTINGS ===
 MODEL_DIR = "models/v4"
 TRACK_PATH = "tracks/test.png"
-SKIP_EVERY = 2  # Show every N-th model
+SKIP_EVERY = 2  # Show every N-th model (rendered mode)
+MAX_STEPS = 500
+MODEL_EXT = ".zip"  # ".npz" - use models exported by export_policy.py (no torch)
+
+# Headless mode - score every checkpoint over many episodes in parallel
+HEADLESS = True
+N_EPISODES = 10
+N_WORKERS = os.cpu_count()
+SEED = 0
+RENDER_MODEL = None  # e.g. "racing_ppo_final" - watch this model after evaluation
 
 
 def get_checkpoint_models(model_dir):
-    """Find checkpoint models sorted by steps."""
-    pattern = os.path.join(model_dir, "racing_ppo_*_steps.zip")
+    """Find checkpoint models sorted by steps (from manifest.json if training wrote one)."""
+    manifest = read_manifest(model_dir)
+    if manifest is not None:
+        paths = [os.path.splitext(entry['path'])[0] + MODEL_EXT for entry in manifest]
+        return [path for path in paths if os.path.exists(path)]
+
+    # Older model directories - steps are parsed from file names
+    pattern = os.path.join(model_dir, f"racing_ppo_*_steps{MODEL_EXT}")
     files = glob.glob(pattern)
 
     def get_steps(f):
@@ -31,7 +49,7 @@ def get_checkpoint_models(model_dir):
     return files
 
 
-def run_episode(model, env, model_name, current_idx, total_models, max_steps=500):
+def run_episode(policy, env, model_name, current_idx, total_models, max_steps=MAX_STEPS):
     """Run one episode and return results."""
     obs, info = env.reset()
     env.render()
@@ -49,7 +67,7 @@ def run_episode(model, env, model_name, current_idx, total_models, max_steps=500
             if event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN:
                 return total_reward, info.get('checkpoint', 0), steps, False, True
 
-        action, _ = model.predict(obs, deterministic=True)
+        action = policy.predict(obs)[0]
         obs, reward, terminated, truncated, info = env.step(action)
         total_reward += reward
         steps += 1
@@ -68,22 +86,97 @@ def run_episode(model, env, model_name, current_idx, total_models, max_steps=500
     return total_reward, info.get('checkpoint', 0), steps, False, False
 
 
-def main():
-    models = get_checkpoint_models(MODEL_DIR)
-
-    if not models:
-        print(f"No models in {MODEL_DIR}")
-        return
+def evaluate_model(model_path, track_path, n_episodes, seed, max_steps):
+    """
+    Run seeded headless episodes of one model (process pool worker).
+
+    All episodes run side by side in lockstep, so each tick needs only one
+    batched forward pass. The track and start are deterministic, so
+    episodes differ only by sampled actions (policy seeded with seed).
+    """
+    if model_path.endswith(".zip"):
+        import torch
+        torch.set_num_threads(1)  # One core per worker
+
+    model = load_model(model_path)
+    model.set_random_seed(seed)
+    policy = BatchPolicy({model_path: model}, deterministic=False)
+
+    envs = [RacingEnv(track_file=track_path, render_mode=None, max_steps=max_steps)
+            for _ in range(n_episodes)]
+
+    obs = np.array([env.reset(seed=seed + i)[0] for i, env in enumerate(envs)])
+    total_rewards = np.zeros(n_episodes)
+    steps = np.zeros(n_episodes, dtype=int)
+    laps_seen = np.zeros(n_episodes, dtype=int)
+    running = np.ones(n_episodes, dtype=bool)
+    final_infos = [None] * n_episodes
+    lap_times = []
+
+    while running.any():
+        active = np.flatnonzero(running)
+        actions = policy.predict(obs[active])
+
+        for i, action in zip(active, actions):
+            obs[i], reward, terminated, truncated, info = envs[i].step(action)
+            total_rewards[i] += reward
+            steps[i] += 1
+
+            # Lap times are measured by the env in simulation time
+            if info["laps"] > laps_seen[i]:
+                laps_seen[i] = info["laps"]
+                lap_times.append(info["last_lap_time"])
+
+            if terminated or truncated:
+                running[i] = False
+                final_infos[i] = info
+
+    for env in envs:
+        env.close()
+
+    return {
+        "name": os.path.splitext(os.path.basename(model_path))[0],
+        "rewards": total_rewards.tolist(),
+        "checkpoints": [info["checkpoint"] + info["laps"] * info["total_checkpoints"]
+                        for info in final_infos],
+        "steps": steps.tolist(),
+        "laps": [info["laps"] for info in final_infos],
+        "lap_times": lap_times
+    }
+
+
+def evaluate_headless(models):
+    """Evaluate all models in parallel and print summary table."""
+    print(f"Evaluating {len(models)} models x {N_EPISODES} episodes "
+          f"on {N_WORKERS} workers...")
+
+    with ProcessPoolExecutor(max_workers=N_WORKERS) as pool:
+        futures = [
+            pool.submit(evaluate_model, path, TRACK_PATH, N_EPISODES, SEED, MAX_STEPS)
+            for path in models
+        ]
+        results = []
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            print(f"  {result['name']}: reward {np.mean(result['rewards']):.1f}")
 
-    models = models[::SKIP_EVERY]
+    print("\n=== SUMMARY ===")
+    print(f"{'Model':<30} {'Reward':>10} {'Std':>8} {'CP':>6} {'Steps':>7} "
+          f"{'Laps':>6} {'Best lap':>9} {'Mean lap':>9}")
+    print("-" * 92)
+    for r in results:
+        best_lap = f"{min(r['lap_times']):.2f}s" if r['lap_times'] else "-"
+        mean_lap = f"{np.mean(r['lap_times']):.2f}s" if r['lap_times'] else "-"
+        print(f"{r['name']:<30} {np.mean(r['rewards']):>10.1f} {np.std(r['rewards']):>8.1f} "
+              f"{np.mean(r['checkpoints']):>6.2f} {np.mean(r['steps']):>7.0f} "
+              f"{np.mean(r['laps']):>6.2f} {best_lap:>9} {mean_lap:>9}")
 
-    final = os.path.join(MODEL_DIR, "racing_ppo_final.zip")
-    if os.path.exists(final) and final not in models:
-        models.append(final)
+    return results
 
-    print(f"Found {len(models)} models in {MODEL_DIR}")
-    print(f"Track: {TRACK_PATH}")
 
+def watch_models(models):
+    """Show models one after another in a window."""
     env = RacingEnv(track_file=TRACK_PATH, render_mode="human")
 
     print("\n=== TRAINING PROGRESS ===")
@@ -91,12 +184,12 @@ def main():
 
     results = []
     for i, model_path in enumerate(models):
-        name = os.path.basename(model_path).replace(".zip", "")
+        name = os.path.splitext(os.path.basename(model_path))[0]
         print(f"[{i+1}/{len(models)}] {name}")
 
-        model = PPO.load(model_path)
+        policy = BatchPolicy({model_path: load_model(model_path)})
         reward, cp, steps, quit_flag, skipped = run_episode(
-            model, env, name, i+1, len(models)
+            policy, env, name, i+1, len(models)
         )
 
         if quit_flag:
@@ -117,6 +210,36 @@ def main():
         print(f"{name:<30} {reward:>10.1f} {cp:>5} {steps:>7}")
 
 
+def main():
+    models = get_checkpoint_models(MODEL_DIR)
+
+    if not models:
+        print(f"No models in {MODEL_DIR}")
+        return
+
+    if not HEADLESS:
+        models = models[::SKIP_EVERY]
+
+    final = os.path.join(MODEL_DIR, f"racing_ppo_final{MODEL_EXT}")
+    if os.path.exists(final) and final not in models:
+        models.append(final)
+
+    print(f"Found {len(models)} models in {MODEL_DIR}")
+    print(f"Track: {TRACK_PATH}")
+
+    if not HEADLESS:
+        watch_models(models)
+        return
+
+    evaluate_headless(models)
+
+    if RENDER_MODEL:
+        chosen = [m for m in models if os.path.splitext(os.path.basename(m))[0] == RENDER_MODEL]
+        if chosen:
+            watch_models(chosen)
+        else:
+            print(f"Model {RENDER_MODEL} not found")
+
+
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,117 @@
+"""
+Play back a recorded replay file (see core/replay.py).
+Usage: Run in PyCharm or: python watch_replay.py
+
+Controls: SPACE = pause, LEFT/RIGHT = seek, UP/DOWN = playback speed, ESC = quit
+"""
+
+from core.replay import ReplayReader
+from core.ghost import Ghost, ghost_path
+from core.track import Track
+from core.track_loader import TrackLoader
+from core.renderer import Renderer
+from entities.ai_car import AICar
+from entities.player_car import PlayerCar
+import pygame
+
+
+# === SETTINGS ===
+REPLAY_PATH = "replays/race.replay"
+TRACK_PATH = None  # None = track stored in replay header
+SEEK_SECONDS = 5.0  # Jump size for LEFT/RIGHT
+FPS = 60
+SAVE_GHOST_VEHICLE = None  # Vehicle id - save its best lap as the track's ghost (e.g. 1 = first AI car)
+
+
+def main():
+    replay = ReplayReader(REPLAY_PATH)
+    header = replay.header
+    track_path = TRACK_PATH or header.get('track')
+
+    print(f"Replay: {REPLAY_PATH}")
+    print(f"Track:  {track_path}")
+    print(f"Model:  {header.get('model')}")
+    print(f"Ticks:  {replay.first_tick}-{replay.last_tick} ({len(replay)} records)")
+
+    if len(replay) == 0:
+        print("Replay is empty")
+        return
+
+    if SAVE_GHOST_VEHICLE is not None:
+        ghost = Ghost.from_replay(replay, SAVE_GHOST_VEHICLE)
+        if ghost is None:
+            print(f"Vehicle {SAVE_GHOST_VEHICLE} has no complete lap - ghost not saved")
+        else:
+            ghost.save(ghost_path(track_path))
+            print(f"Ghost: {ghost_path(track_path)} (lap {ghost.lap_time:.3f}s)")
+
+    pygame.init()
+    track_data = TrackLoader().load_from_png(track_path)
+    track = Track(track_data=track_data)
+    screen = pygame.display.set_mode((track_data['width'], track_data['height']))
+    pygame.display.set_caption(f"Replay - {REPLAY_PATH}")
+    renderer = Renderer(screen, dirty_rects=True)
+    clock = pygame.time.Clock()
+
+    # One drawable car per recorded vehicle id, created on first appearance
+    player_id = header.get('player_id')
+    cars = {}
+
+    tick = float(replay.first_tick)
+    speed = 1.0
+    paused = False
+    seek_ticks = SEEK_SECONDS / replay.tick_dt
+    ticks_per_frame = 1.0 / (replay.tick_dt * FPS)
+
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    running = False
+                elif event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_LEFT:
+                    tick -= seek_ticks
+                elif event.key == pygame.K_RIGHT:
+                    tick += seek_ticks
+                elif event.key == pygame.K_UP:
+                    speed = min(speed * 2, 16.0)
+                elif event.key == pygame.K_DOWN:
+                    speed = max(speed / 2, 0.125)
+
+        if not paused:
+            tick += ticks_per_frame * speed
+        tick = min(max(tick, replay.first_tick), replay.last_tick)
+
+        records = replay.at_tick(int(tick))
+
+        renderer.clear(track.background_color)
+        renderer.draw_track(track)
+
+        for record in records:
+            vehicle_id = int(record['vehicle'])
+            if vehicle_id not in cars:
+                cars[vehicle_id] = PlayerCar(0, 0) if vehicle_id == player_id else AICar(0, 0)
+            car = cars[vehicle_id]
+            pose = (float(record['x']), float(record['y']), float(record['angle']))
+            renderer.draw_vehicle(car, pose)
+
+        seconds = (int(tick) - replay.first_tick) * replay.tick_dt
+        status = "PAUSED" if paused else f"x{speed:g}"
+        renderer.draw_text(f"Time: {seconds:7.2f}s  Tick: {int(tick)}  {status}", 10, 10)
+        if len(records):
+            lead = records[0]
+            renderer.draw_text(f"Episode: {lead['episode']}  Lap: {lead['lap']}  "
+                               f"CP: {lead['checkpoint']}/{track.total_checkpoints}", 10, 45)
+
+        renderer.update_display()
+        clock.tick(FPS)
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()